@@ -0,0 +1,97 @@
+"""Hands parsed games from the workers to the parent as Arrow IPC files.
+
+Returning rows from a pool task pickles one dictionary per play, and the
+parent unpickles millions of small objects. Instead, each worker builds a
+columnar Arrow table of its game and writes it to an IPC file in a handoff
+directory, e.g. on /dev/shm so it never touches the disk. The parent only
+receives the path, then memory-maps every file and concatenates the tables
+without deserializing any rows.
+
+This module must stay free of pandas, workers import it."""
+import logging
+import os
+import shutil
+import tempfile
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def rows_to_table(rows: List[Dict]):
+    """A pyarrow Table of the rows, with a column for every key in any row."""
+    import pyarrow as pa
+
+    # Columns are missing from some rows, e.g. running plays have no yac.
+    columns = {}
+    for row in rows:
+        for column in row:
+            columns.setdefault(column, None)
+    return pa.Table.from_pydict({column: [row.get(column) for row in rows]
+                                 for column in columns})
+
+
+def write_batch(rows: List[Dict], handoff_dir: str, idx: int) -> str:
+    """Write the rows of a game to a new Arrow IPC file in the directory.
+
+    :returns: The path of the file."""
+    import pyarrow as pa
+
+    table = rows_to_table(rows)
+    fd, path = tempfile.mkstemp(prefix=f'game-{idx:06d}-', suffix='.arrow', dir=handoff_dir)
+    with os.fdopen(fd, 'wb') as batch_file:
+        with pa.ipc.new_file(batch_file, table.schema) as writer:
+            writer.write_table(table)
+    return path
+
+
+class ArrowBatches(object):
+    """The Arrow IPC files of the games of a league, in the order of the logs."""
+
+    def __init__(self, handoff_dir: str, num_games: int):
+        """
+        :param: handoff_dir: A directory of this league's files only, which
+        cleanup removes.
+        :param: num_games: How many games are being parsed.
+        """
+        self.handoff_dir = handoff_dir
+        self._paths: List[Optional[str]] = [None] * num_games
+        self._plays = 0
+
+    @classmethod
+    def create(cls, num_games: int, parent_dir: Optional[str] = None) -> 'ArrowBatches':
+        """Batches in a new directory under parent_dir, or the temp directory."""
+        if parent_dir:
+            os.makedirs(parent_dir, exist_ok=True)
+        return cls(tempfile.mkdtemp(prefix='fof_handoff_', dir=parent_dir), num_games)
+
+    def add(self, idx: int, path: str, plays: int) -> None:
+        self._paths[idx] = path
+        self._plays += plays
+
+    @property
+    def plays(self) -> int:
+        return self._plays
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def to_table(self):
+        """Memory-map every game and concatenate them into one table.
+
+        Columns a game doesn't have are null for its plays, and columns whose
+        type differs between games, e.g. all null in one, are promoted."""
+        import pyarrow as pa
+
+        tables = []
+        for path in self._paths:
+            if path is None:
+                continue
+            # The table's buffers keep the mapping open, and point into it.
+            tables.append(pa.ipc.open_file(pa.memory_map(path)).read_all())
+        if not tables:
+            return pa.table({})
+        return pa.concat_tables(tables, promote_options='permissive')
+
+    def cleanup(self) -> None:
+        """Remove the handoff directory and every file in it."""
+        shutil.rmtree(self.handoff_dir, ignore_errors=True)
@@ -0,0 +1,78 @@
+"""Benchmark of the executor backends on the same logs.
+
+Run from the src directory:
+`python -m benchmarks.executors --logs_dir "C:\\Front Office Football Eight\\leaguehtml"
+--league_id LG000021 --num_logs 200 --n_jobs 1,2,4`
+
+Every backend parses the same logs with each number of workers, and the
+median wall time, logs and plays per second and speedup over serial parsing
+are reported. Threads only beat serial parsing on a free-threaded build of
+python, the report says whether this one has a GIL.
+"""
+import argparse
+import logging
+import os
+import platform
+import statistics
+import time
+from typing import List, Tuple
+
+from executors import EXECUTORS, PROCESS, SERIAL, gil_enabled
+from loader import game_log_paths
+from parse import load_and_parse
+
+
+def time_executor(paths: List[str], executor: str, n_jobs: int,
+                  repeats: int) -> Tuple[float, int]:
+    """Median wall time in seconds to parse the logs, and how many plays."""
+    timings = []
+    plays = 0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        parsed = load_and_parse(os.path.dirname(paths[0]), paths=paths, n_jobs=n_jobs,
+                                executor=executor)
+        timings.append(time.perf_counter() - start)
+        plays = sum(len(rows) for rows in parsed)
+    return statistics.median(timings), plays
+
+
+def main(args):
+    paths = game_log_paths(os.path.join(args.logs_dir, args.league_id))[:args.num_logs]
+    executors = args.executors.split(",") if args.executors else list(EXECUTORS)
+    n_jobs_options = [int(n) for n in args.n_jobs.split(",")]
+    print(f"python {platform.python_version()}, GIL "
+          f"{'enabled' if gil_enabled() else 'disabled'}, {os.cpu_count()} CPUs, "
+          f"{len(paths)} logs")
+    print(f"{'executor':<10}{'n_jobs':>8}{'seconds':>10}{'logs/s':>10}{'plays/s':>12}"
+          f"{'speedup':>9}")
+    serial_seconds = None
+    for executor in [SERIAL] + [e for e in executors if e != SERIAL]:
+        for n_jobs in [1] if executor == SERIAL else n_jobs_options:
+            if executor == PROCESS and n_jobs == 1:
+                # The same as serial.
+                continue
+            seconds, plays = time_executor(paths, executor, n_jobs, args.repeats)
+            serial_seconds = serial_seconds or seconds
+            print(f"{executor:<10}{n_jobs:>8}{seconds:>10.3f}{len(paths) / seconds:>10.2f}"
+                  f"{plays / seconds:>12.1f}{serial_seconds / seconds:>8.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logs_dir", help="The directory of the game logs for "
+                                           "Front Office Football.", type=str)
+    parser.add_argument("--league_id", help="The 8 character id of the league "
+                                            "to time.", type=str)
+    parser.add_argument("--num_logs", help="How many logs to parse.",
+                        type=int, default=100)
+    parser.add_argument("--executors", help="Optional: A comma separated list "
+                                            "of the executors to compare. "
+                                            "Defaults to all of them.", type=str)
+    parser.add_argument("--n_jobs", help="Comma separated numbers of workers "
+                                         "to time the process and thread "
+                                         "executors with.",
+                        type=str, default="2,4")
+    parser.add_argument("--repeats", help="How many times to repeat each "
+                                          "measurement.", type=int, default=3)
+    logging.basicConfig(level=logging.WARNING)
+    main(parser.parse_args())
@@ -0,0 +1,229 @@
+"""Benchmark history, to catch parser changes that make parsing slower.
+
+Run from the src directory:
+`python -m benchmarks.history --logs_dir "C:\\Front Office Football Eight\\leaguehtml"
+--league_id LG000021 --baseline previous`
+
+It runs the benchmark corpus on the same seeded sample of logs every time,
+appends the results to a JSON lines history file, tagged with the git commit,
+the machine and the python version, and compares them with a baseline from
+the history:
+* `previous`, the latest earlier results.
+* A git commit, or the start of one, for its latest results.
+Either way only results from the same machine, python, league, number of logs
+and seed are compared, since any of them changes the timings.
+
+A benchmark regressed if its median got slower by more than --tolerance,
+and by more than --noise times the noise of the measurements, the median
+absolute deviation of either run. The exit code is 1 if any benchmark
+regressed, or if a commit baseline isn't in the history. Use --no_run to
+compare the latest stored results without running anything.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.startup import time_import
+
+DEFAULT_HISTORY = 'benchmark_history.jsonl'
+# The median absolute deviation times this estimates the standard deviation.
+_MAD_TO_STD = 1.4826
+# Results are only comparable if these are all the same.
+_COMPARABLE_KEYS = ('machine', 'python', 'league_id', 'num_logs', 'seed')
+
+
+def time_parse(parse_mode: str, columns: Optional[List[str]] = None) \
+        -> Callable[[int, List[str]], List[float]]:
+    """A benchmark of the milliseconds per log of parsing the logs in this
+    process, in the parse mode."""
+    def benchmark(repeats: int, paths: List[str]) -> List[float]:
+        from worker import parse_one_log
+
+        samples = []
+        # The first pass warms up the imports and caches, and isn't counted.
+        for repeat in range(repeats + 1):
+            start = time.perf_counter()
+            for idx, path in enumerate(paths):
+                parse_one_log(path, idx, columns, parse_mode=parse_mode)
+            if repeat:
+                samples.append(1000 * (time.perf_counter() - start) / len(paths))
+        return samples
+    return benchmark
+
+
+# The corpus: each benchmark's unit, and its function of the repeats and the
+# log paths, returning one sample per repeat. Lower is better for all of them.
+BENCHMARKS: Dict[str, tuple] = {
+    'import_parse': ('s', lambda repeats, paths: time_import('parse', repeats)),
+    'import_worker': ('s', lambda repeats, paths: time_import('worker', repeats)),
+    'parse_per_play': ('ms/log', time_parse('per_play')),
+    'parse_vectorized_workers': ('ms/log', time_parse('vectorized')),
+    'parse_call_outcome': ('ms/log', time_parse('per_play', ['call', 'outcome'])),
+}
+
+
+def run_benchmarks(paths: List[str], repeats: int,
+                   names: Optional[List[str]] = None) -> Dict[str, Dict]:
+    """Run the benchmarks, by default the whole corpus.
+
+    :returns: The unit, samples, median and median absolute deviation of each."""
+    results = {}
+    for name in names or list(BENCHMARKS):
+        unit, benchmark = BENCHMARKS[name]
+        samples = benchmark(repeats, paths)
+        median = statistics.median(samples)
+        results[name] = {'unit': unit, 'samples': samples, 'median': median,
+                         'mad': statistics.median(abs(s - median) for s in samples)}
+        print(f"{name:<28}{median:>12.3f} {unit}")
+    return results
+
+
+def environment() -> Dict:
+    """The git commit, machine and python version the results are from."""
+    return {'commit': _git('rev-parse', 'HEAD'),
+            'dirty': bool(_git('status', '--porcelain', '--untracked-files=no')),
+            'machine': {'host': socket.gethostname(), 'system': platform.system(),
+                        'processor': platform.processor() or platform.machine(),
+                        'cpus': os.cpu_count()},
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation()}
+
+
+def load_history(history_path: str) -> List[Dict]:
+    if not os.path.exists(history_path):
+        return []
+    with open(history_path) as history_file:
+        return [json.loads(line) for line in history_file if line.strip()]
+
+
+def append_history(history_path: str, entry: Dict) -> None:
+    with open(history_path, 'a') as history_file:
+        history_file.write(json.dumps(entry) + '\n')
+
+
+def find_baseline(history: List[Dict], current: Dict, baseline: str) -> Optional[Dict]:
+    """The entry to compare the current one with, see the module docstring."""
+    earlier = [entry for entry in history if entry is not current
+               and all(entry.get(key) == current.get(key) for key in _COMPARABLE_KEYS)]
+    if baseline != 'previous':
+        earlier = [entry for entry in earlier
+                   if entry['commit'] and entry['commit'].startswith(baseline)]
+    return earlier[-1] if earlier else None
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float, noise: float) -> List[str]:
+    """Print how every benchmark changed since the baseline.
+
+    :returns: The names of the benchmarks that regressed."""
+    regressed = []
+    print(f"{'benchmark':<28}{'baseline':>12}{'current':>12}{'change':>9}  verdict")
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            print(f"{name:<28}{'':>12}{result['median']:>12.3f}{'':>9}  new")
+            continue
+        difference = result['median'] - before['median']
+        change = difference / before['median'] if before['median'] else 0.0
+        threshold = noise * _MAD_TO_STD * max(result['mad'], before['mad'])
+        if change > tolerance and difference > threshold:
+            verdict = 'REGRESSED'
+            regressed.append(name)
+        elif change < -tolerance and -difference > threshold:
+            verdict = 'improved'
+        else:
+            verdict = 'unchanged'
+        print(f"{name:<28}{before['median']:>12.3f}{result['median']:>12.3f}"
+              f"{100 * change:>+8.1f}%  {verdict}")
+    return regressed
+
+
+def _git(*args) -> Optional[str]:
+    try:
+        return subprocess.run(['git', *args], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(args) -> int:
+    history = load_history(args.history_file)
+    if args.no_run:
+        if not history:
+            print(f"There are no results in {args.history_file}.")
+            return 1
+        current = history[-1]
+    else:
+        from loader import game_log_paths
+        from sampling import stratified_sample
+
+        paths = stratified_sample(game_log_paths(os.path.join(args.logs_dir, args.league_id)),
+                                  args.num_logs, args.seed)
+        env = environment()
+        print(f"commit {env['commit'] or 'unknown'}{' (dirty)' if env['dirty'] else ''}, "
+              f"python {env['python']}, {len(paths)} logs")
+        names = args.benchmarks.split(",") if args.benchmarks else None
+        current = dict(env, time=time.time(), league_id=args.league_id,
+                       num_logs=len(paths), seed=args.seed,
+                       results=run_benchmarks(paths, args.repeats, names))
+        append_history(args.history_file, current)
+        history.append(current)
+    if not args.baseline:
+        return 0
+    baseline = find_baseline(history, current, args.baseline)
+    if baseline is None:
+        print(f"No baseline {args.baseline} from this machine, python and sample of logs "
+              f"in {args.history_file}, nothing to compare.")
+        # The first run of a history has nothing before it, but a named commit
+        # that can't be found is likely a typo, which mustn't pass as no
+        # regressions.
+        return 0 if args.baseline == 'previous' else 1
+    print(f"Comparing with {baseline['commit'] or 'unknown'} from "
+          f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(baseline['time']))}")
+    regressed = compare(current, baseline, args.tolerance, args.noise)
+    if regressed:
+        print(f"Regressed: {', '.join(regressed)}")
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logs_dir", help="The directory of the game logs for "
+                                           "Front Office Football.", type=str)
+    parser.add_argument("--league_id", help="The 8 character id of the league "
+                                            "to benchmark on.", type=str)
+    parser.add_argument("--num_logs", help="How many logs to sample, "
+                                           "stratified by season.",
+                        type=int, default=50)
+    parser.add_argument("--seed", help="The random seed of the sample.",
+                        type=int, default=0)
+    parser.add_argument("--repeats", help="How many times to repeat each "
+                                          "benchmark.", type=int, default=5)
+    parser.add_argument("--benchmarks", help="Optional: A comma separated list "
+                                             "of the benchmarks to run. "
+                                             "Defaults to all of them.", type=str)
+    parser.add_argument("--history_file", help="The JSON lines file the "
+                                               "results are appended to.",
+                        type=str, default=DEFAULT_HISTORY)
+    parser.add_argument("--baseline", help="Optional: The results to compare "
+                                           "with, previous or a git commit.",
+                        type=str)
+    parser.add_argument("--tolerance", help="How much slower, as a fraction, "
+                                            "a benchmark may get before it "
+                                            "regressed.", type=float, default=0.05)
+    parser.add_argument("--noise", help="How many standard deviations of "
+                                        "noise a slowdown must also exceed.",
+                        type=float, default=2.0)
+    parser.add_argument("--no_run", help="Compare the latest results in the "
+                                         "history instead of running the "
+                                         "benchmarks.", action="store_true")
+    # The parsers' warnings would bury the report.
+    logging.basicConfig(level=logging.ERROR)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,72 @@
+"""Benchmark for how quickly small incremental runs get their first results.
+
+Run from the src directory:
+`python -m benchmarks.startup --logs_dir "C:\\Front Office Football Eight\\leaguehtml"
+--league_id LG000021`
+
+It reports, each in a fresh interpreter:
+* How long `import parse` takes, which every run and every spawned worker pays.
+* How long `import worker` takes, which is what a worker needs before parsing.
+* How long `import pandas` takes, which workers no longer pay.
+* The wall time of a full run of `parse` for a few small numbers of logs. The
+  smallest run is the time to the first parsed log.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+_IMPORT_TIMER = ("import time; start = time.perf_counter(); import {module}; "
+                 "print(time.perf_counter() - start)")
+
+
+def time_import(module: str, repeats: int) -> List[float]:
+    """Seconds to import the module in each of repeats fresh interpreters."""
+    timings = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, "-c", _IMPORT_TIMER.format(module=module)],
+                                capture_output=True, text=True, check=True).stdout
+        timings.append(float(output.strip().splitlines()[-1]))
+    return timings
+
+
+def time_run(logs_dir: str, league_id: str, num_logs: int, repeats: int) -> float:
+    """Median wall time in seconds of parsing and saving num_logs logs."""
+    timings = []
+    for _ in range(repeats):
+        with tempfile.TemporaryDirectory() as export_dir:
+            command = [sys.executable, "-m", "parse", "--logs_dir", logs_dir,
+                       "--league_ids", league_id, "--export_dir", export_dir,
+                       "--max_to_parse", str(num_logs), "--log_level", "WARNING"]
+            start = time.perf_counter()
+            subprocess.run(command, check=True)
+            timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main(args):
+    num_logs: List[int] = [int(n) for n in args.num_logs.split(",")]
+    print(f"{'measurement':<32}{'seconds':>10}")
+    for module in ["parse", "worker", "pandas"]:
+        seconds = statistics.median(time_import(module, args.repeats))
+        print(f"{'import ' + module:<32}{seconds:>10.3f}")
+    for n in num_logs:
+        seconds = time_run(args.logs_dir, args.league_id, n, args.repeats)
+        print(f"{f'parse {n} logs':<32}{seconds:>10.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logs_dir", help="The directory of the game logs for "
+                                           "Front Office Football.", type=str)
+    parser.add_argument("--league_id", help="The 8 character id of the league "
+                                            "to time.", type=str)
+    parser.add_argument("--num_logs", help="Comma separated numbers of logs to "
+                                           "time small runs with.",
+                        type=str, default="1,5,20")
+    parser.add_argument("--repeats", help="How many times to repeat each "
+                                          "measurement.", type=int, default=3)
+    main(parser.parse_args())
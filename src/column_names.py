@@ -7,6 +7,8 @@ QUARTER = 'quarter'
 TIME_LEFT = 'time_remaining'
 YEAR = 'year'
 HOME_POSSESSION = 'home_possession'
+HOME_TEAM = 'home_team'
+AWAY_TEAM = 'away_team'
 DOWN = "down"
 DISTANCE = "distance"
 
@@ -51,3 +53,22 @@ SCRAMBLE = 'scramble'
 
 # Metadata
 LEAGUE_ID = 'league_id'
+# The name of the game log file without its extension, e.g. log2023_15.
+GAME_ID = 'game_id'
+# The play's summary text as it appears in the log, kept with --keep_summary.
+SUMMARY = 'summary'
+
+# Raw columns the vectorized parse mode extracts the other columns from. They
+# are dropped once the extraction is done.
+RAW_SUMMARY = '_summary'
+# The abbreviation of the team with the ball.
+RAW_OFFENSE_TEAM = '_offense_team'
+# The targeted route and priority, if the play turns out to be a pass.
+RAW_TARGET_ROUTE = '_target_route'
+RAW_TARGET_PRIORITY = '_target_priority'
+# The side, home or away, of the offense's players in the name columns, which
+# hold short names until they're resolved.
+RAW_NAMES_OFFENSE = '_names_offense'
+# On the first play of each game, the [side, short name, full name] of every
+# player to resolve the game's short names with.
+RAW_ROSTER = '_roster'
@@ -0,0 +1,62 @@
+"""Content addressed store of parsed game logs shared across leagues and runs.
+
+Backup copies and forked leagues contain the same game logs under several
+league directories. Logs are keyed by a hash of their contents, so a copy
+reuses the rows parsed from the original instead of being parsed again. The
+rows don't include the league id, which is added when they are exported, so
+reused rows end up under the league they were found in.
+
+The key also includes the requested columns and a fingerprint of the parser
+source, so rows are parsed again whenever the parser changes."""
+import hashlib
+import os
+from functools import lru_cache
+from typing import Collection, Optional
+
+from file_store import PickleStore
+
+_SOURCE_DIRS = ('parsing', 'schema')
+# Outside the parsers, these read the logs and turn the parsed plays into rows.
+_SOURCE_FILES = ('column_names.py', 'loader.py', 'worker.py')
+_READ_CHUNK_BYTES = 1024 * 1024
+
+
+class ParsedLogIndex(PickleStore):
+    """Maps the content hash of a game log to its parsed rows, a list of
+    dicts, in a PickleStore that workers in any process share."""
+
+    def key(self, game_log_path: str, columns: Optional[Collection[str]] = None,
+            parse_mode: str = '', keep_summary: bool = False) -> str:
+        """The key of a game log's parsed rows, from its contents, the columns,
+        the parse mode and whether the summaries are kept, which change what
+        the rows hold."""
+        digest = hashlib.blake2b(digest_size=20)
+        with open(game_log_path, 'rb') as game_log_file:
+            for chunk in iter(lambda: game_log_file.read(_READ_CHUNK_BYTES), b''):
+                digest.update(chunk)
+        digest.update(_parser_fingerprint().encode())
+        digest.update(repr(sorted(columns) if columns else None).encode())
+        digest.update(parse_mode.encode())
+        if keep_summary:
+            digest.update(b'summary')
+        return digest.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def _parser_fingerprint() -> str:
+    """A hash of the source that produces the rows, which changes whenever the
+    parsers or the code turning their output into rows do."""
+    digest = hashlib.blake2b(digest_size=20)
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    for source_dir in _SOURCE_DIRS:
+        source_dir = os.path.join(src_dir, source_dir)
+        for name in sorted(os.listdir(source_dir)):
+            if name.endswith('.py'):
+                with open(os.path.join(source_dir, name), 'rb') as source:
+                    digest.update(name.encode())
+                    digest.update(source.read())
+    for name in _SOURCE_FILES:
+        with open(os.path.join(src_dir, name), 'rb') as source:
+            digest.update(name.encode())
+            digest.update(source.read())
+    return digest.hexdigest()
@@ -21,7 +21,10 @@ CATEGORICAL_COLS = [
     TARGET_PRIORITY,
     PLAY_TYPE,
     LEAGUE_ID,
+    GAME_ID,
     YEAR,
+    HOME_TEAM,
+    AWAY_TEAM,
 ]
 
 INT_8_COLS = [
@@ -0,0 +1,194 @@
+"""Executor backends that run worker.parse_task over the logs of a league.
+
+* `process` parses in a multiprocessing pool, with a bounded number of logs
+  in flight and recycling of workers that grow too large.
+* `thread` parses in a thread pool in this process. Parsing is pure python,
+  so threads only run in parallel on a free-threaded CPython build (3.13t and
+  later), where there's no pickling of rows or starting of workers to pay.
+* `serial` parses one log after another in this process.
+
+Each backend yields a worker.TaskResult per log, in completion order."""
+import cProfile
+import logging
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from multiprocessing import Pool
+from queue import Queue
+from typing import Iterator, List, Optional, Tuple
+
+from memory import to_mb, BYTES_PER_MB
+
+logger = logging.getLogger(__name__)
+
+PROCESS = 'process'
+THREAD = 'thread'
+SERIAL = 'serial'
+EXECUTORS = (PROCESS, THREAD, SERIAL)
+
+# How many logs to keep queued per worker so workers never sit idle.
+_IN_FLIGHT_PER_WORKER = 2
+
+
+def gil_enabled() -> bool:
+    """Whether this interpreter has a GIL, which stops threads parsing in parallel."""
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', None)
+    return True if is_gil_enabled is None else is_gil_enabled()
+
+
+class Executor(object):
+    """Runs worker.parse_task for each log."""
+    name = SERIAL
+    # Whether the workers are other processes, with their own memory.
+    separate_processes = False
+
+    def __init__(self, n_jobs: int = 1, max_in_flight: Optional[int] = None,
+                 profile_memory: bool = False, profile_dir: Optional[str] = None):
+        self.n_jobs = n_jobs
+        self.max_in_flight = max_in_flight or n_jobs * _IN_FLIGHT_PER_WORKER
+        self.profile_memory = profile_memory
+        self.profile_dir = profile_dir
+
+    def run(self, task_args: List[Tuple]) -> Iterator:
+        """Parse every log, yielding a worker.TaskResult for each.
+
+        :param: task_args: The arguments of worker.parse_task for each log.
+        """
+        from worker import parse_task, set_memory_profiling
+
+        # The parent's profiler, if any, already covers this process.
+        set_memory_profiling(self.profile_memory)
+        try:
+            for args in task_args:
+                yield parse_task(*args)
+        finally:
+            set_memory_profiling(False)
+
+
+class ProcessExecutor(Executor):
+    name = PROCESS
+    separate_processes = True
+
+    def __init__(self, n_jobs: int, max_in_flight: Optional[int] = None,
+                 profile_memory: bool = False, profile_dir: Optional[str] = None,
+                 tasks_per_child: Optional[int] = None,
+                 max_worker_rss_mb: Optional[int] = None):
+        """
+        :param: tasks_per_child: Optional number of logs each worker parses
+        before it is replaced by a fresh process.
+        :param: max_worker_rss_mb: Optional memory threshold. Once a worker
+        reports more than this, the pool is drained and replaced with fresh
+        workers.
+        """
+        super().__init__(n_jobs, max_in_flight, profile_memory, profile_dir)
+        self.tasks_per_child = tasks_per_child
+        self.max_worker_rss_mb = max_worker_rss_mb
+
+    def run(self, task_args: List[Tuple]) -> Iterator:
+        """Parse logs in a pool without holding more than max_in_flight tasks.
+
+        Results are yielded as soon as they are ready, and the pool is recycled
+        whenever a worker grows past max_worker_rss_mb."""
+        from worker import init_worker, parse_task
+
+        max_worker_rss = self.max_worker_rss_mb * BYTES_PER_MB \
+            if self.max_worker_rss_mb else None
+        next_idx = 0
+        while next_idx < len(task_args):
+            completed = Queue()
+            in_flight = 0
+            recycle = False
+            with Pool(self.n_jobs, initializer=init_worker,
+                      initargs=(logging.getLogger().level, self.profile_memory,
+                                self.profile_dir),
+                      maxtasksperchild=self.tasks_per_child) as pool:
+                while in_flight or (next_idx < len(task_args) and not recycle):
+                    # Backpressure: only hand the pool more work as results come back.
+                    while not recycle and next_idx < len(task_args) \
+                            and in_flight < self.max_in_flight:
+                        pool.apply_async(parse_task, task_args[next_idx],
+                                         callback=completed.put,
+                                         error_callback=completed.put)
+                        next_idx += 1
+                        in_flight += 1
+                    result = completed.get()
+                    in_flight -= 1
+                    if isinstance(result, BaseException):
+                        raise result
+                    yield result
+                    if max_worker_rss and result.rss and result.rss > max_worker_rss \
+                            and not recycle:
+                        logger.info(f'A worker is using {to_mb(result.rss)}, recycling '
+                                    f'the pool once in-flight logs finish.')
+                        recycle = True
+                pool.close()
+                pool.join()
+
+
+class ThreadExecutor(Executor):
+    name = THREAD
+
+    def run(self, task_args: List[Tuple]) -> Iterator:
+        """Parse logs in a thread pool without holding more than max_in_flight
+        tasks, yielding results as soon as they are ready."""
+        from worker import parse_task
+
+        if self.n_jobs > 1 and gil_enabled():
+            logger.warning('This python has a GIL, so parsing threads take turns '
+                           'instead of running in parallel. Use the process '
+                           'executor, or a free-threaded build of python.')
+        profilers: List[cProfile.Profile] = []
+
+        def init_thread():
+            # Before python 3.12 cProfile only sees the thread that enabled it.
+            # From 3.12 it sees every thread, so the parent's profiler already
+            # covers these, and a second one can't be enabled anyway.
+            if self.profile_dir and sys.version_info < (3, 12):
+                profiler = cProfile.Profile()
+                profiler.enable()
+                profilers.append(profiler)
+
+        try:
+            with ThreadPoolExecutor(self.n_jobs, thread_name_prefix='parse',
+                                    initializer=init_thread) as pool:
+                pending = set()
+                next_idx = 0
+                while pending or next_idx < len(task_args):
+                    while next_idx < len(task_args) and len(pending) < self.max_in_flight:
+                        pending.add(pool.submit(parse_task, *task_args[next_idx]))
+                        next_idx += 1
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+        finally:
+            # Also written when a log fails, for a look at the aborted run.
+            if profilers:
+                from profiling import dump_process_profile
+
+                for profiler in profilers:
+                    dump_process_profile(profiler, self.profile_dir)
+
+
+def make_executor(name: str, n_jobs: int, max_in_flight: Optional[int] = None,
+                  tasks_per_child: Optional[int] = None,
+                  max_worker_rss_mb: Optional[int] = None,
+                  profile_memory: bool = False,
+                  profile_dir: Optional[str] = None) -> Executor:
+    """The named executor backend with n_jobs workers.
+
+    A process executor with one worker parses serially instead, without
+    starting a pool."""
+    if name not in EXECUTORS:
+        raise ValueError(f"Unknown executor {name}. Executors are {', '.join(EXECUTORS)}.")
+    if name == THREAD:
+        if profile_memory:
+            # tracemalloc traces the whole process, so the stages of
+            # concurrent threads would count each other's allocations.
+            raise ValueError('Memory profiling needs the process or serial executor.')
+        if tasks_per_child or max_worker_rss_mb:
+            logger.warning('Threads are never recycled, ignoring tasks_per_child '
+                           'and max_worker_rss_mb.')
+        return ThreadExecutor(n_jobs, max_in_flight, profile_memory, profile_dir)
+    if name == PROCESS and n_jobs > 1:
+        return ProcessExecutor(n_jobs, max_in_flight, profile_memory, profile_dir,
+                               tasks_per_child, max_worker_rss_mb)
+    return Executor(1, max_in_flight, profile_memory, profile_dir)
@@ -0,0 +1,168 @@
+"""Responsible for turning parsed games into a dataframe and saving it."""
+import itertools
+import logging
+import os
+import shutil
+import time
+# Ignore annoying pandas warnings
+import warnings
+from pathlib import Path
+from typing import List, Optional
+
+warnings.simplefilter(action='ignore', category=FutureWarning)
+
+import numpy as np
+import pandas as pd
+
+from arrow_handoff import ArrowBatches
+from column_names import LEAGUE_ID, RAW_NAMES_OFFENSE, RAW_SUMMARY, SUMMARY
+from dtypes import cast_dtypes
+from memprofile import StageProfiler
+
+logger = logging.getLogger(__name__)
+
+
+def to_df_and_save(parsed_games: List[List[dict]],
+                   league_num: str,
+                   export_dir: str,
+                   sqlite_path: Optional[str] = None,
+                   registry_path: Optional[str] = None,
+                   memory_report=None,
+                   columns: Optional[List[str]] = None,
+                   outcome_cube: bool = False,
+                   tensors: bool = False,
+                   tensor_vocab: Optional[str] = None,
+                   segments: bool = False) -> str:
+    """Convert the parsed data to a dataframe and save it in feather format.
+
+    Plays parsed with their summary text also get a text_index of it in the
+    league's export directory. With segments, it covers every segment.
+
+    :param: parsed_games: Each item represents a parsed game, and each game
+    is a list of dictionaries, one dictionary per play. Or the
+    arrow_handoff.ArrowBatches the workers wrote the games to.
+    :param: league_num: The league number from which these games were parsed.
+    :param: export_dir: The directory to save the dataframe to.
+    :param: sqlite_path: Optional SQLite file to also upsert the plays into.
+    :param: registry_path: Optional player registry file. When given, every
+    name column gets a player id column.
+    :param: memory_report: Optional memprofile.MemoryReport to record the
+    memory of each stage to.
+    :param: columns: The column groups and/or columns the games were parsed
+    with, needed to finish games parsed in the vectorized mode.
+    :param: outcome_cube: Whether to also save an outcome_cube.OutcomeCube of
+    the plays to the league's export directory.
+    :param: tensors: Whether to also export the plays as encoded NumPy
+    matrices for training models to the league's export directory.
+    :param: tensor_vocab: Optional vocabulary file to encode the tensors with,
+    shared between leagues and runs, see tensors.export_tensors.
+    :param: segments: Whether to append the plays to the league's segments
+    as a new immutable segment, instead of rewriting its feather file, see
+    segments. The outcome cube is then built from every segment. Tensors
+    can't be exported with segments, their row index needs a single file.
+    :returns: The path of the saved feather file or segment.
+    """
+    if segments and tensors:
+        raise ValueError("Tensors can't be exported with segments.")
+    start_time = time.perf_counter()
+    profiler = memory_report.parent if memory_report else StageProfiler(enabled=False)
+
+    with profiler.stage('frame') as record:
+        if isinstance(parsed_games, ArrowBatches):
+            df = _arrow_to_df(parsed_games)
+        else:
+            all_rows: List[dict] = list(itertools.chain.from_iterable(parsed_games))
+            df: pd.DataFrame = pd.json_normalize(all_rows)
+            del all_rows
+        df.rename(columns=lambda x: x.split('.')[-1], inplace=True)
+        df[LEAGUE_ID] = league_num
+        _record_frame(record, df, profiler)
+    if RAW_SUMMARY in df.columns:
+        from vectorized import extract_summary_columns
+        with profiler.stage('summary_columns') as record:
+            df = extract_summary_columns(df, columns)
+            _record_frame(record, df, profiler)
+    if RAW_NAMES_OFFENSE in df.columns:
+        from vectorized import resolve_names
+        with profiler.stage('resolve_names') as record:
+            df = resolve_names(df)
+            _record_frame(record, df, profiler)
+    with profiler.stage('cast_dtypes') as record:
+        df = cast_dtypes(df)
+        _record_frame(record, df, profiler)
+    if registry_path:
+        from player_registry import add_player_ids
+        with profiler.stage('player_ids') as record:
+            df = add_player_ids(df, registry_path)
+            _record_frame(record, df, profiler)
+    df.reset_index(inplace=True)
+
+    with profiler.stage('save'):
+        export_dir = os.path.join(export_dir, league_num)
+        Path(export_dir).mkdir(parents=True, exist_ok=True)
+        if segments:
+            from segments import append_segment
+            export_path = append_segment(export_dir, df)
+        else:
+            export_path = os.path.join(export_dir, "parsed_logs.fe")
+            df.to_feather(export_path)
+        if sqlite_path:
+            from sqlite_sink import save_plays
+            save_plays(df, sqlite_path)
+    # A segment only has this run's plays, the cube and the text index cover
+    # a snapshot of every segment of the league.
+    league_df, index_source, manifest_version = df, os.path.relpath(export_path, export_dir), None
+    if segments and (outcome_cube or SUMMARY in df.columns):
+        from segments import MANIFEST_FILE, load_manifest, read_league
+        manifest = load_manifest(export_dir)
+        league_df = read_league(export_dir, manifest=manifest)
+        index_source, manifest_version = MANIFEST_FILE, manifest.version
+    if outcome_cube:
+        from outcome_cube import OutcomeCube, CUBE_DIR
+        with profiler.stage('outcome_cube'):
+            OutcomeCube.build(league_df).save(os.path.join(export_dir, CUBE_DIR))
+    if SUMMARY in df.columns:
+        from text_index import build_text_index, TEXT_INDEX_DIR
+        with profiler.stage('text_index'):
+            build_text_index(league_df[SUMMARY], os.path.join(export_dir, TEXT_INDEX_DIR),
+                             index_source, manifest_version)
+    elif not segments:
+        # The index of an earlier export would point at the wrong plays. With
+        # segments it still covers the earlier ones, and searches notice the
+        # new manifest.
+        from text_index import TEXT_INDEX_DIR
+        shutil.rmtree(os.path.join(export_dir, TEXT_INDEX_DIR), ignore_errors=True)
+    del league_df
+    if tensors:
+        from tensors import export_tensors, TENSOR_DIR
+        with profiler.stage('tensors'):
+            export_tensors(df, os.path.join(export_dir, TENSOR_DIR), tensor_vocab)
+    elif not segments:
+        # The row index of earlier tensors points into the old feather file.
+        from tensors import TENSOR_DIR
+        shutil.rmtree(os.path.join(export_dir, TENSOR_DIR), ignore_errors=True)
+    end_time = time.perf_counter()
+    logger.info(f'Took {end_time - start_time} seconds to make the dataframe '
+                f'and save it.')
+    return export_path
+
+
+def _arrow_to_df(batches: ArrowBatches) -> pd.DataFrame:
+    """The concatenated games as a dataframe, like json_normalize makes of the
+    same rows."""
+    df = batches.to_table().to_pandas()
+    # Arrow nulls come back as None, where json_normalize has NaN, e.g. in bool
+    # columns that are missing for some plays, and columns of only nulls are
+    # floats.
+    for column in df.columns:
+        if df[column].dtype == object:
+            missing = df[column].isna()
+            df[column] = np.nan if missing.all() else df[column].where(~missing, np.nan)
+    return df
+
+
+def _record_frame(record: dict, df: pd.DataFrame, profiler: StageProfiler) -> None:
+    """Record the plays and size of the dataframe a stage hands on."""
+    if profiler.enabled:
+        record['plays'] = len(df)
+        record['data_bytes'] = int(df.memory_usage(deep=True).sum())
@@ -0,0 +1,107 @@
+"""Files replaced atomically, and a store of pickled values built on them.
+
+A file is written under a temporary name in its directory and then renamed
+over the target, so readers in any process see either the old file or the
+new one, never a partial write, without locking.
+
+This module must stay free of pandas, workers and telemetry import it."""
+import gzip
+import os
+import pickle
+import tempfile
+from contextlib import contextmanager
+from typing import IO, Any, Iterator, Optional
+
+_ENTRY_SUFFIX = '.pkl.gz'
+
+
+@contextmanager
+def atomic_path(path: str, prefix: Optional[str] = None) -> Iterator[str]:
+    """A temporary path to write the file to, which replaces the file at path
+    if the block succeeds and is removed if it fails.
+
+    :param: prefix: Optional prefix of the temporary file's name, e.g. a dot
+    so that a scraper globbing the directory skips it."""
+    fd, tmp_path = tempfile.mkstemp(prefix=prefix, suffix='.tmp',
+                                    dir=os.path.dirname(os.path.abspath(path)))
+    os.close(fd)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+@contextmanager
+def atomic_open(path: str, mode: str = 'wb', prefix: Optional[str] = None) -> Iterator[IO]:
+    """Open a temporary file to write, which replaces the file at path once
+    it's closed at the end of the block, see atomic_path."""
+    with atomic_path(path, prefix) as tmp_path, open(tmp_path, mode) as tmp_file:
+        yield tmp_file
+
+
+class PickleStore(object):
+    """Values on disk by a hex key, each a gzipped pickle written atomically,
+    so any process can share the store."""
+
+    def __init__(self, store_dir: str, max_entries: Optional[int] = None):
+        """
+        :param: store_dir: The directory of the entries.
+        :param: max_entries: Optional most entries to keep. Storing a value
+        then removes the least recently used entries beyond it.
+        """
+        self._store_dir = store_dir
+        self.max_entries = max_entries
+
+    def get(self, key: str) -> Any:
+        """The value stored under the key, or None if there isn't one."""
+        path = self._path(key)
+        try:
+            with gzip.open(path, 'rb') as entry:
+                value = pickle.load(entry)
+            if self.max_entries is not None:
+                # The modification time is when an entry was last used.
+                os.utime(path)
+        except FileNotFoundError:
+            # Possibly removed by another process pruning the store.
+            return None
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        """Store the value under the key, replacing any earlier one."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with atomic_open(path) as raw, gzip.GzipFile(fileobj=raw, mode='wb',
+                                                     compresslevel=1) as entry:
+            pickle.dump(value, entry, protocol=pickle.HIGHEST_PROTOCOL)
+        if self.max_entries is not None:
+            self.prune(self.max_entries)
+
+    def prune(self, max_entries: int) -> int:
+        """Remove the least recently used entries beyond max_entries.
+
+        :returns: How many entries were removed."""
+        used = []
+        for shard in os.scandir(self._store_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(_ENTRY_SUFFIX):
+                    try:
+                        used.append((entry.stat().st_mtime_ns, entry.path))
+                    except FileNotFoundError:
+                        pass
+        used.sort()
+        removed = 0
+        for _, path in used[:max(len(used) - max_entries, 0)]:
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def _path(self, key: str) -> str:
+        # Sharded by the start of the key, so no directory gets too big.
+        return os.path.join(self._store_dir, key[:2], key + _ENTRY_SUFFIX)
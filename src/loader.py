@@ -1,8 +1,8 @@
 """Responsible for loading game logs from a directory."""
-import glob
 import logging
+import os
 import re
-from typing import List, Tuple, Any
+from typing import List, NamedTuple, Optional, Tuple, Any
 
 # noinspection PyUnresolvedReferences
 import cchardet
@@ -12,26 +12,116 @@ logger = logging.getLogger(__name__)
 
 # Regex gets the season year of the given game log.
 _YEAR_REGEX = r'(?<=log)\d{4}'
+_LOG_PREFIX = 'log'
+_LOG_SUFFIX = '.html'
+_DIGITS_REGEX = re.compile(r'\d+')
 
 
-def game_log_paths(log_dir: str) -> List[str]:
-    """Get all game log paths in the given directory.
+class LogFilter(NamedTuple):
+    """Which game logs to find. Every filter is optional and inclusive."""
+    # The range of seasons, from the year in the log's file name.
+    min_season: Optional[int] = None
+    max_season: Optional[int] = None
+    # The range of file sizes in bytes.
+    min_bytes: Optional[int] = None
+    max_bytes: Optional[int] = None
+    # The range of modification times, in seconds since the epoch.
+    modified_after: Optional[float] = None
+    modified_before: Optional[float] = None
 
-    :param: log_dir: The directory path containing the game logs."""
-    game_log_path_regex = f"{log_dir}\\log*.html"
-    all_paths = glob.glob(pathname=game_log_path_regex)
-    logger.info(f"Found {len(all_paths)} game logs.")
-    return all_paths
+    def needs_stat(self) -> bool:
+        return any(bound is not None for bound in (self.min_bytes, self.max_bytes,
+                                                   self.modified_after,
+                                                   self.modified_before))
+
+
+def game_log_paths(log_dir: str, log_filter: Optional[LogFilter] = None) -> List[str]:
+    """Get the game log paths in the given directory, on any OS.
+
+    Logs are found with a single os.scandir pass without opening any of them,
+    and only the size and modification time filters need to stat them.
+
+    :param: log_dir: The directory path containing the game logs.
+    :param: log_filter: Optional filters on the season, size and modification
+    time of the logs.
+    :returns: The paths in a deterministic order, by season and then by the
+    numbers in their names, e.g. log2023_2.html before log2023_10.html.
+    """
+    log_filter = log_filter or LogFilter()
+    needs_stat = log_filter.needs_stat()
+    found = []
+    with os.scandir(log_dir) as entries:
+        for entry in entries:
+            name = entry.name
+            # FOF runs on Windows, where file names are case insensitive.
+            lower_name = name.lower()
+            if not (lower_name.startswith(_LOG_PREFIX) and lower_name.endswith(_LOG_SUFFIX)):
+                continue
+            if not _season_in_range(name, log_filter):
+                continue
+            if needs_stat and not _stat_in_range(entry, log_filter):
+                continue
+            if not entry.is_file():
+                continue
+            found.append((_natural_sort_key(lower_name), entry.path))
+    found.sort()
+    logger.info(f"Found {len(found)} game logs.")
+    return [path for _, path in found]
+
+
+def _season_in_range(name: str, log_filter: LogFilter) -> bool:
+    if log_filter.min_season is None and log_filter.max_season is None:
+        return True
+    year = re.search(_YEAR_REGEX, name, re.IGNORECASE)
+    if year is None:
+        return False
+    year = int(year[0])
+    return ((log_filter.min_season is None or year >= log_filter.min_season) and
+            (log_filter.max_season is None or year <= log_filter.max_season))
+
+
+def _stat_in_range(entry: os.DirEntry, log_filter: LogFilter) -> bool:
+    # Windows fills in the stat while scanning, other OSes make one call.
+    stat = entry.stat()
+    return ((log_filter.min_bytes is None or stat.st_size >= log_filter.min_bytes) and
+            (log_filter.max_bytes is None or stat.st_size <= log_filter.max_bytes) and
+            (log_filter.modified_after is None or
+             stat.st_mtime >= log_filter.modified_after) and
+            (log_filter.modified_before is None or
+             stat.st_mtime <= log_filter.modified_before))
+
+
+def _natural_sort_key(name: str) -> Tuple:
+    """Sort by the numbers in the file name by value, then by the name."""
+    return tuple(map(int, _DIGITS_REGEX.findall(name))), name
 
 
 def get_log_participation_year(game_log_path: str) -> Tuple[Any, Any, int]:
     """Parses a single game log path as a tuple with beautifulSoup objects."""
     with open(game_log_path, 'r') as game_log_file:
-        year = int(re.search(_YEAR_REGEX, game_log_path)[0])
+        year = log_year(game_log_path)
         contents = game_log_file.read()
+    plays, participation_table = get_log_participation(contents)
+    return plays, participation_table, year
+
+
+def log_year(game_log_path: str) -> int:
+    """The season year in the name of the game log, e.g. 2023 for log2023_1.html."""
+    return int(re.search(_YEAR_REGEX, os.path.basename(game_log_path), re.IGNORECASE)[0])
+
+
+def log_game_id(game_log_path: str) -> str:
+    """The id of the game, the name of its log without the extension."""
+    return os.path.splitext(os.path.basename(game_log_path))[0]
+
+
+def get_log_participation(contents: str) -> Tuple[Any, Any]:
+    """Parses the html of a single game log with beautifulSoup.
+
+    :returns: The rows of the play by play, and the participation tables."""
     game_log_soup = bs(contents, 'lxml')
     play_by_play = game_log_soup.table
     plays = play_by_play.children
     # Used to identify who was the home team or away team.
     participation_table = game_log_soup.find_all('table')[-2:]
-    return plays, participation_table, year
+    return plays, participation_table
@@ -0,0 +1,49 @@
+"""Helpers for measuring the memory used by the parent and worker processes."""
+import os
+import sys
+from typing import Optional
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows.
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+BYTES_PER_MB = 1024 * 1024
+
+
+def current_rss_bytes() -> Optional[int]:
+    """The resident set size of this process right now, or None if unknown."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm', 'r') as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """The peak resident set size of this process, or None if unknown."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS reports bytes.
+        return peak if sys.platform == 'darwin' else peak * 1024
+    if psutil is not None:
+        memory_info = psutil.Process().memory_info()
+        # Windows tracks the peak working set for us.
+        return getattr(memory_info, 'peak_wset', memory_info.rss)
+    return None
+
+
+def to_mb(num_bytes: Optional[int]) -> str:
+    """Format a byte count for logging."""
+    if num_bytes is None:
+        return 'unknown'
+    return f'{num_bytes / BYTES_PER_MB:.1f} MB'
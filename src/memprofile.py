@@ -0,0 +1,172 @@
+"""Opt-in memory profiling of each stage of the pipeline.
+
+Running out of memory on a big league doesn't say which stage was to blame:
+the soup tree, the lists of row dicts, json_normalize or the copies made by
+cast_dtypes. With profiling on, every stage records its peak and retained
+python allocations with tracemalloc, the RSS of its process, and the bytes
+per play of what it hands to the next stage. Garbage is collected before
+each stage, so a stage's retained allocations are its own.
+
+Workers profile their own stages and send the records back with their
+results, where they are combined into a MemoryReport with the parent's stages.
+tracemalloc slows parsing down a lot, so this is only for diagnosing memory.
+
+This module must stay free of pandas, workers import it."""
+import dataclasses
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from memory import current_rss_bytes, peak_rss_bytes
+
+# The absolute tracemalloc peaks of the stages currently running, innermost
+# last. Starting a stage resets the peak, so each stage passes its peak on to
+# the stage around it when it ends.
+_open_stage_peaks: List[int] = []
+
+
+class StageProfiler(object):
+    """Records the memory of each stage run in this process.
+
+    When disabled, stages only run their body, so callers don't need to check.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.stages: Dict[str, Dict] = {}
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[Dict]:
+        """Profile the body as the named stage.
+
+        Yields the stage's record, where the body can set `plays`, how many
+        plays it hands on, and `data_bytes`, the size of what it hands on, or
+        set it later with set_data_bytes. Without both, the stage has no
+        bytes per play."""
+        record: Dict = {}
+        if not self.enabled:
+            yield record
+            return
+        # Garbage of earlier stages and logs, e.g. soup trees, would otherwise
+        # be freed whenever the collector runs, in whichever stage that is.
+        gc.collect()
+        start_traced, _ = tracemalloc.get_traced_memory()
+        rss_before = current_rss_bytes()
+        _open_stage_peaks.append(start_traced)
+        tracemalloc.reset_peak()
+        start_time = time.perf_counter()
+        try:
+            yield record
+        finally:
+            seconds = time.perf_counter() - start_time
+            end_traced, traced_peak = tracemalloc.get_traced_memory()
+            peak = max(traced_peak, _open_stage_peaks.pop())
+            if _open_stage_peaks:
+                _open_stage_peaks[-1] = max(_open_stage_peaks[-1], peak)
+            record.update({'seconds': seconds,
+                           'peak_bytes': peak - start_traced,
+                           'retained_bytes': end_traced - start_traced,
+                           'rss_before': rss_before,
+                           'rss_after': current_rss_bytes(),
+                           'peak_rss': peak_rss_bytes(),
+                           'pid': os.getpid()})
+            plays = record.get('plays')
+            if plays and 'data_bytes' in record:
+                record['bytes_per_play'] = record['data_bytes'] / plays
+            self.stages[name] = record
+
+    def set_data_bytes(self, name: str, data_bytes: int) -> None:
+        """Set the size of what a finished stage handed on, for sizes that
+        would add to the stage's allocations if measured in it."""
+        record = self.stages[name]
+        record['data_bytes'] = data_bytes
+        if record.get('plays'):
+            record['bytes_per_play'] = data_bytes / record['plays']
+
+
+class MemoryReport(object):
+    """Combines the stage records of the workers and the parent of a run."""
+
+    def __init__(self):
+        self._worker_records: Dict[str, List[Dict]] = defaultdict(list)
+        self._worker_peaks: Dict[int, int] = {}
+        self.parent = StageProfiler()
+
+    def add_worker_stages(self, stages: Dict[str, Dict]) -> None:
+        """Add the stage records of one log parsed by a worker."""
+        for name, record in stages.items():
+            self._worker_records[name].append(record)
+            if record.get('peak_rss') is not None:
+                pid = record['pid']
+                self._worker_peaks[pid] = max(record['peak_rss'],
+                                              self._worker_peaks.get(pid, 0))
+
+    def to_dict(self) -> Dict:
+        worker_stages = {}
+        for name, records in self._worker_records.items():
+            plays = sum(record.get('plays', 0) for record in records)
+            handed_on = _total_data_bytes(records)
+            worker_stages[name] = {
+                'logs': len(records),
+                'plays': plays,
+                'seconds': sum(record['seconds'] for record in records),
+                'max_peak_bytes': max(record['peak_bytes'] for record in records),
+                'mean_peak_bytes': sum(record['peak_bytes'] for record in records)
+                / len(records),
+                'mean_retained_bytes': sum(record['retained_bytes'] for record in records)
+                / len(records),
+                'bytes_per_play': handed_on / plays if plays and handed_on is not None
+                else None,
+            }
+        return {'worker_stages': worker_stages,
+                'worker_peak_rss': {str(pid): peak for pid, peak in self._worker_peaks.items()},
+                'parent_stages': self.parent.stages}
+
+
+def deep_size_bytes(obj: Any) -> int:
+    """The bytes of the object and everything it holds, counting objects it
+    holds more than once only once, e.g. for the plays a stage hands on.
+
+    Only builtin containers and dataclasses are followed."""
+    seen = set()
+    total = 0
+    pending = [obj]
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            pending.extend(obj.keys())
+            pending.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            pending.extend(obj)
+        elif dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+            pending.extend(getattr(obj, field.name) for field in dataclasses.fields(obj))
+            if hasattr(obj, '__dict__'):
+                total += sys.getsizeof(obj.__dict__)
+    return total
+
+
+def _total_data_bytes(records: List[Dict]) -> Optional[int]:
+    """The bytes the records' stages handed on, or None if a record doesn't
+    know."""
+    if not all('data_bytes' in record for record in records):
+        return None
+    return sum(record['data_bytes'] for record in records)
+
+
+def save_reports(path: str, reports: Dict[str, MemoryReport]) -> None:
+    """Write the memory report of each league to a JSON file."""
+    with open(path, 'w') as report_file:
+        json.dump({league: report.to_dict() for league, report in reports.items()},
+                  report_file, indent=2)
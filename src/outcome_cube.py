@@ -0,0 +1,264 @@
+"""A dense NumPy cube of play outcomes by game situation.
+
+Strategy tools ask the same questions over and over: in this down, distance,
+field zone, offensive formation and coverage, how many yards are gained, how
+often are passes completed and how often is the quarterback sacked. Rather
+than filtering the plays each time, the exporter counts them once into a cube
+with one axis per situation column:
+* `measures` holds the count of plays, passes, throws, completions, sacks
+  and the sum and sum of squares of the yards gained in each cell.
+* `yards_hist` holds a histogram of the yards gained in each cell.
+
+Both are saved as .npy files next to a JSON file of the axis labels, and are
+memory-mapped when loaded, so a query is a numpy index and a sum over the
+axes it leaves open.
+"""
+import json
+import logging
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from column_names import (COVERAGE, DISTANCE, DOWN, OFF_FORMATION, OPP_HALF, PLAY_TYPE,
+                          SACKED, SCRAMBLE, COMPLETE, YARDLINE, YARDS)
+from dtypes import CATEGORICAL_COLS
+
+logger = logging.getLogger(__name__)
+
+# The cube's directory in a league's export directory.
+CUBE_DIR = 'outcome_cube'
+MEASURES_FILE = 'measures.npy'
+YARDS_HIST_FILE = 'yards_hist.npy'
+AXES_FILE = 'axes.json'
+
+# Axes bucketed from a number. Each bucket starts at its edge and ends before
+# the next one.
+DISTANCE_BUCKET = 'distance_bucket'
+FIELD_ZONE = 'field_zone'
+_BUCKET_EDGES: Dict[str, List[int]] = {
+    DOWN: [1, 2, 3, 4],
+    DISTANCE_BUCKET: [1, 4, 7, 11, 16],
+    # By yards to the opponent's goal line.
+    FIELD_ZONE: [1, 11, 21, 51, 81],
+}
+# The column each bucketed axis is computed from.
+_BUCKET_COLUMNS = {DISTANCE_BUCKET: DISTANCE, FIELD_ZONE: YARDLINE}
+
+# Bucketed axes whose last bucket holds a single value.
+_CLOSED_BUCKETS = {DOWN}
+
+DEFAULT_AXES = [DOWN, DISTANCE_BUCKET, FIELD_ZONE, OFF_FORMATION, COVERAGE]
+
+MEASURES = ['plays', 'passes', 'throws', 'completions', 'sacks', 'yards_sum', 'yards_sq_sum']
+
+# Yards outside this range are counted in the first or last bin.
+MIN_HIST_YARDS = -10
+MAX_HIST_YARDS = 50
+
+# Refuse to build cubes so sparse that they would waste a lot of memory.
+_MAX_CELLS = 20_000_000
+
+
+@dataclass(frozen=True)
+class CubeStats:
+    # Plays with a parsed outcome in the cells queried.
+    plays: int
+    # Passing plays, including sacks and scrambles.
+    passes: int
+    # Completions per pass thrown, NaN without any throws.
+    completion_rate: float
+    # Sacks per passing play, NaN without any passes.
+    sack_rate: float
+    # The mean and standard deviation of the yards gained.
+    mean_yards: float
+    std_yards: float
+    # How many plays gained each number of yards, from MIN_HIST_YARDS to
+    # MAX_HIST_YARDS.
+    yards_hist: np.ndarray
+
+
+class OutcomeCube(object):
+    """Counts and sums of play outcomes over the situation axes."""
+
+    def __init__(self, axes: Dict[str, List[str]], measures: np.ndarray,
+                 yards_hist: np.ndarray):
+        """
+        :param: axes: The labels of every axis, in the order of the axes.
+        :param: measures: The MEASURES of every cell, as a last axis.
+        :param: yards_hist: The yards histogram of every cell, as a last axis.
+        """
+        self.axes = axes
+        self.measures = measures
+        self.yards_hist = yards_hist
+        self._label_indexes = {axis: {label: idx for idx, label in enumerate(labels)}
+                               for axis, labels in axes.items()}
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, axes: Sequence[str] = DEFAULT_AXES) -> 'OutcomeCube':
+        """Count the plays of the exported dataframe into a cube.
+
+        :param: df: The exported plays.
+        :param: axes: The axes of the cube, from the bucketed axes and
+        dtypes.CATEGORICAL_COLS. Plays missing a value of any axis are left out.
+        """
+        for axis in axes:
+            if axis not in _BUCKET_EDGES and axis not in CATEGORICAL_COLS:
+                raise ValueError(f"Unknown cube axis {axis}. Axes are "
+                                 f"{', '.join(_BUCKET_EDGES)} or categorical columns.")
+        needed = [YARDS, PLAY_TYPE] + [_BUCKET_COLUMNS.get(axis, axis) for axis in axes]
+        missing = [column for column in needed if column not in df.columns]
+        if missing:
+            raise ValueError(f"The plays have no {', '.join(missing)} column to build "
+                             f"the outcome cube from.")
+        yards = pd.to_numeric(df[YARDS], errors='coerce').to_numpy(dtype=float)
+        keep = ~np.isnan(yards)
+        axis_labels: Dict[str, List[str]] = {}
+        codes = []
+        for axis in axes:
+            labels, axis_codes = _axis_codes(df, axis)
+            axis_labels[axis] = labels
+            codes.append(axis_codes)
+            keep &= axis_codes >= 0
+        shape = tuple(len(labels) for labels in axis_labels.values())
+        cells = int(np.prod(shape))
+        if cells > _MAX_CELLS:
+            raise ValueError(f'A cube over {list(axes)} would have {cells} cells, '
+                             f'use fewer or coarser axes.')
+
+        flat = np.ravel_multi_index([axis_codes[keep] for axis_codes in codes], shape) \
+            if axes else np.zeros(int(keep.sum()), dtype=np.intp)
+        yards = yards[keep]
+        passing = (df[PLAY_TYPE].astype(object) == 'pass').to_numpy()[keep]
+        sacked = passing & _flag(df, SACKED)[keep]
+        thrown = passing & ~sacked & ~_flag(df, SCRAMBLE)[keep]
+        completed = thrown & _flag(df, COMPLETE)[keep]
+
+        measures = np.empty((cells, len(MEASURES)), dtype=np.int64)
+        for column, weights in enumerate([None, passing, thrown, completed, sacked,
+                                          yards, yards * yards]):
+            measures[:, column] = np.bincount(flat, weights=weights, minlength=cells)
+        hist_bins = MAX_HIST_YARDS - MIN_HIST_YARDS + 1
+        hist_codes = np.clip(yards, MIN_HIST_YARDS, MAX_HIST_YARDS).astype(np.intp) \
+            - MIN_HIST_YARDS
+        yards_hist = np.bincount(flat * hist_bins + hist_codes,
+                                 minlength=cells * hist_bins).astype(np.int32)
+        logger.info(f'Built an outcome cube of {int(keep.sum())} plays over {list(axes)}, '
+                    f'{cells} cells.')
+        return cls(axis_labels, measures.reshape(shape + (len(MEASURES),)),
+                   yards_hist.reshape(shape + (hist_bins,)))
+
+    def save(self, cube_dir: str) -> None:
+        """Save the cube to a directory, replacing any cube saved there."""
+        os.makedirs(cube_dir, exist_ok=True)
+        np.save(os.path.join(cube_dir, MEASURES_FILE), self.measures)
+        np.save(os.path.join(cube_dir, YARDS_HIST_FILE), self.yards_hist)
+        with open(os.path.join(cube_dir, AXES_FILE), 'w') as axes_file:
+            json.dump({'axes': self.axes, 'measures': MEASURES,
+                       'bucket_edges': {axis: _BUCKET_EDGES[axis] for axis in self.axes
+                                        if axis in _BUCKET_EDGES},
+                       'hist_yards': [MIN_HIST_YARDS, MAX_HIST_YARDS]}, axes_file)
+
+    @classmethod
+    def load(cls, cube_dir: str, mmap: bool = True) -> 'OutcomeCube':
+        """Load a saved cube, memory-mapping its arrays unless mmap is False."""
+        mmap_mode = 'r' if mmap else None
+        with open(os.path.join(cube_dir, AXES_FILE)) as axes_file:
+            axes = json.load(axes_file)['axes']
+        # Plain ndarray views of the mappings index faster than np.memmap.
+        return cls(axes,
+                   np.asarray(np.load(os.path.join(cube_dir, MEASURES_FILE),
+                                      mmap_mode=mmap_mode)),
+                   np.asarray(np.load(os.path.join(cube_dir, YARDS_HIST_FILE),
+                                      mmap_mode=mmap_mode)))
+
+    def query(self, **values: Union[str, int, None]) -> CubeStats:
+        """The outcomes of the plays in a situation.
+
+        Axes are given by name, e.g. `query(down=3, distance_bucket=7,
+        field_zone=35, coverage='Cover 2')`. Bucketed axes take a number,
+        i.e. the yards to go or to the goal line, or a bucket label. Axes
+        that aren't given, or are None, cover every value.
+        """
+        index = tuple(self._index(axis, values.pop(axis, None)) for axis in self.axes)
+        if values:
+            raise ValueError(f"Unknown cube axes {', '.join(values)}. The axes are "
+                             f"{', '.join(self.axes)}.")
+        measures = self.measures[index]
+        yards_hist = self.yards_hist[index]
+        if measures.ndim > 1:
+            open_axes = tuple(range(measures.ndim - 1))
+            measures = measures.sum(axis=open_axes)
+            yards_hist = yards_hist.sum(axis=open_axes)
+        plays, passes, throws, completions, sacks, yards_sum, yards_sq_sum = \
+            (int(value) for value in measures)
+        mean_yards = yards_sum / plays if plays else np.nan
+        variance = yards_sq_sum / plays - mean_yards ** 2 if plays else np.nan
+        return CubeStats(plays=plays, passes=passes,
+                         completion_rate=completions / throws if throws else np.nan,
+                         sack_rate=sacks / passes if passes else np.nan,
+                         mean_yards=mean_yards,
+                         std_yards=float(np.sqrt(max(variance, 0.0))) if plays else np.nan,
+                         yards_hist=np.asarray(yards_hist))
+
+    def _index(self, axis: str, value: Union[str, int, None]) -> Union[int, slice]:
+        if value is None:
+            return slice(None)
+        labels = self._label_indexes[axis]
+        if isinstance(value, str) or axis not in _BUCKET_EDGES:
+            value = str(value)
+            if value not in labels:
+                raise KeyError(f'{value} is not a value of the {axis} axis.')
+            return labels[value]
+        edges = _BUCKET_EDGES[axis]
+        if value < edges[0] or (axis in _CLOSED_BUCKETS and value > edges[-1]):
+            raise KeyError(f'{value} is not a value of the {axis} axis.')
+        return int(np.searchsorted(edges, value, side='right')) - 1
+
+
+def _axis_codes(df: pd.DataFrame, axis: str):
+    """The labels of an axis, and the code of each play, or -1 if it's missing."""
+    if axis in _BUCKET_EDGES:
+        edges = _BUCKET_EDGES[axis]
+        values = _bucket_values(df, axis)
+        codes = np.searchsorted(edges, values, side='right') - 1
+        codes[np.isnan(values) | (values < edges[0])] = -1
+        if axis in _CLOSED_BUCKETS:
+            codes[values > edges[-1]] = -1
+        return _bucket_labels(edges, axis in _CLOSED_BUCKETS), codes.astype(np.intp)
+    values = df[axis].astype(object).where(df[axis].notna(), None)
+    categorical = pd.Categorical(values.map(lambda value: None if value is None
+                                            else str(value)))
+    return [str(label) for label in categorical.categories], \
+        np.asarray(categorical.codes, dtype=np.intp)
+
+
+def _bucket_values(df: pd.DataFrame, axis: str) -> np.ndarray:
+    if axis == FIELD_ZONE:
+        yardline = pd.to_numeric(df[YARDLINE], errors='coerce').to_numpy(dtype=float)
+        opponents_half = _flag(df, OPP_HALF)
+        # Yards to the opponent's goal line.
+        return np.where(opponents_half, yardline, 100 - yardline)
+    column = _BUCKET_COLUMNS.get(axis, axis)
+    return pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=float)
+
+
+def _bucket_labels(edges: List[int], closed: bool) -> List[str]:
+    labels = []
+    for start, end in zip(edges, edges[1:] + [None]):
+        if end is None and not closed:
+            labels.append(f'{start}+')
+        elif end is None or end == start + 1:
+            labels.append(str(start))
+        else:
+            labels.append(f'{start}-{end - 1}')
+    return labels
+
+
+def _flag(df: pd.DataFrame, column: str) -> np.ndarray:
+    """A bool column as an array, False where it's missing."""
+    if column not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    return df[column].astype(object).eq(True).to_numpy(dtype=bool)
@@ -1,118 +1,256 @@
-"""Script for efficiently parsing multiple game log files."""
+"""Script for efficiently parsing multiple game log files.
+
+Only the standard library is imported at module level so the script starts
+quickly, and so spawned workers that re-import this module as __main__ don't
+pay for pandas. Everything else is imported where it is first needed."""
 
 import argparse
-import itertools
 import logging
 import os
 import time
-# Ignore annoying pandas warnings
-import warnings
-from dataclasses import asdict
-from multiprocessing import Pool, cpu_count
-from pathlib import Path
-from typing import List, Dict
-
-warnings.simplefilter(action='ignore', category=FutureWarning)
+from typing import List, Optional
 
-import pandas as pd
+from memory import peak_rss_bytes, to_mb
 
-from column_names import LEAGUE_ID
-from dtypes import cast_dtypes
-from loader import get_log_participation_year, game_log_paths
-from parsing.game_log_parsing import parse_full_game, ParsedPlay
-
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-_NUM_PROCESSES = cpu_count()
-
-logger.info(f"Using {_NUM_PROCESSES} processes to parse logs.")
-
-
-def parse_one_log(path: str, idx: int) -> List[Dict]:
-    """Worker task to parse the game log at the given path."""
-    log_data = get_log_participation_year(path)
-    raw_log, participation, year = log_data
-    parsed: List[ParsedPlay] = parse_full_game(raw_log, participation)
-    parsed_dicts = [asdict(parsed_play) for parsed_play in parsed]
-    for parsed_dict in parsed_dicts:
-        parsed_dict.update({"year": year})
-
-    if idx % 100 == 0:
-        logger.info(f'Successfully parsed game log {idx}.')
-    return parsed_dicts
-
 
-def load_and_parse(league_log_dir: str, max_to_parse=None, n_jobs=_NUM_PROCESSES) -> List[List[
-    dict]]:
+def load_and_parse(league_log_dir: str, max_to_parse=None, n_jobs: Optional[int] = None,
+                   max_in_flight: Optional[int] = None,
+                   tasks_per_child: Optional[int] = None,
+                   max_worker_rss_mb: Optional[int] = None,
+                   columns: Optional[List[str]] = None,
+                   paths: Optional[List[str]] = None,
+                   index_dir: Optional[str] = None,
+                   memory_report=None,
+                   profile_dir: Optional[str] = None,
+                   parse_mode: str = 'per_play',
+                   handoff_dir: Optional[str] = None,
+                   executor: str = 'process',
+                   metrics_file=None,
+                   progress_interval: Optional[float] = None,
+                   keep_summary: bool = False):
     """Load all the game logs in the given directory and parse them.
     :param: league_log_dir: The directory with league game logs.
     :param: max_to_parse: Optional parameter to limit how many game logs to
     parse.
+    :param: n_jobs: How many processes or threads to parse with. Defaults to
+    the number of CPUs.
+    :param: max_in_flight: The most logs that may be queued or parsing in the
+    pool at once. Defaults to a few per worker.
+    :param: tasks_per_child: Optional number of logs each worker parses before
+    it is replaced by a fresh process.
+    :param: max_worker_rss_mb: Optional memory threshold. Once a worker reports
+    more than this, the pool is drained and replaced with fresh workers.
+    :param: columns: Optional column groups and/or columns to parse, see
+    schema.column_groups. Defaults to every column.
+    :param: paths: Optional game log paths to parse instead of every log in
+    league_log_dir, e.g. a sample.
+    :param: index_dir: Optional directory of a content hash index shared
+    across leagues and runs. Logs that were already parsed, e.g. copies in
+    another league, reuse their rows instead of being parsed again.
+    :param: memory_report: Optional memprofile.MemoryReport to record the
+    memory of every stage in the workers and the parent to.
+    :param: profile_dir: Optional directory each worker writes its cProfile
+    stats to when it exits, see profiling.
+    :param: parse_mode: Either 'per_play', or 'vectorized' to leave the fields
+    in the summary text to be extracted for the whole league at once when the
+    games are exported.
+    :param: handoff_dir: Optional directory for the workers to write each game
+    to as an Arrow IPC file, e.g. on /dev/shm, instead of pickling its rows.
+    :param: executor: The backend to parse with, 'process', 'thread' or
+    'serial', see executors.
+    :param: metrics_file: Optional telemetry.MetricsFile to write the
+    league's progress to, e.g. one shared by every league of a run.
+    :param: progress_interval: The least seconds between progress logs and
+    metrics file writes. Defaults to telemetry.DEFAULT_INTERVAL.
+    :param: keep_summary: Whether to keep each play's summary text as a
+    column, which export.to_df_and_save also indexes for searching.
+    :returns: The rows of each game or, with a handoff_dir, the
+    arrow_handoff.ArrowBatches of the games. Either can be exported with
+    export.to_df_and_save.
     """
+    from loader import game_log_paths
+    from memprofile import StageProfiler
+    from executors import make_executor
+    from telemetry import DEFAULT_INTERVAL, ProgressTracker
+
     start_time = time.perf_counter()
-    paths = game_log_paths(league_log_dir)
+    n_jobs = n_jobs or os.cpu_count()
+    paths = game_log_paths(league_log_dir) if paths is None else paths
     paths = paths[:max_to_parse] if max_to_parse else paths
-    logging.info(f'About to parse {len(paths)} game logs.')
-    if n_jobs > 1:
-        with Pool(_NUM_PROCESSES) as pool:
-            results = [pool.apply_async(parse_one_log, (path, idx)) for idx, path in
-                       enumerate(paths)]
-            parsed_data = [res.get() for res in results]
-            end_time = time.perf_counter()
-            logger.info(f'Took {end_time - start_time} seconds to parse '
-                        f'{len(results)}  logs.')
-        return parsed_data
-    else:
-        results = []
-        for idx, path in enumerate(paths):
-            results.append(parse_one_log(path, idx))
-        return results
+    batches = None
+    if handoff_dir:
+        from arrow_handoff import ArrowBatches
 
+        batches = ArrowBatches.create(len(paths), handoff_dir)
+    task_args = [(path, idx, columns, index_dir, parse_mode,
+                  batches.handoff_dir if batches is not None else None, keep_summary)
+                 for idx, path in enumerate(paths)]
+    profile_memory = memory_report is not None
+    parse_executor = make_executor(executor, n_jobs, max_in_flight, tasks_per_child,
+                                   max_worker_rss_mb, profile_memory, profile_dir)
+    logger.info(f'About to parse {len(paths)} game logs using the {parse_executor.name} '
+                f'executor with {parse_executor.n_jobs} workers.')
 
-def to_df_and_save(parsed_games: List[List[dict]],
-                   league_num: str,
-                   export_dir: str) -> None:
-    """Convert the parsed data to a dataframe and save it in feather format.
-
-    :param: parsed_games: Each item represents a parsed game, and each game
-    is a list of dictionaries, one dictionary per play.
-    :param: league_num: The league number from which these games were parsed.
-    :param: export_dir: The directory to save the dataframe to.
-    """
-    start_time = time.perf_counter()
-
-    all_rows: List[dict] = list(itertools.chain.from_iterable(parsed_games))
-    df: pd.DataFrame = pd.json_normalize(all_rows)
-    df.rename(columns=lambda x: x.split('.')[-1], inplace=True)
-    df[LEAGUE_ID] = league_num
-    df = cast_dtypes(df)
-    df.reset_index(inplace=True)
-
-    export_dir = os.path.join(export_dir, league_num)
-    Path(export_dir).mkdir(parents=True, exist_ok=True)
-    export_path = os.path.join(export_dir, "parsed_logs.fe")
-    df.to_feather(export_path)
+    parsed_data: List[Optional[List[dict]]] = [None] * len(paths)
+    worker_peak = None
+    num_reused = 0
+    profiler = memory_report.parent if profile_memory else StageProfiler(enabled=False)
+    progress = ProgressTracker(os.path.basename(os.path.normpath(league_log_dir)), len(paths),
+                               parse_executor.n_jobs, progress_interval or DEFAULT_INTERVAL,
+                               metrics_file)
+    try:
+        with profiler.stage('collect') as record:
+            for result in parse_executor.run(task_args):
+                progress.record(result)
+                if result.batch_path:
+                    batches.add(result.idx, result.batch_path, result.plays)
+                else:
+                    parsed_data[result.idx] = result.rows
+                num_reused += result.reused
+                if result.peak_rss is not None:
+                    worker_peak = max(result.peak_rss, worker_peak or 0)
+                if result.stages:
+                    memory_report.add_worker_stages(result.stages)
+            record['plays'] = batches.plays if batches is not None else \
+                sum(len(rows) for rows in parsed_data)
+    except BaseException:
+        progress.abort()
+        progress.report()
+        if batches is not None:
+            batches.cleanup()
+        raise
+    progress.finish()
     end_time = time.perf_counter()
-    logger.info(f'Took {end_time - start_time} seconds to make the dataframe '
-                f'and save it.')
-    return
+    logger.info(f'Took {end_time - start_time} seconds to parse '
+                f'{len(parsed_data)}  logs.')
+    if index_dir:
+        logger.info(f'Reused the parsed rows of {num_reused} logs parsed before.')
+    if parse_executor.separate_processes:
+        logger.info(f'Peak memory: parent {to_mb(peak_rss_bytes())}, '
+                    f'largest worker {to_mb(worker_peak)}.')
+    else:
+        logger.info(f'Peak memory: {to_mb(peak_rss_bytes())}.')
+    return parsed_data if batches is None else batches
 
 
 def main(args):
     """Parse games and save them as a feather file."""
+    from export import to_df_and_save
+    from loader import game_log_paths
+    from memprofile import MemoryReport, save_reports
+    from schema.column_groups import resolve_columns
+
+    memory_reports = {}
+    metrics_file = None
+    if args.metrics_file:
+        from telemetry import MetricsFile
+
+        metrics_file = MetricsFile(args.metrics_file)
+    columns = args.columns.split(",") if args.columns else None
+    # Fail on unknown columns and options that don't go together before
+    # parsing anything.
+    resolve_columns(columns)
+    if args.segments and args.tensors:
+        raise ValueError("--tensors can't be used with --segments, the tensors' "
+                         "row index needs a single feather file.")
+    if args.sample and args.max_to_parse:
+        raise ValueError("--max_to_parse can't be used with --sample, it would cut "
+                         "off the last seasons of the sample. Use a smaller --sample.")
+    log_filter = _log_filter(args)
+    profiler = None
+    if args.profile:
+        from profiling import prepare_profile_dir, start_parent_profile
+
+        prepare_profile_dir(args.profile)
+        # Workers profile themselves, this profiles the parent, which also
+        # does the parsing when there's only one process.
+        profiler = start_parent_profile()
     leagues = args.league_ids.split(",")
     for league in leagues:
         league_log_dir = os.path.join(args.logs_dir, league)
-        parsed = load_and_parse(league_log_dir, args.max_to_parse)
-        to_df_and_save(parsed, league, args.export_dir)
+        start_time = time.perf_counter()
+        all_paths = game_log_paths(league_log_dir, log_filter)
+        paths = all_paths
+        if args.sample:
+            from sampling import stratified_sample
 
-def one_thread(league_ids, logs_dir, max_to_parse, export_dir):
-    leagues = league_ids.split(",")
-    for league in leagues:
-        league_log_dir = os.path.join(logs_dir, league)
-        parsed = load_and_parse(league_log_dir, max_to_parse, n_jobs=1)
-        to_df_and_save(parsed, league, export_dir)
+            paths = stratified_sample(all_paths, args.sample, args.seed,
+                                      args.stratify_by_team)
+        memory_report = MemoryReport() if args.memory_report else None
+        parsed = load_and_parse(league_log_dir, args.max_to_parse,
+                                max_in_flight=args.max_in_flight,
+                                tasks_per_child=args.tasks_per_child,
+                                max_worker_rss_mb=args.max_worker_rss_mb,
+                                columns=columns,
+                                paths=paths,
+                                index_dir=args.dedup_dir,
+                                memory_report=memory_report,
+                                profile_dir=args.profile,
+                                parse_mode=args.parse_mode,
+                                handoff_dir=args.handoff_dir,
+                                n_jobs=args.n_jobs,
+                                executor=args.executor,
+                                metrics_file=metrics_file,
+                                progress_interval=args.progress_interval,
+                                keep_summary=args.keep_summary)
+        try:
+            export_path = to_df_and_save(parsed, league, args.export_dir, args.sqlite_path,
+                                         args.player_registry, memory_report, columns,
+                                         args.outcome_cube, args.tensors,
+                                         args.tensor_vocab, args.segments)
+        finally:
+            if args.handoff_dir:
+                parsed.cleanup()
+        if args.sample:
+            _log_full_run_estimate(league, all_paths, paths,
+                                   time.perf_counter() - start_time, export_path)
+        if memory_report:
+            memory_reports[league] = memory_report
+            save_reports(args.memory_report, memory_reports)
+    if profiler:
+        _finish_profile(profiler, args.profile)
+
+
+def _log_filter(args):
+    """The filters on which logs to parse from the command line arguments."""
+    from datetime import datetime
+    from loader import LogFilter
+
+    min_season, max_season = None, None
+    if args.seasons:
+        # E.g. 2022, 2020-2023, 2021- or -2022.
+        first, _, last = args.seasons.partition('-')
+        min_season = int(first) if first else None
+        max_season = (int(last) if last else None) if '-' in args.seasons else min_season
+    return LogFilter(min_season=min_season,
+                     max_season=max_season,
+                     min_bytes=args.min_bytes,
+                     max_bytes=args.max_bytes,
+                     modified_after=(datetime.fromisoformat(args.modified_after).timestamp()
+                                     if args.modified_after else None),
+                     modified_before=(datetime.fromisoformat(args.modified_before).timestamp()
+                                      if args.modified_before else None))
+
+
+def _finish_profile(profiler, profile_dir: str) -> None:
+    from profiling import dump_process_profile, log_hot_functions, merge_profiles
+
+    dump_process_profile(profiler, profile_dir)
+    stats = merge_profiles(profile_dir)
+    if stats:
+        log_hot_functions(stats)
+
+
+def _log_full_run_estimate(league: str, all_paths: List[str], sample_paths: List[str],
+                           sample_seconds: float, export_path: str) -> None:
+    from sampling import estimate_full_run
+
+    seconds, output_bytes = estimate_full_run(all_paths, sample_paths, sample_seconds,
+                                              os.path.getsize(export_path))
+    logger.info(f'Estimated full run of {league}: {len(all_paths)} logs in about '
+                f'{seconds:.0f} seconds, with {to_mb(int(output_bytes))} of output.')
 
 
 if __name__ == "__main__":
@@ -131,6 +269,153 @@ if __name__ == "__main__":
                                                "provided league.", type=int)
     parser.add_argument("--export_dir", help="The directory to export parsed "
                                              "logs to.", type=str)
+    parser.add_argument("--executor", help="Optional: How to run the parsing. "
+                                           "process uses a pool of worker "
+                                           "processes, thread a pool of "
+                                           "threads, which only run in "
+                                           "parallel on free-threaded "
+                                           "python, and serial parses one "
+                                           "log at a time.",
+                        choices=["process", "thread", "serial"], default="process")
+    parser.add_argument("--n_jobs", help="Optional: How many processes or "
+                                         "threads to parse with. Defaults to "
+                                         "the number of CPUs.", type=int)
+    parser.add_argument("--parse_mode", help="Optional: per_play parses every "
+                                             "field of each play in the "
+                                             "workers. vectorized extracts "
+                                             "the fields in the play summary "
+                                             "text for the whole league at "
+                                             "once instead.",
+                        choices=["per_play", "vectorized"], default="per_play")
+    parser.add_argument("--handoff_dir", help="Optional: A directory for the "
+                                              "workers to hand each parsed game "
+                                              "to the parent in as an Arrow "
+                                              "IPC file, instead of pickling "
+                                              "its rows, e.g. /dev/shm.",
+                        type=str)
+    parser.add_argument("--keep_summary", help="Optional: Keep each play's "
+                                               "summary text as a summary "
+                                               "column, and index its words "
+                                               "and player names for "
+                                               "text_index.search_plays.",
+                        action="store_true")
+    parser.add_argument("--seasons", help="Optional: Only parse logs from "
+                                          "these seasons, e.g. 2022, "
+                                          "2020-2023 or 2021-.", type=str)
+    parser.add_argument("--min_bytes", help="Optional: Skip logs smaller "
+                                            "than this many bytes.", type=int)
+    parser.add_argument("--max_bytes", help="Optional: Skip logs larger than "
+                                            "this many bytes.", type=int)
+    parser.add_argument("--modified_after", help="Optional: Only parse logs "
+                                                 "modified at or after this "
+                                                 "ISO date or time, e.g. "
+                                                 "2024-03-01.", type=str)
+    parser.add_argument("--modified_before", help="Optional: Only parse logs "
+                                                  "modified at or before this "
+                                                  "ISO date or time.", type=str)
+    parser.add_argument("--max_in_flight", help="Optional: The most logs "
+                                                "that can be queued or "
+                                                "parsing at once. Defaults "
+                                                "to two per process.", type=int)
+    parser.add_argument("--tasks_per_child", help="Optional: How many logs "
+                                                  "each worker parses before "
+                                                  "being replaced.", type=int)
+    parser.add_argument("--max_worker_rss_mb", help="Optional: Recycle the "
+                                                    "workers once one of them "
+                                                    "uses more than this many "
+                                                    "MB of memory.", type=int)
+    parser.add_argument("--columns", help="Optional: A comma separated list of "
+                                          "column groups and/or columns to "
+                                          "parse. The groups are call, "
+                                          "outcome, names and context. Parsers "
+                                          "no requested column needs are "
+                                          "skipped. Defaults to every column.",
+                        type=str)
+    parser.add_argument("--sample", help="Optional: Parse a reproducible "
+                                         "sample of this many logs, "
+                                         "stratified by season, and estimate "
+                                         "the time and output size of a full "
+                                         "run. Can't be used with "
+                                         "--max_to_parse.", type=int)
+    parser.add_argument("--seed", help="The random seed for --sample.",
+                        type=int, default=0)
+    parser.add_argument("--stratify_by_team", help="Also stratify the sample "
+                                                   "by home team.",
+                        action="store_true")
+    parser.add_argument("--dedup_dir", help="Optional: A directory for an "
+                                            "index of parsed logs by content "
+                                            "hash, shared across leagues and "
+                                            "runs. Copies of a log that was "
+                                            "already parsed reuse its rows.",
+                        type=str)
+    parser.add_argument("--segments", help="Optional: Append the plays to "
+                                           "the league's export dir as a new "
+                                           "immutable segment listed in an "
+                                           "atomically updated manifest, "
+                                           "instead of rewriting "
+                                           "parsed_logs.fe. Re-parsed games "
+                                           "replace their old rows, see "
+                                           "segments.", action="store_true")
+    parser.add_argument("--sqlite_path", help="Optional: A SQLite file to also "
+                                              "save the plays to, with indexes "
+                                              "for fast queries. Re-parsed "
+                                              "games replace their old rows.",
+                        type=str)
+    parser.add_argument("--player_registry", help="Optional: A SQLite file of "
+                                                  "players to give every name "
+                                                  "column a stable integer id "
+                                                  "column, shared across "
+                                                  "leagues and runs.",
+                        type=str)
+    parser.add_argument("--outcome_cube", help="Optional: Also save a cube of "
+                                               "play outcomes by down, "
+                                               "distance, field zone, "
+                                               "formation and coverage to the "
+                                               "league's export dir, for fast "
+                                               "lookups with outcome_cube.",
+                        action="store_true")
+    parser.add_argument("--tensors", help="Optional: Also export the plays "
+                                          "as encoded feature and label "
+                                          "matrices in .npy files to the "
+                                          "league's export dir, for training "
+                                          "models.", action="store_true")
+    parser.add_argument("--tensor_vocab", help="Optional: A JSON file of the "
+                                               "category codes of --tensors, "
+                                               "created on the first export. "
+                                               "Later exports only add new "
+                                               "categories, so codes match "
+                                               "across leagues and runs.",
+                        type=str)
+    parser.add_argument("--progress_interval", help="Optional: The least "
+                                                    "seconds between progress "
+                                                    "logs and metrics file "
+                                                    "writes. Defaults to 10.",
+                        type=float)
+    parser.add_argument("--metrics_file", help="Optional: A file to write the "
+                                               "live throughput, ETA, worker "
+                                               "utilization and error counts "
+                                               "of every league to, in the "
+                                               "Prometheus text format if it "
+                                               "ends in .prom and as JSON "
+                                               "otherwise.", type=str)
+    parser.add_argument("--memory_report", help="Optional: A path to write a "
+                                                "JSON report of the peak and "
+                                                "retained memory of every "
+                                                "stage to. Profiling slows "
+                                                "parsing down a lot.",
+                        type=str)
+    parser.add_argument("--profile", help="Optional: A directory to write "
+                                          "cProfile stats of the parent and "
+                                          "every worker to, merged into "
+                                          "combined.prof and collapsed.txt "
+                                          "for flame graphs.", type=str)
+    parser.add_argument("--log_level", help="Optional: The logging level, "
+                                            "e.g. DEBUG. Defaults to INFO.",
+                        type=str, default="INFO")
+
+    args = parser.parse_args()
+    from worker import configure_logging
 
-    main(parser.parse_args())
-    # one_thread("LG000021", "D:/Front Office Football Eight/leaguehtml", 100, "D:/SavedLogs")
\ No newline at end of file
+    # Serial and thread executors parse in this process.
+    configure_logging(args.log_level.upper())
+    main(args)
\ No newline at end of file
@@ -8,6 +8,7 @@ from schema.game_context import (GameContext,
                                  Clock,
                                  FieldPosition,
                                  DownDistance)
+from schema.play_call_table import PlayCallTable
 
 
 class GameContextParser(object):
@@ -18,25 +19,37 @@ class GameContextParser(object):
 
     def __init__(self, participation_tbl: Any):
         home_team, away_team, short_names, _ = parse_team_rosters(participation_tbl)
-        self._players = short_names
+        self._players = {side: set(names) for side, names in short_names.items()}
         self._home_team = home_team
         self._away_team = away_team
 
-    def parse_context(self, summ_text: str, play_call: Any) -> GameContext:
+    @property
+    def home_team(self) -> str:
+        return self._home_team
+
+    @property
+    def away_team(self) -> str:
+        return self._away_team
+
+    def offense(self, play_call: PlayCallTable) -> str:
+        """Which team has the ball, either 'home' or 'away'."""
+        return which_team_offense(play_call, self._players['home'], self._players['away'])
+
+    def parse_context(self, summ_text: str, play_call: PlayCallTable) -> GameContext:
         """Parses the summary text and play call table into a GameContext."""
-        home = which_team_offense(play_call, self._players['home'], self._players['away']) == "home"
+        offense = self.offense(play_call)
         return GameContext(clock=_parse_clock(summ_text),
-                           field_pos=self._parse_field_pos(summ_text,
-                                                           play_call),
-                           home_possession=home,
-                           down_distance=_parse_down_distance(summ_text))
+                           field_pos=self._parse_field_pos(summ_text, offense),
+                           home_possession=offense == "home",
+                           down_distance=_parse_down_distance(summ_text),
+                           home_team=self._home_team,
+                           away_team=self._away_team)
 
-    def _parse_field_pos(self, summ_text, play_call) -> FieldPosition:
+    def _parse_field_pos(self, summ_text, offense: str) -> FieldPosition:
         maybe_field_pos = re.search(FIELD_POSITION_REGEX, summ_text)
         if maybe_field_pos:
             yardline = int(maybe_field_pos[0][3:])
             side = maybe_field_pos[0][:3]
-            offense = which_team_offense(play_call, self._players['home'], self._players['away'])
             offense = self._home_team if offense == 'home' else self._away_team
             opponents_half = side != offense
             return FieldPosition(yardline=yardline,
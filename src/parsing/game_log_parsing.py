@@ -1,37 +1,119 @@
 """Responsible for fully parsing the play by play."""
-from typing import Any, List, Tuple
+from typing import Any, Collection, Dict, List, Optional, Tuple
 
 from bs4 import element
 
+from column_names import (AWAY_TEAM, HOME_POSSESSION, HOME_TEAM, RAW_NAMES_OFFENSE,
+                          RAW_OFFENSE_TEAM, RAW_ROSTER, RAW_SUMMARY, RAW_TARGET_PRIORITY,
+                          RAW_TARGET_ROUTE)
+
 from parsing.game_context_parsing import GameContextParser
-from parsing.names_parsing import NameParser
-from parsing.play_call_parsing import parse_play_call
-from parsing.play_summary_parsing import parse_play_outcome
+from parsing.names_parsing import NameParser, ShortNameParser
+from parsing.play_call_decoding import decode_play_call
+from parsing.play_call_parsing import parse_play_call, has_defensive_call
+from parsing.play_summary_parsing import parse_play_outcome, parse_target_route
+from schema.column_groups import COLUMN_GROUPS, CALL, CONTEXT, NAMES, OUTCOME
 from schema.parsed_play import ParsedPlay
+from schema.play_call_table import PlayCallTable
 
 
-def parse_full_game(raw_log: Any, participation: Any) -> List[ParsedPlay]:
+def parse_full_game(raw_log: Any, participation: Any,
+                    groups: Optional[Collection[str]] = None,
+                    summaries: Optional[List[str]] = None) -> List[ParsedPlay]:
     """Given the raw play-by-play soup object, parse every play.
 
     :param: raw_log: The beautifulsoup of the play by play for a game.
     :param: participation: The beautifulsoup of the participation table for
     the game.
+    :param: groups: Optional column groups to parse, see
+    schema.column_groups. Sub-parsers for the other groups are skipped and
+    their parts of each ParsedPlay are None. Defaults to every group.
+    :param: summaries: Optional list to append the summary text of each
+    parsed play to, in the same order.
     :returns: A list of ParsedPlays in order for the given game.
     """
+    groups = COLUMN_GROUPS.keys() if groups is None else groups
+    output = []
+    summaries_calls = _summaries_and_calls(game_log=raw_log)
+    context_parser = GameContextParser(participation) if CONTEXT in groups else None
+    name_parser = NameParser(participation, summaries_calls) if NAMES in groups else None
+    for summary, play_call in summaries_calls:
+        if 'Unknown' in summary or play_call is None:
+            continue
+        outcome = parse_play_outcome(summary, play_call) if OUTCOME in groups else None
+        names = name_parser.parse_player_names(summary, play_call) if name_parser else None
+        if CALL in groups:
+            playcall = parse_play_call(summary, play_call)
+            if playcall is None:
+                continue
+        else:
+            playcall = None
+            # Skip the same plays as if the call had been parsed.
+            if not has_defensive_call(play_call):
+                continue
+        context = context_parser.parse_context(summary, play_call) if context_parser else None
+        output.append(ParsedPlay(call=playcall, outcome=outcome,
+                                 context=context, names=names))
+        if summaries is not None:
+            summaries.append(summary)
+    return output
+
+
+def parse_full_game_deferred(raw_log: Any, participation: Any,
+                             groups: Optional[Collection[str]] = None) \
+        -> List[Tuple[ParsedPlay, Dict]]:
+    """Parse every play except for the fields read from the summary text and
+    the players' full names.
+
+    Those fields are extracted later for a whole league at once by
+    vectorized.extract_summary_columns, and the names resolved by
+    vectorized.resolve_names. The same plays are kept as by parse_full_game,
+    but each ParsedPlay has no outcome or context, its call has no play type
+    and its names are short names. Instead, each comes with the raw columns
+    the extraction needs: the summary and what it can only get from the play
+    call table, e.g. the offense's team and the targeted route. The first
+    play also has the game's roster to resolve the names with.
+
+    :param: groups: Optional column groups to parse, see schema.column_groups.
+    :returns: The partly parsed plays in order, each with its raw columns.
+    """
+    groups = COLUMN_GROUPS.keys() if groups is None else groups
     output = []
-    context_parser = GameContextParser(participation)
     summaries_calls = _summaries_and_calls(game_log=raw_log)
-    name_parser = NameParser(participation, summaries_calls)
+    context_parser = GameContextParser(participation) if CONTEXT in groups else None
+    name_parser = ShortNameParser(participation) if NAMES in groups else None
     for summary, play_call in summaries_calls:
         if 'Unknown' in summary or play_call is None:
             continue
-        outcome = parse_play_outcome(summary, play_call)
-        names = name_parser.parse_player_names(summary, play_call)
-        playcall = parse_play_call(summary, play_call)
-        context = context_parser.parse_context(summary, play_call)
-        if playcall and context:
-            output.append(ParsedPlay(call=playcall, outcome=outcome,
-                                     context=context, names=names))
+        if name_parser:
+            # Skipped plays count too, like in NameParser's pass over the plays.
+            name_parser.find_qb(summary, play_call)
+        raw = {RAW_SUMMARY: summary}
+        if OUTCOME in groups:
+            raw[RAW_TARGET_ROUTE], raw[RAW_TARGET_PRIORITY] = parse_target_route(summary,
+                                                                                 play_call)
+        names = None
+        if name_parser:
+            names = name_parser.parse_player_names(summary, play_call)
+            raw[RAW_NAMES_OFFENSE] = name_parser.offense(play_call)
+        if CALL in groups:
+            playcall = parse_play_call(summary, play_call, parse_type=False)
+            if playcall is None:
+                continue
+        else:
+            playcall = None
+            if not has_defensive_call(play_call):
+                continue
+        if context_parser:
+            offense = context_parser.offense(play_call)
+            raw[HOME_POSSESSION] = offense == 'home'
+            raw[HOME_TEAM] = context_parser.home_team
+            raw[AWAY_TEAM] = context_parser.away_team
+            raw[RAW_OFFENSE_TEAM] = (context_parser.home_team if offense == 'home'
+                                     else context_parser.away_team)
+        output.append((ParsedPlay(call=playcall, names=names), raw))
+    if name_parser and output:
+        output[0][1][RAW_ROSTER] = name_parser.roster
     return output
 
 
@@ -64,7 +146,7 @@ def _get_play_call(log):
         return None
 
 
-def _summaries_and_calls(game_log) -> List[Tuple[str, Any]]:
+def _summaries_and_calls(game_log) -> List[Tuple[str, Optional[PlayCallTable]]]:
     out = []
     for log in game_log:
         if log.text == '\n':
@@ -74,6 +156,6 @@ def _summaries_and_calls(game_log) -> List[Tuple[str, Any]]:
         summary = _get_summary(log)
         if summary is None:
             continue
-        call = _get_play_call(log)
+        call = decode_play_call(_get_play_call(log))
         out.append((summary, call))
     return out
@@ -1,10 +1,11 @@
 """Utilities for parsing names."""
 import logging
 import re
-from typing import Any, List, Dict, Tuple
+from typing import Collection, Dict, Tuple
 
 from parsing.consts import QB, RB, FB, TE, WR, C, T, G, P, K
 from parsing.teams import CITY_TO_ABBREV
+from schema.play_call_table import PlayCallTable
 
 logger = logging.getLogger(__name__)
 
@@ -96,11 +97,11 @@ def _parse_name_components(has_name_substr: str) -> tuple:
         return first, last
 
 
-def which_team_offense(play_call: Any, home_players: List[str], away_players: List[str]):
+def which_team_offense(play_call: PlayCallTable, home_players: Collection[str],
+                       away_players: Collection[str]):
     home_matches, away_matches = 0, 0
-    for player_row in play_call[1:]:
-        stripped_position = player_row[0].split(' ')[1:]
-        player_name = ' '.join(stripped_position)
+    for player in play_call.offense:
+        player_name = player.short_name
         if player_name in home_players:
             home_matches += 1
         if player_name in away_players:
@@ -0,0 +1,78 @@
+"""Responsible for decoding the raw play call table in a single pass.
+
+The play call table is a list of rows of cell text. The first row holds the
+offensive and defensive calls, and each following row holds an offensive
+player and their responsibility alongside a defender and their assignment.
+Every parser reads the decoded PlayCallTable instead of rescanning the rows."""
+from typing import Dict, List, Optional
+
+from parsing.consts import BALL_CARRIER, PROTECT, BLITZ, DOUBLE, SPY
+from schema.play_call_table import PlayCallTable, PlayerAssignment
+
+
+def decode_play_call(play_call: Optional[List[List[str]]]) -> Optional[PlayCallTable]:
+    """Decode the rows of a play call table into a PlayCallTable.
+
+    :param: play_call: The text of every cell, one list per table row.
+    :returns: The decoded table, or None if there is no play call.
+    """
+    if not play_call:
+        return None
+    formations_row = play_call[0]
+    offense_call = tuple(formations_row[1].split(', ')) if len(formations_row) > 1 else None
+    defense_call = tuple(formations_row[3].split(', ')) if len(formations_row) > 3 else None
+
+    offense = []
+    defense = []
+    ball_carrier = None
+    protect = 0
+    blitz = 0
+    spy = False
+    double_target = ''
+    by_priority: Dict[str, PlayerAssignment] = {}
+    by_short_name: Dict[str, PlayerAssignment] = {}
+    for player_row in play_call[1:]:
+        off_player = _decode_player(player_row, 0)
+        offense.append(off_player)
+        by_priority.setdefault(off_player.priority, off_player)
+        by_short_name.setdefault(off_player.short_name, off_player)
+        if off_player.responsibility == BALL_CARRIER and ball_carrier is None:
+            ball_carrier = off_player
+        elif off_player.responsibility == PROTECT:
+            protect += 1
+
+        if len(player_row) <= 3:
+            continue
+        def_player = _decode_player(player_row, 3)
+        defense.append(def_player)
+        assignment = def_player.responsibility
+        if BLITZ in assignment:
+            blitz += 1
+        elif DOUBLE in assignment:
+            double_target = assignment.split(' ')[1]
+        elif SPY in assignment:
+            spy = True
+
+    return PlayCallTable(offense_call=offense_call,
+                         defense_call=defense_call,
+                         offense=tuple(offense),
+                         defense=tuple(defense),
+                         ball_carrier=ball_carrier,
+                         protect=protect,
+                         blitz=blitz,
+                         spy=spy,
+                         double_target=double_target,
+                         by_priority=by_priority,
+                         by_short_name=by_short_name)
+
+
+def _decode_player(player_row: List[str], column: int) -> PlayerAssignment:
+    """Decode the player and responsibility starting at the given column."""
+    position, _, short_name = player_row[column].partition(' ')
+    responsibility = player_row[column + 1] if len(player_row) > column + 1 else ''
+    priority, has_route, route = responsibility.partition(',')
+    return PlayerAssignment(position=position,
+                            short_name=short_name,
+                            responsibility=responsibility,
+                            priority=priority,
+                            route=route.strip() if has_route else '')
@@ -1,16 +1,15 @@
 """Responsible for parsing the offensive and defensive play calls."""
 import logging
 import re
-from typing import Optional, Any
+from typing import Optional
 
-from parsing.consts import LE, LT, LG, LM, RM, RG, RT, RE, BALL_CARRIER, \
-    PRIMARY, \
-    SECONDARY, PROTECT, BUZZ, BLITZ, DOUBLE, SPY
+from parsing.consts import LE, LT, LG, LM, RM, RG, RT, RE, PRIMARY, SECONDARY, BUZZ
 from parsing.regexes import *
 from schema.play_call import (DefensivePlay,
                               OffensivePlay,
                               PlayCall,
                               PlayType)
+from schema.play_call_table import PlayCallTable
 
 logger = logging.getLogger(__name__)
 
@@ -31,12 +30,15 @@ _RUN_DIRECTION_MAP = {
 }
 
 
-def parse_play_call(summary_text: str, play_call: Any) -> Optional[PlayCall]:
+def parse_play_call(summary_text: str, play_call: PlayCallTable,
+                    parse_type: bool = True) -> Optional[PlayCall]:
     """Parse the play call from the table and summary.
 
-    :param: play_call: The beautifulsoup table with the playcall.
-    :param: summary_text: The string with the summary of the play outcome."""
-    offense = _parse_offense(play_call, summary_text)
+    :param: play_call: The decoded play call table.
+    :param: summary_text: The string with the summary of the play outcome.
+    :param: parse_type: Whether to parse the play type from the summary. If
+    not, the play type is None and left to the vectorized extraction."""
+    offense = _parse_offense(play_call, summary_text, parse_type)
     defense = _parse_defense(play_call)
     # Offense and defense must both be successfully parsed.
     if offense is None or defense is None:
@@ -44,96 +46,62 @@ def parse_play_call(summary_text: str, play_call: Any) -> Optional[PlayCall]:
     return PlayCall(offns=offense, dfns=defense)
 
 
-def _parse_offense(play_call: Any, summary_text: str) -> \
-        Optional[OffensivePlay]:
-    try:
-        formations_row = play_call[0]
-        off = formations_row[1]
-        off = off.split(', ')
-        personnel = off[0].replace(_PERSONNEL, '')
-        qb_alignment = ''
-        formation = ''
-        if len(off) >= 2:
-            formation = off[1].replace(_FORMATION, '')
-        if len(off) >= 3:
-            qb_alignment = off[2]
-    except IndexError:
+def _parse_offense(play_call: PlayCallTable, summary_text: str,
+                   parse_type: bool = True) -> Optional[OffensivePlay]:
+    off = play_call.offense_call
+    if off is None:
         raise IndexError("Failed to parse offensive formation for: " + repr(
-            play_call[0]))
-    protect = 0
-    primary_route = ''
-    primary_pos = ''
-    secondary_route = ''
-    secondary_pos = ''
-    ball_carrier = ''
+            play_call))
+    personnel = off[0].replace(_PERSONNEL, '')
+    qb_alignment = ''
+    formation = ''
+    if len(off) >= 2:
+        formation = off[1].replace(_FORMATION, '')
+    if len(off) >= 3:
+        qb_alignment = off[2]
+    primary = play_call.by_priority.get(PRIMARY)
+    secondary = play_call.by_priority.get(SECONDARY)
+    ball_carrier = play_call.ball_carrier.position if play_call.ball_carrier else ''
     run_direction = ''
-    for player_resp in play_call[1:]:
-        position = player_resp[0].split(' ')[0]
-        route = player_resp[1]
-        if len(route) == 0:
-            continue
-        if route == BALL_CARRIER:
-            ball_carrier = position
-            continue
-        if route == PROTECT:
-            protect += 1
-            continue
-        priority, route = route.split(',')
-        if priority == PRIMARY:
-            primary_route = route.strip()
-            primary_pos = position
-        if priority == SECONDARY:
-            secondary_route = route.strip()
-            secondary_pos = position
     if ball_carrier:
         for direction in _RUN_DIRECTION_MAP.keys():
             if direction in summary_text:
                 run_direction = _RUN_DIRECTION_MAP[direction]
-    play_type = parse_play_type(summary_text)
+    play_type = parse_play_type(summary_text) if parse_type else None
     return OffensivePlay(off_personnel=personnel,
                          off_formation=formation,
                          qb_alignment=qb_alignment,
-                         primary_route=primary_route,
-                         primary_receiver=primary_pos,
-                         secondary_route=secondary_route,
-                         secondary_receiver=secondary_pos,
-                         protect=protect,
+                         primary_route=primary.route if primary else '',
+                         primary_receiver=primary.position if primary else '',
+                         secondary_route=secondary.route if secondary else '',
+                         secondary_receiver=secondary.position if secondary else '',
+                         protect=play_call.protect,
                          ball_carrier=ball_carrier,
                          run_direction=run_direction,
                          play_type=play_type)
 
 
-def _parse_defense(play_call: Any) -> Optional[DefensivePlay]:
-    try:
-        buzz = False
-        formations_row = play_call[0]
-        dfns = formations_row[3].split(', ')
-        formation = dfns[0].replace(_FORMATION, '')
-        personnel = dfns[1].replace(_PERSONNEL, '')
-        coverage = dfns[2]
-        if BUZZ in dfns:
-            buzz = True
-    except IndexError:
+def has_defensive_call(play_call: PlayCallTable) -> bool:
+    """Whether the table has the formation, personnel and coverage of the defense."""
+    return play_call.defense_call is not None and len(play_call.defense_call) >= 3
+
+
+def _parse_defense(play_call: PlayCallTable) -> Optional[DefensivePlay]:
+    dfns = play_call.defense_call
+    if not has_defensive_call(play_call):
         logger.warning(f'Failed to parse the defensive play call for '
                        f'input text: \n {repr(play_call)}')
         return None
-    blitz = 0
-    spy = False
-    double_target = ''
-    for player_resp in play_call[1:]:
-        resp = player_resp[4]
-        if BLITZ in resp:
-            blitz += 1
-        elif DOUBLE in resp:
-            double_target = resp.split(' ')[1]
-        elif SPY in resp:
-            spy = True
+    formation = dfns[0].replace(_FORMATION, '')
+    personnel = dfns[1].replace(_PERSONNEL, '')
+    coverage = dfns[2]
+    buzz = BUZZ in dfns
     return DefensivePlay(def_personnel=personnel,
                          def_formation=formation,
                          coverage=coverage,
-                         spy=spy,
-                         double_target=double_target,
-                         blitz=blitz,
+                         spy=play_call.spy,
+                         double_target=play_call.double_target,
+                         blitz=play_call.blitz,
                          buzz=buzz)
 
 
@@ -1,12 +1,13 @@
 """Responsible for parsing all data in the play summary text."""
 import re
 import logging
-from typing import Tuple, Any
+from typing import Tuple
 
 from parsing.consts import PROTECT
 from parsing.name_utils import target_receiver_name, shorten_name
 from parsing.play_call_parsing import parse_play_type
 from parsing.regexes import *
+from schema.play_call_table import PlayCallTable
 from schema.play_outcome import PassingOutcome, RunningOutcome, PlayOutcome
 
 logger = logging.getLogger(__name__)
@@ -34,7 +35,7 @@ _PENALTY_YARDAGE_MAP = {
 }
 
 
-def parse_play_outcome(summary_text: str, play_call: Any) -> PlayOutcome:
+def parse_play_outcome(summary_text: str, play_call: PlayCallTable) -> PlayOutcome:
     """Parses the text of the play summary into a PlayOutcome and down/distance.
     """
 
@@ -62,7 +63,7 @@ def _parse_running_outcome(summary_text: str) -> RunningOutcome:
     return RunningOutcome(yards=int(yards))
 
 
-def _parse_passing_outcome(summary_text: str, play_call: Any) -> PassingOutcome:
+def _parse_passing_outcome(summary_text: str, play_call: PlayCallTable) -> PassingOutcome:
     complete = (re.search(PASS_COMPLETED_REGEX, summary_text) is not None)
     yards = 0
     yac = 0
@@ -107,9 +108,7 @@ def _parse_passing_outcome(summary_text: str, play_call: Any) -> PassingOutcome:
     if 'threw into double coverage' in summary_text:
         throw_into_double = True
 
-    target_receiver = target_receiver_name(summary_text)
-    target_route, target_priority = _parse_targeted_route(
-        play_call, target_receiver)
+    target_route, target_priority = parse_target_route(summary_text, play_call)
 
     return PassingOutcome(complete=complete,
                           yards=yards,
@@ -124,18 +123,19 @@ def _parse_passing_outcome(summary_text: str, play_call: Any) -> PassingOutcome:
                           target_priority=target_priority)
 
 
-def _parse_targeted_route(play_call, target_receiver: str) -> Tuple[str, str]:
-    for player_resp in play_call[1:]:
-        try:
-            values = player_resp[0].split(' ')
-            name = ' '.join(values[1:])
-            if name == shorten_name(target_receiver):
-                priority, route = player_resp[1].split(',')
-                return route.strip(), priority
-        except ValueError:
-            # Occurs for 'Protect' responsibility.
-            return PROTECT, PROTECT
-    return '', ''
+def parse_target_route(summary_text: str, play_call: PlayCallTable) -> Tuple[str, str]:
+    """The route and priority of the receiver targeted by a pass."""
+    return _parse_targeted_route(play_call, target_receiver_name(summary_text))
+
+
+def _parse_targeted_route(play_call: PlayCallTable, target_receiver: str) -> Tuple[str, str]:
+    player = play_call.by_short_name.get(shorten_name(target_receiver))
+    if player is None:
+        return '', ''
+    if ',' not in player.responsibility:
+        # Occurs for 'Protect' responsibility.
+        return PROTECT, PROTECT
+    return player.route, player.priority
 
 
 def _is_two_pt_conversion(summary_text):
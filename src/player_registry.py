@@ -0,0 +1,212 @@
+"""Persistent registry of players with stable integer ids.
+
+The name columns only hold full name strings, which are slow to join on across
+seasons and leagues, and players who share a name collide. The registry gives
+every player an integer id that stays the same across runs, and adds a `*_id`
+column next to every `*_name` column.
+
+Players are told apart by league, full name, team and season:
+* A name already seen on the same team in the same season is the same player.
+* Otherwise it continues the namesake from the nearest season who isn't
+  already on another team that season, preferring one on the same team, so
+  players keep their id when they change teams between seasons.
+* Anyone else, e.g. a namesake on another team in the same season, is a new
+  player. A player traded mid-season therefore gets a second id.
+"""
+import logging
+import sqlite3
+import time
+from collections import defaultdict
+from dataclasses import fields
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from column_names import AWAY_TEAM, HOME_POSSESSION, HOME_TEAM, LEAGUE_ID, YEAR
+from schema.player_names import PlayerNames
+
+logger = logging.getLogger(__name__)
+
+_NAME_SUFFIX = '_name'
+_ID_SUFFIX = '_id'
+
+NAME_COLUMNS: List[str] = [field.name for field in fields(PlayerNames)]
+# The rest of the name columns are players on offense.
+DEFENSE_NAME_COLUMNS: Set[str] = {'rcb_name', 'lcb_name', 'nb_name', 'db_name', 'ss_name',
+                                  'fs_name', 'lde_name', 'ldt_name', 'rdt_name', 'nt_name',
+                                  'rde_name', 'slb_name', 'wlb_name', 'mlb_name', 'silb_name',
+                                  'wilb_name'}
+
+# A player's appearance: their full name, the season and their team.
+Appearance = Tuple[str, int, str]
+
+
+def id_column(name_column: str) -> str:
+    """The id column for a name column, e.g. qb_id for qb_name."""
+    return name_column[:-len(_NAME_SUFFIX)] + _ID_SUFFIX
+
+
+class PlayerRegistry(object):
+    """Assigns and stores player ids in a SQLite file.
+
+    The players table holds one row per player, and the player_seasons table
+    the teams each player was seen on in each season."""
+
+    def __init__(self, db_path: str):
+        self._connection = sqlite3.connect(db_path)
+        with self._connection:
+            self._connection.execute('CREATE TABLE IF NOT EXISTS players ('
+                                     'player_id INTEGER PRIMARY KEY, '
+                                     'league_id TEXT NOT NULL, '
+                                     'full_name TEXT NOT NULL)')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS player_seasons ('
+                                     'player_id INTEGER NOT NULL, '
+                                     'year INTEGER NOT NULL, '
+                                     'team TEXT NOT NULL, '
+                                     'PRIMARY KEY (player_id, year, team))')
+            self._connection.execute('CREATE INDEX IF NOT EXISTS idx_players_league_name '
+                                     'ON players (league_id, full_name)')
+            self._connection.execute('CREATE INDEX IF NOT EXISTS idx_player_seasons_team '
+                                     'ON player_seasons (year, team)')
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def resolve(self, league_id: str,
+                appearances: Iterable[Appearance]) -> Dict[Appearance, int]:
+        """Find or assign the id of the player behind each appearance.
+
+        :param: league_id: The league the appearances are from.
+        :param: appearances: The full name, season and team of each appearance.
+        :returns: The player id of each appearance.
+        """
+        # The seasons and teams of every player in the league with each name.
+        seasons_by_name: Dict[str, Dict[int, Dict[int, Set[str]]]] = defaultdict(dict)
+        rows = self._connection.execute(
+            'SELECT p.player_id, p.full_name, s.year, s.team FROM players p '
+            'LEFT JOIN player_seasons s ON p.player_id = s.player_id '
+            'WHERE p.league_id = ?', (league_id,))
+        for player_id, full_name, year, team in rows:
+            seasons = seasons_by_name[full_name].setdefault(player_id, defaultdict(set))
+            if year is not None:
+                seasons[year].add(team)
+
+        ids = {}
+        new_seasons = []
+        with self._connection:
+            # Earlier seasons first, so players carry their id forward.
+            for appearance in sorted(set(appearances), key=lambda a: (a[1], a[2], a[0])):
+                full_name, year, team = appearance
+                candidates = seasons_by_name[full_name]
+                player_id = _match(candidates, year, team)
+                if player_id is None:
+                    player_id = self._connection.execute(
+                        'INSERT INTO players (league_id, full_name) VALUES (?, ?)',
+                        (league_id, full_name)).lastrowid
+                    candidates[player_id] = defaultdict(set)
+                if team not in candidates[player_id][year]:
+                    candidates[player_id][year].add(team)
+                    new_seasons.append((player_id, year, team))
+                ids[appearance] = player_id
+            self._connection.executemany('INSERT INTO player_seasons (player_id, year, team) '
+                                         'VALUES (?, ?, ?)', new_seasons)
+        return ids
+
+    def find(self, league_id: str, full_name: str) -> List[int]:
+        """The ids of every player in the league with the name."""
+        rows = self._connection.execute('SELECT player_id FROM players WHERE league_id = ? '
+                                        'AND full_name = ? ORDER BY player_id',
+                                        (league_id, full_name))
+        return [row[0] for row in rows]
+
+    def lookup(self, player_id: int) -> Optional[Dict]:
+        """The league, name and teams by season of a player, or None if unknown."""
+        row = self._connection.execute('SELECT league_id, full_name FROM players '
+                                       'WHERE player_id = ?', (player_id,)).fetchone()
+        if row is None:
+            return None
+        seasons = defaultdict(list)
+        for year, team in self._connection.execute('SELECT year, team FROM player_seasons '
+                                                   'WHERE player_id = ? ORDER BY year, team',
+                                                   (player_id,)):
+            seasons[year].append(team)
+        return {'player_id': player_id, LEAGUE_ID: row[0], 'full_name': row[1],
+                'seasons': dict(seasons)}
+
+
+def _match(candidates: Dict[int, Dict[int, Set[str]]], year: int, team: str) -> Optional[int]:
+    """The id of the namesake who this appearance continues, if there is one."""
+    best_id, best_rank = None, None
+    for player_id, seasons in candidates.items():
+        teams = seasons.get(year)
+        if teams and team in teams:
+            return player_id
+        if teams:
+            # Already on another team this season, so a different player.
+            continue
+        if not seasons:
+            distance = 0
+        else:
+            distance = min(abs(season - year) for season in seasons)
+        nearest = [season for season in seasons if abs(season - year) == distance]
+        same_team = any(team in seasons[season] for season in nearest)
+        rank = (distance, not same_team, player_id)
+        if best_rank is None or rank < best_rank:
+            best_id, best_rank = player_id, rank
+    return best_id
+
+
+def add_player_ids(df: pd.DataFrame, registry_path: str) -> pd.DataFrame:
+    """Add a player id column next to every name column of the dataframe.
+
+    The team of each name comes from the context columns, so rows without
+    them, e.g. when only the names were parsed, get no ids.
+
+    :param: df: The dataframe of plays of a single league.
+    :param: registry_path: The SQLite file of the player registry.
+    """
+    name_columns = [column for column in NAME_COLUMNS if column in df.columns]
+    if not name_columns:
+        return df
+    if not all(column in df.columns for column in (HOME_POSSESSION, HOME_TEAM, AWAY_TEAM)):
+        logger.warning('Player ids need the context columns to tell which team '
+                       'each player is on, skipping them.')
+        return df
+    start_time = time.perf_counter()
+    home_possession = df[HOME_POSSESSION].astype(bool)
+    home_team = df[HOME_TEAM].astype(str)
+    away_team = df[AWAY_TEAM].astype(str)
+    offense_team = home_team.where(home_possession, away_team)
+    defense_team = away_team.where(home_possession, home_team)
+    years = df[YEAR].astype(int)
+    names = {column: df[column].fillna('').astype(str) for column in name_columns}
+
+    # Resolve each distinct appearance once, then map the ids onto the rows.
+    appearance_frames = []
+    for column in name_columns:
+        team = defense_team if column in DEFENSE_NAME_COLUMNS else offense_team
+        appearance_frames.append(pd.DataFrame({'full_name': names[column],
+                                               YEAR: years,
+                                               'team': team}))
+    appearances = pd.concat(appearance_frames, ignore_index=True)
+    appearances = appearances[appearances['full_name'] != ''].drop_duplicates()
+    league_id = str(df[LEAGUE_ID].iloc[0])
+
+    registry = PlayerRegistry(registry_path)
+    try:
+        ids = registry.resolve(league_id, appearances.itertuples(index=False, name=None))
+    finally:
+        registry.close()
+
+    lookup = pd.Series(ids, dtype='Int32')
+    if not len(lookup):
+        lookup.index = pd.MultiIndex.from_tuples([], names=['full_name', YEAR, 'team'])
+    for column in name_columns:
+        team = defense_team if column in DEFENSE_NAME_COLUMNS else offense_team
+        keys = pd.MultiIndex.from_arrays([names[column], years, team])
+        player_ids = lookup.reindex(keys).array
+        df.insert(df.columns.get_loc(column) + 1, id_column(column), player_ids)
+    end_time = time.perf_counter()
+    logger.info(f'Took {end_time - start_time} seconds to resolve the ids of '
+                f'{len(appearances)} player appearances.')
+    return df
@@ -0,0 +1,156 @@
+"""Profiles runs across the parent and every worker process.
+
+cProfile only sees the process it runs in, so each worker profiles itself
+from the pool initializer and dumps its stats to the profile directory when it
+exits. At the end of the run the stats of every process are merged into:
+* `combined.prof`, readable with pstats or snakeviz.
+* `collapsed.txt`, stacks in the collapsed format read by flame graph tools
+  such as flamegraph.pl and speedscope.
+
+cProfile only records which function called which, not whole stacks, so the
+collapsed stacks split each function's time between its callers in proportion
+to the time spent under each of them.
+
+This module must stay free of pandas, workers import it."""
+import cProfile
+import glob
+import logging
+import os
+import pstats
+import tempfile
+from collections import defaultdict
+from multiprocessing.util import Finalize
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+COMBINED_STATS = 'combined.prof'
+COLLAPSED_STACKS = 'collapsed.txt'
+_PROCESS_STATS_PATTERN = 'process-*.prof'
+
+# Stacks that account for less than this many microseconds are left out.
+_MIN_STACK_MICROS = 1
+_MAX_STACK_DEPTH = 200
+
+# A pstats function key: (filename, line number, function name).
+FunctionKey = Tuple[str, int, str]
+
+# The parent's profiler. Workers forked while it runs inherit it running, and
+# have to stop it first, python 3.12+ only allows one profiler at a time.
+_parent_profiler: Optional[cProfile.Profile] = None
+
+
+def prepare_profile_dir(profile_dir: str) -> None:
+    """Create the profile directory, removing the stats of earlier runs."""
+    os.makedirs(profile_dir, exist_ok=True)
+    for path in glob.glob(os.path.join(profile_dir, _PROCESS_STATS_PATTERN)):
+        os.remove(path)
+
+
+def start_parent_profile() -> cProfile.Profile:
+    """Profile the parent process of a run, until dump_process_profile."""
+    global _parent_profiler
+    _parent_profiler = cProfile.Profile()
+    _parent_profiler.enable()
+    return _parent_profiler
+
+
+def start_process_profile(profile_dir: str) -> cProfile.Profile:
+    """Profile this process until it exits, then dump its stats.
+
+    Pool workers run their finalizers when they exit normally, i.e. when the
+    pool is closed and joined or a worker reaches maxtasksperchild."""
+    global _parent_profiler
+    if _parent_profiler is not None:
+        # Forked from the profiled parent, whose stats aren't this process's.
+        _parent_profiler.disable()
+        _parent_profiler = None
+    profiler = cProfile.Profile()
+    Finalize(None, dump_process_profile, args=(profiler, profile_dir), exitpriority=10)
+    profiler.enable()
+    return profiler
+
+
+def dump_process_profile(profiler: cProfile.Profile, profile_dir: str) -> None:
+    """Stop the profiler and write its stats to a new file in the directory."""
+    profiler.disable()
+    # Pids are reused by recycled workers, so every file gets a unique name.
+    fd, path = tempfile.mkstemp(prefix=f'process-{os.getpid()}-', suffix='.prof',
+                                dir=profile_dir)
+    os.close(fd)
+    profiler.dump_stats(path)
+
+
+def merge_profiles(profile_dir: str) -> Optional[pstats.Stats]:
+    """Merge the stats of every process, and write the combined stats and the
+    collapsed stacks to the profile directory."""
+    paths = sorted(glob.glob(os.path.join(profile_dir, _PROCESS_STATS_PATTERN)))
+    if not paths:
+        logger.warning(f'No profiles were written to {profile_dir}.')
+        return None
+    stats = pstats.Stats(*paths)
+    stats.dump_stats(os.path.join(profile_dir, COMBINED_STATS))
+    with open(os.path.join(profile_dir, COLLAPSED_STACKS), 'w') as collapsed_file:
+        for stack, micros in sorted(collapse_stacks(stats).items()):
+            collapsed_file.write(f'{stack} {micros}\n')
+    logger.info(f'Merged {len(paths)} profiles into {profile_dir}.')
+    return stats
+
+
+def collapse_stacks(stats: pstats.Stats) -> Dict[str, int]:
+    """The microseconds of own time spent in each stack of functions."""
+    raw_stats = stats.stats
+    callees: Dict[FunctionKey, Dict[FunctionKey, float]] = defaultdict(dict)
+    for function, (_, _, _, _, callers) in raw_stats.items():
+        for caller, caller_stats in callers.items():
+            # The cumulative time of the function when called from the caller.
+            callees[caller][function] = caller_stats[3]
+    roots = [function for function, function_stats in raw_stats.items()
+             if not function_stats[4]]
+
+    stacks: Dict[str, float] = defaultdict(float)
+
+    def walk(function: FunctionKey, stack: List[str], seen: set, fraction: float) -> None:
+        own_time = raw_stats[function][2] * fraction
+        if own_time:
+            stacks[';'.join(stack)] += own_time
+        if len(stack) >= _MAX_STACK_DEPTH:
+            return
+        for callee, edge_time in callees[function].items():
+            callee_time = raw_stats[callee][3]
+            if callee in seen or not callee_time:
+                continue
+            callee_fraction = edge_time * fraction / callee_time
+            if callee_time * callee_fraction * 1e6 < _MIN_STACK_MICROS:
+                continue
+            seen.add(callee)
+            walk(callee, stack + [_label(callee)], seen, callee_fraction)
+            seen.remove(callee)
+
+    for root in roots:
+        walk(root, [_label(root)], {root}, 1.0)
+    return {stack: int(seconds * 1e6) for stack, seconds in stacks.items()
+            if seconds * 1e6 >= _MIN_STACK_MICROS}
+
+
+def _label(function: FunctionKey) -> str:
+    filename, line, name = function
+    if filename == '~':
+        # Built in functions have no file.
+        return name
+    return f'{os.path.basename(filename)}:{name}:{line}'
+
+
+def log_hot_functions(stats: pstats.Stats, source_dir: str = 'parsing',
+                      limit: int = 15) -> None:
+    """Log the functions under the source directory with the most own time."""
+    marker = os.sep + source_dir + os.sep
+    functions = [(function, function_stats) for function, function_stats in stats.stats.items()
+                 if marker in function[0]]
+    functions.sort(key=lambda item: item[1][2], reverse=True)
+    lines = [f"{'own s':>9}{'cumul s':>9}{'calls':>10}  function"]
+    for (filename, line, name), (_, calls, own_time, cumulative_time, _) in functions[:limit]:
+        lines.append(f'{own_time:>9.3f}{cumulative_time:>9.3f}{calls:>10}  '
+                     f'{source_dir}/{os.path.basename(filename)}:{line}({name})')
+    logger.info(f'Hottest functions in {source_dir}/ across all processes:\n' +
+                '\n'.join(lines))
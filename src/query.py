@@ -0,0 +1,210 @@
+"""Memoized analytics queries over the exported leagues.
+
+Notebooks and dashboards run the same filtered group-bys again and again. A
+QueryCache normalizes each query, so the same filters, group-by keys and
+aggregates in any order or spelling are the same query, and keeps the
+results in memory and on disk, shared between processes, evicting the least
+recently used from both:
+
+    cache = QueryCache("D:/SavedLogs", cache_dir="D:/SavedLogs/query_cache")
+    cache.query(["LG000021"], filters={"type": "pass", "down": [3, 4]},
+                group_by=["coverage"], aggregates={"yards": ["mean", "count"]})
+
+A result is keyed by the query and a fingerprint of each league's export:
+the version of its segment manifest, or the size and modification time of
+its feather file. Re-exporting or compacting a league changes the
+fingerprint, so stale results are never returned, and are evicted from the
+disk once enough newer results are cached.
+"""
+import hashlib
+import json
+import logging
+import os
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+
+from file_store import PickleStore
+from segments import MANIFEST_FILE, load_manifest, read_league
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FILE = 'parsed_logs.fe'
+# The aggregate that counts the plays of each group, whatever the column.
+PLAYS = 'plays'
+
+_OPERATORS = {
+    '==': lambda values, value: values == value,
+    '!=': lambda values, value: values != value,
+    '<': lambda values, value: values < value,
+    '<=': lambda values, value: values <= value,
+    '>': lambda values, value: values > value,
+    '>=': lambda values, value: values >= value,
+    'in': lambda values, value: values.isin(value),
+    'not in': lambda values, value: ~values.isin(value),
+}
+_AGGREGATES = ('count', 'sum', 'mean', 'median', 'min', 'max', 'std', 'nunique')
+
+Filters = Union[Dict[str, Any], Sequence[Tuple[str, str, Any]]]
+Aggregates = Union[Dict[str, Union[str, Sequence[str]]], Sequence[Tuple[str, str]]]
+
+
+@dataclass(frozen=True)
+class QuerySpec:
+    # The leagues to query, sorted.
+    leagues: Tuple[str, ...]
+    # (column, operator, value) triples, sorted. The values of in and not in
+    # are sorted tuples.
+    filters: Tuple[Tuple[str, str, Any], ...] = ()
+    # The group-by keys, in the order of the result's index.
+    group_by: Tuple[str, ...] = ()
+    # (column, aggregate) pairs, sorted. (PLAYS, 'count') counts the plays.
+    aggregates: Tuple[Tuple[str, str], ...] = ((PLAYS, 'count'),)
+
+    def columns(self) -> List[str]:
+        """The columns the query reads."""
+        columns = [column for column, _, _ in self.filters] + list(self.group_by) + \
+            [column for column, _ in self.aggregates if column != PLAYS]
+        return list(dict.fromkeys(columns))
+
+    def key(self) -> str:
+        return hashlib.blake2b(json.dumps(asdict(self), default=str).encode(),
+                               digest_size=20).hexdigest()
+
+
+def normalize_query(leagues: Sequence[str], filters: Optional[Filters] = None,
+                    group_by: Optional[Sequence[str]] = None,
+                    aggregates: Optional[Aggregates] = None) -> QuerySpec:
+    """The canonical QuerySpec of a query.
+
+    :param: leagues: The leagues to query.
+    :param: filters: Optional {column: value} equalities, where a list or
+    tuple value means any of them, or (column, operator, value) triples with
+    the operators ==, !=, <, <=, >, >=, in and not in.
+    :param: group_by: Optional columns to group by.
+    :param: aggregates: Optional {column: aggregate or [aggregates]} or
+    (column, aggregate) pairs, e.g. {'yards': ['mean', 'count']}. Defaults
+    to counting the plays.
+    """
+    if isinstance(filters, dict):
+        filters = [(column, 'in' if isinstance(value, (list, tuple, set)) else '==', value)
+                   for column, value in filters.items()]
+    normalized_filters = []
+    for column, operator, value in filters or []:
+        if operator not in _OPERATORS:
+            raise ValueError(f"Unknown operator {operator}. Operators are "
+                             f"{', '.join(_OPERATORS)}.")
+        if operator in ('in', 'not in'):
+            value = tuple(sorted(set(value), key=repr))
+        normalized_filters.append((column, operator, value))
+
+    if isinstance(aggregates, dict):
+        aggregates = [(column, aggregate) for column, column_aggregates in aggregates.items()
+                      for aggregate in ([column_aggregates] if isinstance(column_aggregates, str)
+                                        else column_aggregates)]
+    for _, aggregate in aggregates or []:
+        if aggregate not in _AGGREGATES:
+            raise ValueError(f"Unknown aggregate {aggregate}. Aggregates are "
+                             f"{', '.join(_AGGREGATES)}.")
+    return QuerySpec(leagues=tuple(sorted(set(leagues))),
+                     filters=tuple(sorted(normalized_filters, key=repr)),
+                     group_by=tuple(group_by or ()),
+                     aggregates=tuple(sorted(set(aggregates or [(PLAYS, 'count')]))))
+
+
+def run_query(df: pd.DataFrame, spec: QuerySpec) -> pd.DataFrame:
+    """Run the query on the plays, without any caching.
+
+    :returns: One row per group, or a single row without group-by keys, with
+    a column per aggregate named like yards_mean, and plays for the count of
+    plays."""
+    mask = pd.Series(True, index=df.index)
+    for column, operator, value in spec.filters:
+        mask &= _OPERATORS[operator](df[column], list(value) if isinstance(value, tuple)
+                                     else value).fillna(False).astype(bool)
+    df = df[mask]
+    named = {(PLAYS if column == PLAYS else f'{column}_{aggregate}'):
+             (spec.group_by[0] if column == PLAYS and spec.group_by else column, aggregate)
+             for column, aggregate in spec.aggregates}
+    if spec.group_by:
+        return df.groupby(list(spec.group_by), observed=True).agg(**named)
+    return pd.DataFrame({name: [len(df) if column == PLAYS else df[column].agg(aggregate)]
+                         for name, (column, aggregate) in named.items()})
+
+
+class QueryCache(object):
+    """Runs queries on the league exports and memoizes their results."""
+
+    def __init__(self, export_dir: str, cache_dir: Optional[str] = None,
+                 max_entries: int = 128, max_disk_entries: int = 1024):
+        """
+        :param: export_dir: The directory the leagues were exported to.
+        :param: cache_dir: Optional directory to also cache results in on
+        disk, shared between processes and runs.
+        :param: max_entries: How many results to keep in memory.
+        :param: max_disk_entries: How many results to keep in cache_dir.
+        """
+        self.export_dir = export_dir
+        self.cache_dir = cache_dir
+        self._store = PickleStore(cache_dir, max_disk_entries) if cache_dir else None
+        self.max_entries = max_entries
+        self._results: 'OrderedDict[str, pd.DataFrame]' = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def query(self, leagues: Sequence[str], filters: Optional[Filters] = None,
+              group_by: Optional[Sequence[str]] = None,
+              aggregates: Optional[Aggregates] = None) -> pd.DataFrame:
+        """The result of the query, see normalize_query for its arguments.
+
+        :returns: A copy of the result, which can be changed freely."""
+        spec = normalize_query(leagues, filters, group_by, aggregates)
+        fingerprints = [self.fingerprint(league) for league in spec.leagues]
+        key = hashlib.blake2b(f'{spec.key()}{fingerprints}'.encode(),
+                              digest_size=20).hexdigest()
+        result = self._results.get(key)
+        if result is not None:
+            self.hits += 1
+            self._results.move_to_end(key)
+            return result.copy()
+        result = self._store.get(key) if self._store else None
+        if result is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            result = run_query(self._read(spec), spec)
+            if self._store:
+                self._store.put(key, result)
+        self._results[key] = result
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+        return result.copy()
+
+    def fingerprint(self, league: str) -> Tuple:
+        """What changes whenever the league is exported or compacted again."""
+        league_dir = os.path.join(self.export_dir, league)
+        manifest_path = os.path.join(league_dir, MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            stat = os.stat(manifest_path)
+            return (MANIFEST_FILE, load_manifest(league_dir).version, stat.st_mtime_ns)
+        stat = os.stat(os.path.join(league_dir, EXPORT_FILE))
+        return (EXPORT_FILE, stat.st_size, stat.st_mtime_ns)
+
+    def clear(self) -> None:
+        """Forget the results in memory. The disk cache is kept."""
+        self._results.clear()
+
+    def _read(self, spec: QuerySpec) -> pd.DataFrame:
+        columns = spec.columns()
+        frames = []
+        for league in spec.leagues:
+            league_dir = os.path.join(self.export_dir, league)
+            if os.path.exists(os.path.join(league_dir, MANIFEST_FILE)):
+                frames.append(read_league(league_dir, columns))
+            else:
+                frames.append(pd.read_feather(os.path.join(league_dir, EXPORT_FILE),
+                                              columns=columns))
+        return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
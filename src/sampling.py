@@ -0,0 +1,105 @@
+"""Responsible for picking representative samples of game logs.
+
+Quick runs over the first few logs found are usually skewed toward one season.
+These samples are seeded, so the same logs are picked every time, and
+stratified by season and optionally by team so each is represented in
+proportion to its share of the league."""
+import logging
+import os
+import random
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from loader import log_year
+from parsing.teams import CITY_TO_ABBREV
+
+logger = logging.getLogger(__name__)
+
+# The participation tables are at the end of each log, so only the tail is read
+# to find the teams.
+_TAIL_BYTES = 64 * 1024
+_TABLE_HEADER_REGEX = r'<th[^>]*>([^<]+)</th>'
+
+
+def stratified_sample(paths: List[str], sample_size: int, seed: int = 0,
+                      by_team: bool = False) -> List[str]:
+    """Pick a reproducible sample of game logs stratified by season.
+
+    :param: paths: All the game log paths to sample from.
+    :param: sample_size: How many logs to pick.
+    :param: seed: The random seed, the same seed always picks the same logs.
+    :param: by_team: Whether to also stratify by the home team. This reads the
+    end of every log to find its teams.
+    :returns: The sampled paths in sorted order.
+    """
+    paths = sorted(paths)
+    if sample_size >= len(paths):
+        return paths
+    strata: Dict[Tuple, List[str]] = defaultdict(list)
+    for path in paths:
+        key = (log_year(path), log_home_team(path)) if by_team else (log_year(path),)
+        strata[key].append(path)
+
+    rng = random.Random(seed)
+    sample = []
+    allocations = _allocate(sample_size, {key: len(group) for key, group in strata.items()})
+    for key in sorted(strata, key=repr):
+        sample.extend(rng.sample(strata[key], allocations[key]))
+    logger.info(f'Sampled {len(sample)} of {len(paths)} game logs from '
+                f'{len(strata)} strata.')
+    return sorted(sample)
+
+
+def _allocate(sample_size: int, sizes: Dict[Tuple, int]) -> Dict[Tuple, int]:
+    """Split the sample across strata in proportion to their sizes.
+
+    Every stratum gets at least one log when the sample is big enough, and the
+    rest is handed out by largest remainder."""
+    total = sum(sizes.values())
+    keys = sorted(sizes, key=repr)
+    allocations = {key: 0 for key in keys}
+    remaining = sample_size
+    if sample_size >= len(keys):
+        for key in keys:
+            allocations[key] = 1
+        remaining -= len(keys)
+    quotas = {key: remaining * sizes[key] / total for key in keys}
+    for key in keys:
+        extra = min(int(quotas[key]), sizes[key] - allocations[key])
+        allocations[key] += extra
+        remaining -= extra
+    by_remainder = sorted(keys, key=lambda k: quotas[k] - int(quotas[k]), reverse=True)
+    while remaining > 0:
+        for key in by_remainder:
+            if remaining and allocations[key] < sizes[key]:
+                allocations[key] += 1
+                remaining -= 1
+    return allocations
+
+
+def log_home_team(game_log_path: str) -> Optional[str]:
+    """The abbreviation of the home team, read from the end of the game log."""
+    with open(game_log_path, 'rb') as game_log_file:
+        game_log_file.seek(0, os.SEEK_END)
+        game_log_file.seek(max(0, game_log_file.tell() - _TAIL_BYTES))
+        tail = game_log_file.read().decode('utf-8', errors='ignore')
+    cities = [city.strip() for city in re.findall(_TABLE_HEADER_REGEX, tail)
+              if city.strip() in CITY_TO_ABBREV]
+    # The away team's table comes before the home team's.
+    return CITY_TO_ABBREV[cities[-1]] if cities else None
+
+
+def estimate_full_run(all_paths: List[str], sample_paths: List[str],
+                      sample_seconds: float, sample_output_bytes: int) -> Tuple[float, float]:
+    """Estimate the time and output size of parsing every log from a sample.
+
+    Logs vary in length, so the sample is scaled up by the total size of the
+    logs rather than their count.
+
+    :returns: The estimated seconds and output bytes of the full run.
+    """
+    all_bytes = sum(os.path.getsize(path) for path in all_paths)
+    sample_bytes = sum(os.path.getsize(path) for path in sample_paths)
+    scale = all_bytes / sample_bytes if sample_bytes else 0.0
+    return sample_seconds * scale, sample_output_bytes * scale
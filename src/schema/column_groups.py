@@ -0,0 +1,64 @@
+"""Groups of output columns, one group per sub-parser of a play.
+
+The group names match the fields of ParsedPlay, and the columns match the
+innermost field names of the schema, which are the exported column names."""
+from dataclasses import fields
+from typing import Collection, Dict, List, Optional, Set, Tuple
+
+from schema.game_context import GameContext, Clock, FieldPosition, DownDistance
+from schema.play_call import DefensivePlay, OffensivePlay, PlayType
+from schema.play_outcome import PassingOutcome, PlayOutcome, RunningOutcome
+from schema.player_names import PlayerNames
+
+CALL = 'call'
+OUTCOME = 'outcome'
+NAMES = 'names'
+CONTEXT = 'context'
+
+
+def _field_names(*schemas) -> List[str]:
+    names = []
+    for schema in schemas:
+        for schema_field in fields(schema):
+            if schema_field.name not in names:
+                names.append(schema_field.name)
+    return names
+
+
+COLUMN_GROUPS: Dict[str, List[str]] = {
+    # play_type is only a column when the play type couldn't be parsed.
+    CALL: _field_names(OffensivePlay, PlayType, DefensivePlay),
+    # outcome is only a column for plays that aren't parsed, e.g. punts.
+    OUTCOME: _field_names(PlayOutcome, PassingOutcome, RunningOutcome),
+    NAMES: _field_names(PlayerNames),
+    CONTEXT: [name for name in _field_names(GameContext, Clock, FieldPosition, DownDistance)
+              if name not in ('clock', 'field_pos', 'down_distance')],
+}
+
+_COLUMN_TO_GROUP = {column: group for group, columns in COLUMN_GROUPS.items()
+                    for column in columns}
+
+
+def resolve_columns(columns: Optional[Collection[str]]) -> Tuple[Optional[Set[str]],
+                                                                 Optional[Set[str]]]:
+    """Work out which sub-parsers must run for the requested columns.
+
+    :param: columns: Group names and/or column names, or None for everything.
+    :returns: The groups to parse and the columns to emit, both None when
+    everything is requested.
+    """
+    if not columns:
+        return None, None
+    groups = set()
+    emitted = set()
+    for column in columns:
+        if column in COLUMN_GROUPS:
+            groups.add(column)
+            emitted.update(COLUMN_GROUPS[column])
+        elif column in _COLUMN_TO_GROUP:
+            groups.add(_COLUMN_TO_GROUP[column])
+            emitted.add(column)
+        else:
+            raise ValueError(f"Unknown column or column group: {column}. The groups "
+                             f"are {', '.join(COLUMN_GROUPS)}.")
+    return groups, emitted
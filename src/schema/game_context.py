@@ -29,3 +29,6 @@ class GameContext:
     down_distance: DownDistance
     # Whether the home team has the ball.
     home_possession: bool
+    # The three letter abbreviations of the home and away teams.
+    home_team: str
+    away_team: str
@@ -1,5 +1,6 @@
 """Schema for a fully parsed play."""
 from dataclasses import dataclass
+from typing import Optional
 
 from schema.game_context import GameContext
 from schema.play_call import PlayCall
@@ -9,7 +10,9 @@ from schema.player_names import PlayerNames
 
 @dataclass(frozen=True)
 class ParsedPlay:
-    call: PlayCall
-    outcome: PlayOutcome
-    names: PlayerNames
-    context: GameContext
+    # Each part is None when its columns weren't requested. The outcome is
+    # also None for plays that aren't parsed, e.g. punts.
+    call: Optional[PlayCall] = None
+    outcome: Optional[PlayOutcome] = None
+    names: Optional[PlayerNames] = None
+    context: Optional[GameContext] = None
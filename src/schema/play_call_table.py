@@ -0,0 +1,44 @@
+"""Schema for a decoded play call table from the play by play."""
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class PlayerAssignment:
+    # E.g. QB, X(SE), LDE, 3tcDT
+    position: str
+    # First initial and last name, e.g. J.Smith, or Unknown.
+    short_name: str
+    # The raw responsibility, e.g. 'Primary, Wheel', 'Protect', 'Blitz'.
+    responsibility: str = ''
+    # The text before the comma, e.g. Primary, Secondary, Ball Carrier.
+    priority: str = ''
+    # The route after the comma, e.g. Wheel, 9. Empty if there is no route.
+    route: str = ''
+
+
+@dataclass(frozen=True)
+class PlayCallTable:
+    # The offensive call split on commas, e.g. ('113 Personnel', 'I
+    # formation', 'Shotgun'). None if the table has no offensive call.
+    offense_call: Optional[Tuple[str, ...]]
+    # The defensive call split on commas, e.g. ('43 Over formation', 'Nickel
+    # Personnel', 'Cover 2'). None if the table has no defensive call.
+    defense_call: Optional[Tuple[str, ...]]
+    # One assignment per player row, in table order.
+    offense: Tuple[PlayerAssignment, ...] = ()
+    defense: Tuple[PlayerAssignment, ...] = ()
+    # The first offensive player with the ball carrier responsibility.
+    ball_carrier: Optional[PlayerAssignment] = None
+    # The number of offensive players with the protect responsibility.
+    protect: int = 0
+    # The number of defenders blitzing.
+    blitz: int = 0
+    # Whether a defender is spying the QB.
+    spy: bool = False
+    # The receiver being doubled, or empty if no double.
+    double_target: str = ''
+    # The first offensive player for each priority, e.g. Primary.
+    by_priority: Dict[str, PlayerAssignment] = field(default_factory=dict)
+    # The first offensive player for each short name.
+    by_short_name: Dict[str, PlayerAssignment] = field(default_factory=dict)
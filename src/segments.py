@@ -0,0 +1,469 @@
+"""Append-only segments of a league's exported plays, with compaction.
+
+Rewriting a league's single feather file costs a full rewrite for every
+addition, and a reader opening it mid-write sees half a file. Instead, each
+export can append an immutable segment, a feather file in the league's
+`segments` directory, and a manifest lists the segments that make up the
+league. The manifest is replaced atomically, so a reader that reads it once
+and then the segments it lists always sees a consistent snapshot.
+
+A segment's plays supersede the plays of the same games in older segments,
+so re-parsed games replace their old rows without touching old files.
+
+Compaction merges small segments into large ones sorted by season and game,
+with a size-tiered policy: segments of similar size are bucketed together,
+and a bucket with enough segments is merged into one. The manifest records
+when each merged segment was retired, and its file stays on disk for a grace
+period from then, so readers of an older snapshot can finish.
+
+Run from the src directory, e.g. in the background with --interval:
+`python -m segments --export_dir ~/fof_exports --league_ids LG000021
+--interval 600`
+"""
+import argparse
+import json
+import logging
+import os
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import List, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+from column_names import GAME_ID, SUMMARY, YEAR
+from file_store import atomic_open, atomic_path
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = 'manifest.json'
+SEGMENT_DIR = 'segments'
+_LOCK_FILE = 'manifest.lock'
+# A lock older than this was left behind by a writer that died.
+_STALE_LOCK_SECONDS = 600
+_LOCK_POLL_SECONDS = 0.1
+
+# Size-tiered compaction. Segments within BUCKET_LOW to BUCKET_HIGH times the
+# average size of a bucket join it, and every segment under MIN_SEGMENT_BYTES
+# goes in the first bucket.
+MIN_MERGE = 4
+MAX_MERGE = 32
+BUCKET_LOW = 0.5
+BUCKET_HIGH = 1.5
+MIN_SEGMENT_BYTES = 8 * 1024 * 1024
+# How long merged segments are kept for readers of older snapshots.
+GRACE_SECONDS = 3600
+
+
+@dataclass(frozen=True)
+class Segment:
+    # The segment's file name in the segments directory.
+    name: str
+    # How many plays it holds, and the size of its file.
+    rows: int
+    bytes: int
+    # The games it holds, which supersede the same games in older segments.
+    games: List[str] = field(default_factory=list)
+    # Whether its plays are sorted by season and game, as compaction leaves them.
+    sorted: bool = False
+    created: float = 0.0
+
+
+@dataclass(frozen=True)
+class Retired:
+    # The file name of a segment that compaction merged away.
+    name: str
+    # When it was taken out of the manifest.
+    retired_at: float
+
+
+@dataclass(frozen=True)
+class Manifest:
+    # Incremented by every change to the segments.
+    version: int = 0
+    # Oldest first.
+    segments: List[Segment] = field(default_factory=list)
+    # Merged segments whose files are kept for readers of older snapshots.
+    retired: List[Retired] = field(default_factory=list)
+
+
+def load_manifest(league_dir: str) -> Manifest:
+    """The league's current manifest, empty if it has no segments yet."""
+    try:
+        with open(os.path.join(league_dir, MANIFEST_FILE)) as manifest_file:
+            data = json.load(manifest_file)
+    except FileNotFoundError:
+        return Manifest()
+    return Manifest(data['version'], [Segment(**segment) for segment in data['segments']],
+                    [Retired(**retired) for retired in data.get('retired', [])])
+
+
+def append_segment(league_dir: str, df: pd.DataFrame) -> str:
+    """Write the plays as a new segment and add it to the manifest.
+
+    :param: league_dir: The league's export directory.
+    :param: df: The exported dataframe of plays.
+    :returns: The path of the new segment.
+    """
+    segment = _write_segment(league_dir, df, is_sorted=False)
+    with _ManifestLock(league_dir):
+        manifest = load_manifest(league_dir)
+        _save_manifest(league_dir, Manifest(manifest.version + 1,
+                                            manifest.segments + [segment],
+                                            manifest.retired))
+    logger.info(f'Appended {segment.rows} plays from {len(segment.games)} games as '
+                f'segment {segment.name}.')
+    return _segment_path(league_dir, segment.name)
+
+
+def read_league(league_dir: str, columns: Optional[List[str]] = None,
+                manifest: Optional[Manifest] = None) -> pd.DataFrame:
+    """Read a consistent snapshot of the league's plays.
+
+    :param: columns: Optional columns to read. Defaults to every column.
+    Plays of segments without a column have NaN in it.
+    :param: manifest: Optional snapshot to read, defaults to the current one.
+    """
+    manifest = manifest or load_manifest(league_dir)
+    if columns is not None and GAME_ID not in columns:
+        columns = list(columns) + [GAME_ID]
+        drop_game_id = True
+    else:
+        drop_game_id = False
+    frames = [_read_live(league_dir, manifest, position, columns)
+              for position in range(len(manifest.segments))]
+    df = _concat(frames)
+    return df.drop(columns=[GAME_ID]) if drop_game_id and GAME_ID in df.columns else df
+
+
+def read_league_rows(league_dir: str, rows: np.ndarray, columns: Optional[List[str]] = None,
+                     manifest: Optional[Manifest] = None) -> pd.DataFrame:
+    """Read the plays at the sorted rows of a snapshot of the league, the rows
+    read_league has them at, only reading the segments and their record
+    batches that have any of them.
+
+    :param: columns: Optional columns to read. Defaults to every column.
+    :param: manifest: Optional snapshot to read, defaults to the current one.
+    :returns: The plays, indexed by their rows.
+    """
+    manifest = manifest or load_manifest(league_dir)
+    rows = np.asarray(rows, dtype=np.int64)
+    frames = []
+    start = 0
+    for position, segment in enumerate(manifest.segments):
+        path = _segment_path(league_dir, segment.name)
+        if not len(rows) or rows[-1] < start:
+            # Only the columns of the rest are read, for the columns of the result.
+            frames.append(read_rows(path, rows[:0], columns))
+            continue
+        superseded = _superseded_games(manifest, position)
+        live = None
+        if superseded:
+            game_ids = pd.read_feather(path, columns=[GAME_ID])[GAME_ID].astype(str)
+            live = np.flatnonzero(~game_ids.isin(superseded).to_numpy())
+        length = segment.rows if live is None else len(live)
+        segment_rows = rows[(rows >= start) & (rows < start + length)] - start
+        frames.append(read_rows(path, segment_rows if live is None else live[segment_rows],
+                                columns))
+        start += length
+    df = _concat(frames)
+    df.index = rows
+    return df
+
+
+def read_rows(path: str, rows: np.ndarray, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Read the plays at the sorted rows of a feather file, only decompressing
+    the record batches that have any of them.
+
+    :param: columns: Optional columns to read. Defaults to every column, and
+    columns the file doesn't have are left out.
+    :returns: The plays, indexed by their rows.
+    """
+    import pyarrow as pa
+    import pyarrow.ipc
+
+    rows = np.asarray(rows, dtype=np.int64)
+    with pa.memory_map(path) as source:
+        names = pa.ipc.open_file(source).schema.names
+        columns = names if columns is None else [column for column in columns
+                                                 if column in names]
+        # An empty list of fields reads all of them.
+        fields = [names.index(column) for column in columns] or [0]
+        reader = pa.ipc.open_file(source, options=pa.ipc.IpcReadOptions(included_fields=fields))
+        # The batch lengths are only known by reading a batch, so the first
+        # column is read for them.
+        lengths = pa.ipc.open_file(source, options=pa.ipc.IpcReadOptions(included_fields=[0]))
+        batches = []
+        start = 0
+        for position in range(reader.num_record_batches if len(rows) else 0):
+            if rows[-1] < start:
+                break
+            length = lengths.get_batch(position).num_rows
+            batch_rows = rows[(rows >= start) & (rows < start + length)] - start
+            if len(batch_rows):
+                batches.append(reader.get_batch(position).take(pa.array(batch_rows)))
+            start += length
+        table = pa.Table.from_batches(batches, schema=reader.schema)
+    df = table.to_pandas()[columns]
+    df.index = rows
+    return df
+
+
+def plan_compaction(segments: List[Segment], min_merge: int = MIN_MERGE,
+                    max_merge: int = MAX_MERGE) -> List[Segment]:
+    """The segments to merge next by the size-tiered policy, or none.
+
+    Segments are bucketed by size, and the bucket of the smallest segments
+    with at least min_merge of them is chosen, at most max_merge of it."""
+    buckets: List[List[Segment]] = []
+    for segment in sorted(segments, key=lambda s: s.bytes):
+        bucket = buckets[-1] if buckets else None
+        if bucket is not None:
+            average = sum(s.bytes for s in bucket) / len(bucket)
+            if segment.bytes < MIN_SEGMENT_BYTES and bucket[0].bytes < MIN_SEGMENT_BYTES \
+                    or BUCKET_LOW * average <= segment.bytes <= BUCKET_HIGH * average:
+                bucket.append(segment)
+                continue
+        buckets.append([segment])
+    for bucket in buckets:
+        if len(bucket) >= min_merge:
+            return bucket[:max_merge]
+    return []
+
+
+def compact(league_dir: str, min_merge: int = MIN_MERGE, max_merge: int = MAX_MERGE,
+            grace_seconds: float = GRACE_SECONDS) -> int:
+    """Merge the league's segments until the policy finds nothing to merge,
+    then remove merged segments retired longer ago than the grace period.
+    A text index of the league is rebuilt after any merge, as its plays are
+    then in a new order.
+
+    Segments appended while a merge runs are kept, the merge only replaces
+    its own inputs.
+
+    :returns: How many merges were made.
+    """
+    merges = 0
+    while True:
+        manifest = load_manifest(league_dir)
+        inputs = plan_compaction(manifest.segments, min_merge, max_merge)
+        if not inputs:
+            break
+        names = {segment.name for segment in inputs}
+        positions = [position for position, segment in enumerate(manifest.segments)
+                     if segment.name in names]
+        newest = manifest.segments[positions[-1]].name
+        # Rows superseded by any newer segment are dropped, so the output can
+        # take the place of the newest input.
+        df = _concat([_read_live(league_dir, manifest, position) for position in positions])
+        sort_columns = [column for column in (YEAR, GAME_ID) if column in df.columns]
+        if sort_columns:
+            df = df.sort_values(sort_columns, kind='stable', ignore_index=True)
+        merged = _write_segment(league_dir, df, is_sorted=True)
+        with _ManifestLock(league_dir):
+            current = load_manifest(league_dir)
+            if not names <= {segment.name for segment in current.segments}:
+                # Another compaction got there first.
+                os.remove(_segment_path(league_dir, merged.name))
+                continue
+            kept = []
+            for segment in current.segments:
+                if segment.name == newest:
+                    kept.append(merged)
+                elif segment.name not in names:
+                    kept.append(segment)
+            retired = [Retired(name, time.time()) for name in sorted(names)]
+            _save_manifest(league_dir, Manifest(current.version + 1, kept,
+                                                current.retired + retired))
+        merges += 1
+        logger.info(f'Merged {len(inputs)} segments into {merged.name}, '
+                    f'{merged.rows} plays.')
+    if merges:
+        _rebuild_text_index(league_dir)
+    remove_unused_segments(league_dir, grace_seconds)
+    return merges
+
+
+def remove_unused_segments(league_dir: str, grace_seconds: float = GRACE_SECONDS) -> int:
+    """Remove segment files no longer in the manifest: retired segments once
+    the grace period has passed since they were retired, and files never
+    added to it, e.g. by a writer that died, once they're older than it.
+
+    :returns: How many were removed."""
+    segment_dir = os.path.join(league_dir, SEGMENT_DIR)
+    if not os.path.isdir(segment_dir):
+        return 0
+    with _ManifestLock(league_dir):
+        manifest = load_manifest(league_dir)
+        used = {segment.name for segment in manifest.segments}
+        retired_at = {retired.name: retired.retired_at for retired in manifest.retired}
+        removed = 0
+        now = time.time()
+        names = os.listdir(segment_dir)
+        # Retired files that are gone already needn't be tracked.
+        retired_at = {name: at for name, at in retired_at.items() if name in names}
+        for name in names:
+            path = os.path.join(segment_dir, name)
+            if name in used:
+                continue
+            since = retired_at.get(name, os.path.getmtime(path))
+            if now - since >= grace_seconds:
+                os.remove(path)
+                retired_at.pop(name, None)
+                removed += 1
+        if len(retired_at) < len(manifest.retired):
+            # Forgetting removed files isn't a change to the segments, so the
+            # version stays the same.
+            _save_manifest(league_dir, Manifest(
+                manifest.version, manifest.segments,
+                [retired for retired in manifest.retired if retired.name in retired_at]))
+    return removed
+
+
+def _rebuild_text_index(league_dir: str) -> None:
+    """Rebuild the league's text index, if it has one, over the current
+    snapshot."""
+    from text_index import TEXT_INDEX_DIR, build_text_index
+
+    index_dir = os.path.join(league_dir, TEXT_INDEX_DIR)
+    if not os.path.isdir(index_dir):
+        return
+    manifest = load_manifest(league_dir)
+    df = read_league(league_dir, manifest=manifest)
+    if SUMMARY in df.columns:
+        build_text_index(df[SUMMARY], index_dir, MANIFEST_FILE, manifest.version)
+
+
+def _write_segment(league_dir: str, df: pd.DataFrame, is_sorted: bool) -> Segment:
+    """Write the plays to a new segment file, not yet in the manifest."""
+    segment_dir = os.path.join(league_dir, SEGMENT_DIR)
+    os.makedirs(segment_dir, exist_ok=True)
+    # The running index of an export isn't meaningful across segments.
+    df = df.drop(columns=['index'], errors='ignore').reset_index(drop=True)
+    name = f'seg-{time.strftime("%Y%m%d%H%M%S")}-{uuid.uuid4().hex[:8]}.fe'
+    path = os.path.join(segment_dir, name)
+    # Written under a temporary name, so a segment file is always complete.
+    with atomic_path(path) as tmp_path:
+        df.to_feather(tmp_path)
+    games = sorted(df[GAME_ID].astype(str).unique()) if GAME_ID in df.columns else []
+    return Segment(name=name, rows=len(df), bytes=os.path.getsize(path), games=games,
+                   sorted=is_sorted, created=time.time())
+
+
+def _read_live(league_dir: str, manifest: Manifest, position: int,
+               columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """The plays of the segment at the position that no newer segment supersedes."""
+    import pyarrow.ipc
+
+    segment = manifest.segments[position]
+    path = _segment_path(league_dir, segment.name)
+    if columns is not None:
+        # Runs can export different columns, e.g. summaries only with
+        # --keep_summary. Columns a segment lacks are missing from its plays.
+        with pyarrow.ipc.open_file(path) as reader:
+            available = set(reader.schema.names)
+        columns = [column for column in columns if column in available]
+    df = pd.read_feather(path, columns=columns)
+    superseded = _superseded_games(manifest, position)
+    if superseded:
+        df = df[~df[GAME_ID].astype(str).isin(superseded)]
+    return df
+
+
+def _superseded_games(manifest: Manifest, position: int) -> Set[str]:
+    """The games of the segment at the position that a newer segment has."""
+    superseded: Set[str] = set()
+    for newer in manifest.segments[position + 1:]:
+        superseded.update(newer.games)
+    superseded.intersection_update(manifest.segments[position].games)
+    return superseded
+
+
+def _concat(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate segments, keeping columns categorical in any of them
+    categorical, which concat turns to objects when the categories differ."""
+    if not frames:
+        return pd.DataFrame()
+    categorical = {column for frame in frames for column, dtype in frame.dtypes.items()
+                   if isinstance(dtype, pd.CategoricalDtype)}
+    df = pd.concat(frames, ignore_index=True)
+    for column in categorical:
+        if not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype('category')
+    return df
+
+
+def _segment_path(league_dir: str, name: str) -> str:
+    return os.path.join(league_dir, SEGMENT_DIR, name)
+
+
+def _save_manifest(league_dir: str, manifest: Manifest) -> None:
+    with atomic_open(os.path.join(league_dir, MANIFEST_FILE), 'w') as manifest_file:
+        json.dump(asdict(manifest), manifest_file)
+
+
+class _ManifestLock(object):
+    """Serializes changes to a league's manifest between processes, with a
+    lock file that works on any OS."""
+
+    def __init__(self, league_dir: str):
+        self._path = os.path.join(league_dir, _LOCK_FILE)
+
+    def __enter__(self):
+        while True:
+            try:
+                os.close(os.open(self._path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return self
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self._path) > _STALE_LOCK_SECONDS:
+                        logger.warning(f'Removing the stale lock {self._path}.')
+                        os.remove(self._path)
+                        continue
+                except FileNotFoundError:
+                    continue
+                time.sleep(_LOCK_POLL_SECONDS)
+
+    def __exit__(self, *exc_info):
+        os.remove(self._path)
+
+
+def main(args):
+    leagues = args.league_ids.split(",")
+    while True:
+        for league in leagues:
+            league_dir = os.path.join(args.export_dir, league)
+            merges = compact(league_dir, args.min_merge, args.max_merge, args.grace_seconds)
+            manifest = load_manifest(league_dir)
+            logger.info(f'{league}: {merges} merges, {len(manifest.segments)} segments.')
+        if not args.interval:
+            return
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--export_dir", help="The directory the leagues were "
+                                             "exported to with --segments.",
+                        type=str)
+    parser.add_argument("--league_ids", help="A comma separated list of the "
+                                             "leagues to compact.", type=str)
+    parser.add_argument("--min_merge", help="How many segments of a similar "
+                                            "size it takes to merge them.",
+                        type=int, default=MIN_MERGE)
+    parser.add_argument("--max_merge", help="The most segments to merge at "
+                                            "once.", type=int, default=MAX_MERGE)
+    parser.add_argument("--grace_seconds", help="How long to keep merged "
+                                                "segments for readers of "
+                                                "older snapshots.",
+                        type=float, default=GRACE_SECONDS)
+    parser.add_argument("--interval", help="Optional: Keep running, "
+                                           "compacting every this many "
+                                           "seconds.", type=float)
+    parser.add_argument("--log_level", help="Optional: The logging level, "
+                                            "e.g. DEBUG. Defaults to INFO.",
+                        type=str, default="INFO")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper())
+    main(args)
@@ -0,0 +1,271 @@
+"""A long lived parse service with a warm worker pool.
+
+Starting python and a process pool for every run dominates when only a
+handful of logs have changed. This server keeps the pool and a cache of parsed
+logs alive between requests, and listens on a local unix socket or on a
+localhost HTTP port.
+
+Run from the src directory with either:
+`python -m server --socket /tmp/fof_logs.sock`
+`python -m server --port 8765`
+
+Endpoints:
+* `GET /health`: Whether the server is up, and the size of its pool.
+* `GET /stats`: Request, cache and throughput counters.
+* `POST /parse`: Parse game logs. The JSON body holds either `paths`, a list of
+  game log paths, or `html`, a list of raw game log html strings along with the
+  season `year` they were played in. Rows come back as JSON by default, or as
+  an Arrow IPC stream with `?format=arrow`. Each returned game is a list of
+  flattened rows with the same column names as the exported dataframe. An
+  optional `columns` list limits the parsing to those column groups or columns.
+"""
+import argparse
+import hashlib
+import io
+import json
+import logging
+import os
+import socketserver
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import Pool
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from schema.column_groups import resolve_columns
+from worker import init_worker, parse_one_log, parse_html
+
+logger = logging.getLogger(__name__)
+
+_JSON = 'application/json'
+_ARROW_STREAM = 'application/vnd.apache.arrow.stream'
+
+
+class ParseService(object):
+    """Parses game logs in a warm pool and caches the flattened rows.
+
+    Logs on disk are cached by path, modification time and size, so an edited
+    log is parsed again. Raw html is cached by a hash of its contents."""
+
+    def __init__(self, n_jobs: Optional[int] = None, cache_size: int = 10000):
+        self._n_jobs = n_jobs or os.cpu_count()
+        self._pool = Pool(self._n_jobs, initializer=init_worker,
+                          initargs=(logging.getLogger().level,))
+        self._cache: OrderedDict = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+        self._started = time.time()
+        self._counters = {'requests': 0,
+                          'errors': 0,
+                          'logs_parsed': 0,
+                          'cache_hits': 0,
+                          'plays_returned': 0,
+                          'parse_seconds': 0.0}
+
+    def close(self) -> None:
+        self._pool.close()
+        self._pool.join()
+
+    def health(self) -> Dict:
+        return {'status': 'ok',
+                'workers': self._n_jobs,
+                'uptime_seconds': time.time() - self._started}
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._counters)
+            stats['cached_logs'] = len(self._cache)
+        parse_seconds = stats['parse_seconds']
+        stats['logs_per_second'] = (stats['logs_parsed'] / parse_seconds
+                                    if parse_seconds else 0.0)
+        stats['uptime_seconds'] = time.time() - self._started
+        return stats
+
+    def count(self, counter: str, amount=1) -> None:
+        with self._lock:
+            self._counters[counter] += amount
+
+    def parse_paths(self, paths: List[str],
+                    columns: Optional[List[str]] = None) -> List[List[Dict]]:
+        """Parse the game logs at the given paths, reusing cached games."""
+        columns_key = tuple(sorted(columns)) if columns else None
+        keys = []
+        for path in paths:
+            stat = os.stat(path)
+            keys.append(('path', os.path.abspath(path), stat.st_mtime_ns, stat.st_size,
+                         columns_key))
+        tasks = [(path, idx, columns) for idx, path in enumerate(paths)]
+        return self._parse_cached(keys, tasks, parse_one_log)
+
+    def parse_htmls(self, htmls: List[str], year: int,
+                    columns: Optional[List[str]] = None) -> List[List[Dict]]:
+        """Parse raw game log html, reusing cached games."""
+        columns_key = tuple(sorted(columns)) if columns else None
+        keys = [('html', hashlib.sha1(html.encode()).hexdigest(), year, columns_key)
+                for html in htmls]
+        tasks = [(html, year, columns) for html in htmls]
+        return self._parse_cached(keys, tasks, parse_html)
+
+    def _parse_cached(self, keys: List[Tuple], tasks: List[Tuple], task) -> List[List[Dict]]:
+        games: List[Optional[List[Dict]]] = [None] * len(keys)
+        missing = []
+        with self._lock:
+            for idx, key in enumerate(keys):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    games[idx] = self._cache[key]
+                else:
+                    missing.append(idx)
+            self._counters['cache_hits'] += len(keys) - len(missing)
+        if missing:
+            start_time = time.perf_counter()
+            results = self._pool.starmap(task, [tasks[idx] for idx in missing])
+            self.count('parse_seconds', time.perf_counter() - start_time)
+            self.count('logs_parsed', len(missing))
+            with self._lock:
+                for idx, parsed_dicts in zip(missing, results):
+                    games[idx] = parsed_dicts
+                    self._cache[keys[idx]] = parsed_dicts
+                while len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+        self.count('plays_returned', sum(len(game) for game in games))
+        return games
+
+
+def _to_arrow_ipc(games: List[List[Dict]]) -> bytes:
+    """Serialize the rows of every game as a single Arrow IPC stream."""
+    import pyarrow as pa
+    from arrow_handoff import rows_to_table
+
+    table = rows_to_table([row for game in games for row in game])
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+class ParseRequestHandler(BaseHTTPRequestHandler):
+    """Routes HTTP requests to the ParseService on the server."""
+
+    def do_GET(self):
+        route = urlparse(self.path).path
+        if route == '/health':
+            self._send_json(200, self.server.service.health())
+        elif route == '/stats':
+            self._send_json(200, self.server.service.stats())
+        else:
+            self._send_json(404, {'error': f'Unknown route {route}'})
+
+    def do_POST(self):
+        service: ParseService = self.server.service
+        url = urlparse(self.path)
+        if url.path != '/parse':
+            self._send_json(404, {'error': f'Unknown route {url.path}'})
+            return
+        service.count('requests')
+        out_format = parse_qs(url.query).get('format', ['json'])[0]
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length) or b'{}')
+            if 'paths' not in body and ('html' not in body or 'year' not in body):
+                raise ValueError("The request needs either 'paths', or 'html' and 'year'.")
+            columns = body.get('columns')
+            resolve_columns(columns)
+        except ValueError as e:
+            service.count('errors')
+            self._send_json(400, {'error': repr(e)})
+            return
+        try:
+            if 'paths' in body:
+                games = service.parse_paths(body['paths'], columns)
+            else:
+                games = service.parse_htmls(body['html'], int(body['year']), columns)
+        except OSError as e:
+            # E.g. a path that doesn't exist.
+            service.count('errors')
+            self._send_json(400, {'error': repr(e)})
+            return
+        except Exception as e:
+            service.count('errors')
+            logger.exception('Failed to parse the requested logs.')
+            self._send_json(500, {'error': repr(e)})
+            return
+        if out_format == 'arrow':
+            self._send(200, _ARROW_STREAM, _to_arrow_ipc(games))
+        else:
+            self._send_json(200, {'games': games})
+
+    def address_string(self):
+        # Unix socket clients don't have a host and port.
+        return self.client_address[0] if self.client_address else 'unix-socket'
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+    def _send_json(self, status: int, payload: Dict) -> None:
+        self._send(status, _JSON, json.dumps(payload).encode())
+
+    def _send(self, status: int, content_type: str, payload: bytes) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        super().server_bind()
+
+
+def make_server(service: ParseService, socket_path: Optional[str] = None,
+                port: Optional[int] = None):
+    """Make a server for the service on a unix socket, or on a localhost port."""
+    if socket_path:
+        server = UnixHTTPServer(socket_path, ParseRequestHandler)
+    else:
+        # Only listen on localhost, the server trusts every path it is sent.
+        server = ThreadingHTTPServer(('127.0.0.1', port), ParseRequestHandler)
+    server.service = service
+    return server
+
+
+def main(args):
+    service = ParseService(n_jobs=args.n_jobs, cache_size=args.cache_size)
+    server = make_server(service, socket_path=args.socket, port=args.port)
+    logger.info(f'Serving on {args.socket or f"http://127.0.0.1:{args.port}"}.')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--socket", help="The path of a unix socket to listen "
+                                         "on.", type=str)
+    parser.add_argument("--port", help="The localhost port to listen on if "
+                                       "no socket is given.",
+                        type=int, default=8765)
+    parser.add_argument("--n_jobs", help="Optional: How many worker processes "
+                                         "to keep warm. Defaults to the number "
+                                         "of CPUs.", type=int)
+    parser.add_argument("--cache_size", help="How many parsed logs to keep in "
+                                             "memory.", type=int, default=10000)
+    parser.add_argument("--log_level", help="Optional: The logging level, "
+                                            "e.g. DEBUG. Defaults to INFO.",
+                        type=str, default="INFO")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper())
+    main(args)
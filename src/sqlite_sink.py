@@ -0,0 +1,129 @@
+"""Optional SQLite sink for parsed plays.
+
+Ad-hoc queries against the feather export have to load the whole league. The
+plays can also be saved to a SQLite file with indexes on the columns queries
+usually filter on, so a query only reads the rows it needs.
+
+Saving is an upsert by game: the rows of every game being saved replace any
+rows already stored for that league and game, so incremental runs can save
+just the games they parsed again."""
+import logging
+import sqlite3
+import time
+from typing import Iterator, List, Tuple
+
+import pandas as pd
+
+from column_names import (LEAGUE_ID, GAME_ID, YEAR, DOWN, PLAY_TYPE)
+
+logger = logging.getLogger(__name__)
+
+PLAYS_TABLE = 'plays'
+
+# Each tuple of columns gets its own index.
+_INDEXES: List[Tuple[str, ...]] = [
+    (LEAGUE_ID, GAME_ID),
+    (YEAR,),
+    (DOWN,),
+    (PLAY_TYPE,),
+    ('qb_name',),
+    ('ball_carrier_name',),
+    ('targeted_receiver_name',),
+    # Added when the player registry is used.
+    ('qb_id',),
+    ('ball_carrier_id',),
+    ('targeted_receiver_id',),
+]
+
+# How many rows to insert per executemany call. Every batch of a save is
+# still in one transaction.
+_BATCH_SIZE = 50000
+
+
+def save_plays(df: pd.DataFrame, db_path: str) -> None:
+    """Upsert the plays into the SQLite file, replacing the games they're from.
+
+    :param: df: The exported dataframe of plays, with league and game ids.
+    :param: db_path: The path of the SQLite file, created if it doesn't exist.
+    """
+    start_time = time.perf_counter()
+    # The running index of the export isn't meaningful once games are replaced.
+    df = df.drop(columns=['index'], errors='ignore')
+    connection = sqlite3.connect(db_path)
+    try:
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        _create_or_extend_table(connection, df)
+        games = df[[LEAGUE_ID, GAME_ID]].drop_duplicates().astype(str)
+        with connection:
+            connection.executemany(
+                f'DELETE FROM {PLAYS_TABLE} WHERE {_quote(LEAGUE_ID)} = ? AND '
+                f'{_quote(GAME_ID)} = ?', games.itertuples(index=False, name=None))
+            columns = ', '.join(_quote(column) for column in df.columns)
+            placeholders = ', '.join('?' for _ in df.columns)
+            insert = f'INSERT INTO {PLAYS_TABLE} ({columns}) VALUES ({placeholders})'
+            for batch in _row_batches(df):
+                connection.executemany(insert, batch)
+        _create_indexes(connection, df.columns)
+    finally:
+        connection.close()
+    end_time = time.perf_counter()
+    logger.info(f'Took {end_time - start_time} seconds to save {len(df)} plays '
+                f'from {len(games)} games to {db_path}.')
+
+
+def _create_or_extend_table(connection: sqlite3.Connection, df: pd.DataFrame) -> None:
+    """Create the plays table, or add any columns it doesn't have yet."""
+    column_types = {column: _sqlite_type(dtype) for column, dtype in df.dtypes.items()}
+    existing = {row[1] for row in connection.execute(f'PRAGMA table_info({PLAYS_TABLE})')}
+    if not existing:
+        columns = ', '.join(f'{_quote(column)} {column_type}'
+                            for column, column_type in column_types.items())
+        connection.execute(f'CREATE TABLE {PLAYS_TABLE} ({columns})')
+        return
+    for column, column_type in column_types.items():
+        if column not in existing:
+            connection.execute(f'ALTER TABLE {PLAYS_TABLE} ADD COLUMN '
+                               f'{_quote(column)} {column_type}')
+
+
+def _create_indexes(connection: sqlite3.Connection, columns) -> None:
+    for index_columns in _INDEXES:
+        if not all(column in columns for column in index_columns):
+            continue
+        name = f'idx_{PLAYS_TABLE}_' + '_'.join(index_columns)
+        quoted = ', '.join(_quote(column) for column in index_columns)
+        connection.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {PLAYS_TABLE} ({quoted})')
+
+
+def _row_batches(df: pd.DataFrame) -> Iterator[List[tuple]]:
+    """The rows of the dataframe as python values, with None for missing values."""
+    for start in range(0, len(df), _BATCH_SIZE):
+        batch = df.iloc[start:start + _BATCH_SIZE].astype(object)
+        batch = batch.where(batch.notna(), None)
+        yield list(batch.itertuples(index=False, name=None))
+
+
+def _sqlite_type(dtype) -> str:
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'REAL'
+    if isinstance(dtype, pd.CategoricalDtype):
+        return _sqlite_type(dtype.categories.dtype)
+    return 'TEXT'
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def query_plays(db_path: str, where: str = '', params: Tuple = ()) -> pd.DataFrame:
+    """Read the plays matching an optional SQL where clause, e.g.
+    query_plays(path, 'league_id = ? AND down = ?', ('LG000021', 3))."""
+    connection = sqlite3.connect(db_path)
+    try:
+        query = f'SELECT * FROM {PLAYS_TABLE}' + (f' WHERE {where}' if where else '')
+        return pd.read_sql_query(query, connection, params=params)
+    finally:
+        connection.close()
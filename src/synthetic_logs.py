@@ -0,0 +1,631 @@
+"""Generates synthetic FOF8 game logs, for scale and load testing.
+
+Real league files can't be shared, so this writes logs in the same layout the
+loader and parsers read: a play by play table of summaries, each scrimmage
+play with its nested play call table, and the away and home participation
+tables. Teams come from parsing.teams, positions and responsibilities from
+parsing.consts, and every summary is phrased the way parsing.regexes and the
+parsers expect. Each game is a small simulation of downs, field position,
+the clock and the score, so the numbers in the summaries are consistent.
+
+Run from the src directory:
+`python -m synthetic_logs --output_dir /tmp/fof_logs --leagues 2 --seasons 3
+--games 272 --plays 150 --n_jobs 8`
+
+The logs are written to `<output_dir>/LG000001/log2020_1.html` and so on.
+Every game is seeded by the seed, league, season and game number, so the same
+arguments always write the same files, with any number of workers. A few
+plays, players and games are edge cases the parsers have to cope with, see
+EDGE_CASES.
+"""
+import argparse
+import logging
+import os
+import random
+from dataclasses import dataclass
+from multiprocessing import Pool
+from typing import Dict, List, Optional, Tuple
+
+from parsing.consts import (QB, RB, FB, TE, SLOT, X_SE, Z_FL, WR, LT, LG, C, RG, RT,
+                            LDE, RDE, NT, SLB, MLB, WLB, SILB, WILB, LCB, RCB, NB, DB,
+                            SS, FS, K, P, PRIMARY, SECONDARY, BALL_CARRIER, PROTECT,
+                            BLITZ, DOUBLE, SPY, BUZZ)
+from parsing.name_utils import shorten_name
+from parsing.teams import CITY_TO_ABBREV
+
+logger = logging.getLogger(__name__)
+
+# Edge cases, each happening at the edge case rate, except for overtime:
+# * unknown_play: a play whose summary is Unknown, which is skipped.
+# * missing_defense: a play call table without the defense's coverage.
+# * unknown_player: a player listed as Unknown in the play call table.
+# * odd_names: players with middle names or suffixes like Van, de la or Jr.
+# * overtime: every tied game goes to overtime, with (OT: ...) clocks.
+# * two_point: two-point conversions instead of extra points.
+# * penalties: penalty sentences in the summaries.
+EDGE_CASES = ('unknown_play', 'missing_defense', 'unknown_player', 'odd_names',
+              'overtime', 'two_point', 'penalties')
+
+_FIRST_NAMES = ['Aaron', 'Adam', 'Andre', 'Anthony', 'Brandon', 'Brian', 'Calvin', 'Chris',
+                'Cody', "D'Andre", 'Daniel', 'David', 'Derek', 'Devin', 'Eric', 'Evan',
+                'Frank', 'Gary', 'George', 'Hunter', 'Ian', 'Isaiah', 'Jacob', 'Jalen', 'James',
+                'Jason', 'John', 'Jonathan', 'Joseph', 'Justin', 'Keenan', 'Kevin', 'Kyle',
+                'Lamar', 'Luke', 'Marcus', 'Mark', 'Matthew', 'Michael', 'Nathan', 'Nick',
+                'Omar', 'Oscar', 'Patrick', 'Paul', 'Quinn', 'Ray', 'Robert', 'Ryan', 'Sam',
+                'Steven', 'Terrell', 'Thomas', 'Tim', 'Tre', 'Tyler', 'Victor', 'Vince',
+                'Wade', 'William', 'Xavier', 'Yusuf', 'Zach', 'Zeke']
+_LAST_NAMES = ['Adams', 'Allen', 'Anderson', 'Bailey', 'Baker', 'Barnes', 'Bell', 'Bennett',
+               'Brooks', 'Brown', 'Bryant', 'Butler', 'Campbell', 'Carter', 'Clark', 'Coleman',
+               'Collins', 'Cook', 'Cooper', 'Cox', 'Davis', 'Diaz', 'Edwards', 'Evans', 'Fisher',
+               'Flores', 'Ford', 'Foster', 'Garcia', 'Gibson', 'Gonzalez', 'Graham', 'Gray',
+               'Green', 'Griffin', 'Hall', 'Hamilton', 'Harris', 'Hayes', 'Henderson', 'Hill',
+               'Holmes', 'Howard', 'Hughes', 'Jackson', 'James', 'Jenkins', 'Johnson', 'Jones',
+               'Jordan', 'Kelly', 'Kennedy', 'King', 'Lee', 'Lewis', 'Long', 'Lopez',
+               'Marshall', 'Martin', 'Martinez', 'Mason', 'McCoy', 'Miller', 'Mitchell',
+               'Moore', 'Morgan', 'Morris', 'Murphy', 'Murray', 'Myers', 'Nelson', "O'Neal",
+               'Owens', 'Parker', 'Patterson', 'Perry', 'Peterson', 'Phillips', 'Powell',
+               'Price', 'Reed', 'Reynolds', 'Richardson', 'Rivera', 'Roberts', 'Robinson',
+               'Rodgers', 'Ross', 'Russell', 'Sanders', 'Scott', 'Simmons', 'Smith-Jones',
+               'Smith', 'Stewart', 'Sullivan', 'Taylor', 'Thomas', 'Thompson', 'Turner',
+               'Walker', 'Wallace', 'Ward', 'Washington', 'Watson', 'West', 'White',
+               'Williams', 'Wilson', 'Wood', 'Wright', 'Young']
+# Names the name parsing has special cases for.
+_MIDDLE_NAMES = ['Van', 'Von', 'St.', 'De', 'de la']
+_SUFFIXES = ['Jr.', 'III']
+
+# How many players of each position a team carries. The receivers are WRs,
+# who line up at X(SE), Z(FL) and SLOT.
+_ROSTER = {QB: 2, RB: 2, FB: 1, TE: 3, WR: 5, LT: 1, LG: 1, C: 1, RG: 1, RT: 1,
+           LDE: 1, '3tcDT': 1, '1tcDT': 1, NT: 1, RDE: 1, SLB: 1, MLB: 1, WLB: 1,
+           SILB: 1, WILB: 1, LCB: 1, RCB: 1, NB: 1, DB: 1, SS: 1, FS: 1, K: 1, P: 1}
+# The share of each team's players replaced every season.
+_TURNOVER = 0.1
+
+# Offensive personnel: the backs, tight ends and receivers on the field.
+_OFFENSE_PERSONNEL = {'113': (1, 1, 3), '122': (1, 2, 2), '212': (2, 1, 2),
+                      '104': (1, 0, 4), '221': (2, 2, 1), '131': (1, 3, 1)}
+_OFFENSE_FORMATIONS = ['I', 'Strong', 'Weak', 'Pro', 'Singleback', 'Trips', 'Spread']
+_QB_ALIGNMENTS = ['Normal', 'Normal', 'Shotgun', 'Pistol']
+_RECEIVER_SPOTS = [X_SE, Z_FL, SLOT, SLOT]
+_OFFENSIVE_LINE = [LT, LG, C, RG, RT]
+
+_DEFENSE_FORMATIONS = {'43 Over': [LDE, '3tcDT', '1tcDT', RDE, SLB, MLB, WLB],
+                       '43 Under': [LDE, '1tcDT', '3tcDT', RDE, SLB, MLB, WLB],
+                       '34': [LDE, NT, RDE, SLB, SILB, WILB, WLB]}
+_SECONDARY = [LCB, RCB, SS, FS]
+_COVERAGES = ['Cover 0', 'Cover 1', 'Cover 2', 'Cover 3', 'Cover 4', 'Man-to-Man']
+
+_ROUTES = ['Slant', 'Out', 'In', 'Curl', 'Post', 'Corner', 'Fly', 'Hitch', 'Drag',
+           'Wheel', 'Seam', 'Flat', 'Screen']
+_RUN_DIRECTIONS = ['around left end', 'outside the left tackle', 'inside the left tackle',
+                   'inside the left guard', 'around right end', 'outside the right tackle',
+                   'inside the right tackle', 'inside the right guard']
+_PENALTIES = ['Offensive Holding', 'False Start', 'Defensive Holding', 'Illegal Contact',
+              'Offsides', 'Illegal Formation', 'Delay of Game']
+_QUARTER_NAMES = {2: '2nd', 3: '3rd', 4: '4th'}
+_QUARTER_SECONDS = 900
+_OVERTIME_SECONDS = 600
+
+
+@dataclass(frozen=True)
+class SyntheticConfig:
+    # How many leagues to write, LG000001 onwards.
+    leagues: int = 1
+    # The first season, and how many seasons each league has.
+    first_season: int = 2020
+    seasons: int = 1
+    # Games per season, and scrimmage plays per game, on average.
+    games: int = 272
+    plays: int = 150
+    # How many teams each league has, at most the number of cities in
+    # parsing.teams.
+    teams: int = 32
+    # The chance of each edge case, per play, player or game.
+    edge_case_rate: float = 0.02
+    # The edge cases to include, see EDGE_CASES.
+    edge_cases: Tuple[str, ...] = EDGE_CASES
+    seed: int = 0
+
+
+def generate(output_dir: str, config: SyntheticConfig, n_jobs: int = 1) -> List[str]:
+    """Write every game log of every league and season.
+
+    :param: n_jobs: How many processes to write with.
+    :returns: The paths of the logs.
+    """
+    unknown = set(config.edge_cases) - set(EDGE_CASES)
+    if unknown:
+        raise ValueError(f"Unknown edge cases: {', '.join(sorted(unknown))}. The edge "
+                         f"cases are {', '.join(EDGE_CASES)}.")
+    cities = sorted(CITY_TO_ABBREV)
+    if config.teams > len(cities):
+        raise ValueError(f'There are only {len(cities)} teams.')
+    tasks = [(output_dir, config, league, config.first_season + season)
+             for league in range(1, config.leagues + 1) for season in range(config.seasons)]
+    if n_jobs > 1:
+        with Pool(n_jobs) as pool:
+            paths = pool.starmap(write_season, tasks)
+    else:
+        paths = [write_season(*task) for task in tasks]
+    paths = [path for season_paths in paths for path in season_paths]
+    logger.info(f'Wrote {len(paths)} game logs to {output_dir}.')
+    return paths
+
+
+def write_season(output_dir: str, config: SyntheticConfig, league: int, year: int) -> List[str]:
+    """Write the game logs of a league's season.
+
+    :returns: The paths of the logs."""
+    league_dir = os.path.join(output_dir, f'LG{league:06d}')
+    os.makedirs(league_dir, exist_ok=True)
+    teams = _league_rosters(config, league, year)
+    schedule_rng = random.Random(f'{config.seed}-{league}-{year}-schedule')
+    paths = []
+    matchups: List[Tuple[int, int]] = []
+    for game in range(1, config.games + 1):
+        if not matchups:
+            # A week of games, every team playing once.
+            order = list(range(len(teams)))
+            schedule_rng.shuffle(order)
+            matchups = list(zip(order[::2], order[1::2]))
+        home, away = matchups.pop()
+        rng = random.Random(f'{config.seed}-{league}-{year}-{game}')
+        path = os.path.join(league_dir, f'log{year}_{game}.html')
+        with open(path, 'w') as log_file:
+            log_file.write(_Game(rng, config, teams[home], teams[away]).to_html())
+        paths.append(path)
+    return paths
+
+
+@dataclass
+class _Team:
+    city: str
+    abbrev: str
+    # The team's players by position, starters first.
+    players: Dict[str, List[str]]
+
+
+def _league_rosters(config: SyntheticConfig, league: int, year: int) -> List[_Team]:
+    """The league's teams in the season. Rosters carry over between seasons,
+    with some players replaced each season."""
+    rng = random.Random(f'{config.seed}-{league}-rosters')
+    cities = rng.sample(sorted(CITY_TO_ABBREV), config.teams)
+    # The short names of the league's players, which plays list them by.
+    short_names = set()
+    teams = [_Team(city, CITY_TO_ABBREV[city],
+                   {position: [_new_player(rng, config, short_names) for _ in range(count)]
+                    for position, count in _ROSTER.items()})
+             for city in cities]
+    for season in range(config.first_season + 1, year + 1):
+        season_rng = random.Random(f'{config.seed}-{league}-{season}-turnover')
+        for team in teams:
+            for players in team.players.values():
+                for i in range(len(players)):
+                    if season_rng.random() < _TURNOVER:
+                        short_names.remove(shorten_name(players[i]))
+                        players[i] = _new_player(season_rng, config, short_names)
+    return teams
+
+
+def _new_player(rng: random.Random, config: SyntheticConfig, short_names: set) -> str:
+    """A name whose short name no other player in the league has."""
+    middle = suffix = ''
+    if 'odd_names' in config.edge_cases and rng.random() < config.edge_case_rate:
+        if rng.random() < 0.5:
+            middle = f' {rng.choice(_MIDDLE_NAMES)}'
+        else:
+            suffix = f' {rng.choice(_SUFFIXES)}'
+    while True:
+        name = f'{rng.choice(_FIRST_NAMES)}{middle} {rng.choice(_LAST_NAMES)}{suffix}'
+        if shorten_name(name) not in short_names:
+            short_names.add(shorten_name(name))
+            return name
+
+
+class _Game(object):
+    """Simulates a game, collecting the rows of its play by play."""
+
+    def __init__(self, rng: random.Random, config: SyntheticConfig, home: _Team, away: _Team):
+        self.rng = rng
+        self.config = config
+        self.home = home
+        self.away = away
+        self.score = {home.abbrev: 0, away.abbrev: 0}
+        # Seconds per scrimmage play, so a game has about config.plays of them.
+        self._play_seconds = 4 * _QUARTER_SECONDS / max(config.plays, 1)
+        self.rows: List[str] = []
+
+    def edge_case(self, name: str) -> bool:
+        return name in self.config.edge_cases and self.rng.random() < self.config.edge_case_rate
+
+    def to_html(self) -> str:
+        self._play_game()
+        participation = ''.join(_participation_table(team) for team in (self.away, self.home))
+        return (f'<html><head><title>{self.away.city} at {self.home.city}</title></head>'
+                f'<body><table>{"".join(self.rows)}</table>{participation}</body></html>')
+
+    def _play_game(self) -> None:
+        rng = self.rng
+        receiving = rng.choice([self.home, self.away])
+        self._add_row(f'{receiving.city} won the toss.')
+        self.quarter = 1
+        self.seconds = _QUARTER_SECONDS
+        self._kickoff(self._other(receiving))
+        while True:
+            self._play_drive()
+            if self.seconds > 0:
+                continue
+            if self.quarter in (1, 3):
+                self.quarter += 1
+                self.seconds = _QUARTER_SECONDS
+                self._add_row(f'Start of {_QUARTER_NAMES[self.quarter]} quarter.')
+            elif self.quarter == 2:
+                self.quarter = 3
+                self.seconds = _QUARTER_SECONDS
+                self._add_row(f'Start of {_QUARTER_NAMES[3]} quarter.')
+                self._kickoff(receiving)
+            elif self.quarter == 4 and self._tied() and 'overtime' in self.config.edge_cases:
+                self.quarter = 5
+                self.seconds = _OVERTIME_SECONDS
+                self._add_row('Start of overtime.')
+                self._kickoff(rng.choice([self.home, self.away]))
+            else:
+                break
+        self._add_row(f'Final Score: {self.away.abbrev} {self.score[self.away.abbrev]}, '
+                      f'{self.home.abbrev} {self.score[self.home.abbrev]}.')
+
+    def _play_drive(self) -> None:
+        """Run plays until the offense scores, turns the ball over or time runs out."""
+        rng = self.rng
+        while self.seconds > 0:
+            before = self.seconds
+            self.seconds -= max(5, int(rng.gauss(self._play_seconds, 8)))
+            for warning_quarter in (2, 4):
+                if self.quarter == warning_quarter and before > 120 >= self.seconds:
+                    self._add_row('Official time out for the two-minute warning.')
+            if rng.random() < 0.02:
+                self._add_row(f'{rng.choice([self.home, self.away]).abbrev} called a time out.')
+            if self.down == 4 and not (self.distance <= 1 and self.position > 50):
+                self._fourth_down()
+                return
+            if self._scrimmage_play():
+                return
+
+    def _scrimmage_play(self) -> bool:
+        """Run a scrimmage play, and update the down, distance and ball.
+
+        :returns: Whether the drive is over."""
+        rng = self.rng
+        offense, defense = self.offense, self._other(self.offense)
+        passing = rng.random() < (0.7 if self.distance > 6 or self.down == 3 else 0.5)
+        lineup, offense_call = self._offense_lineup(offense)
+        defenders, defense_call = self._defense_lineup(defense)
+        if self.edge_case('unknown_play'):
+            self._add_row(f'{self._prefix()}Unknown.', self._play_call_table(
+                lineup, offense_call, defenders, defense_call, None, passing))
+            return False
+        text, yards, ball_carrier, turnover = (self._pass(lineup, defenders) if passing
+                                               else self._run(lineup))
+        touchdown = not turnover and self.position + yards >= 100
+        if self.edge_case('penalties'):
+            team = rng.choice([offense, defense])
+            player = rng.choice(team.players[rng.choice([LT, RG, LCB, SS])])
+            text += f' {player} of {team.abbrev} was called for {rng.choice(_PENALTIES)}, ' \
+                    f'declined.'
+        table = self._play_call_table(lineup, offense_call, defenders, defense_call,
+                                      ball_carrier, passing)
+        self._add_row(self._prefix() + text, table, touchdown)
+
+        if turnover:
+            self._change_possession(defense, max(1, min(99, 100 - self.position - yards)))
+            return True
+        if touchdown:
+            self._touchdown()
+            return True
+        self.position = max(1, self.position + yards)
+        if yards >= self.distance:
+            self.down, self.distance = 1, min(10, 100 - self.position)
+        else:
+            self.down, self.distance = self.down + 1, self.distance - yards
+            if self.down > 4:
+                self._change_possession(defense, 100 - self.position)
+                return True
+        return False
+
+    def _pass(self, lineup: List[Tuple[str, str]], defenders: List[Tuple[str, str]]) \
+            -> Tuple[str, int, Optional[str], bool]:
+        rng = self.rng
+        qb = lineup[0][1]
+        play_action = 'Play-Action. ' if rng.random() < 0.15 else ''
+        receivers = [(spot, name) for spot, name in lineup if spot in (X_SE, Z_FL, SLOT, TE, RB)]
+        spot, receiver = rng.choice(receivers)
+        target = f'{_target_position(spot)} {receiver}'
+        defender = rng.choice(defenders)[1]
+        roll = rng.random()
+        if roll < 0.07:
+            yards = -self._gain(-rng.randint(1, 10))
+            return f'{play_action}{qb} was sacked by {defender} for a loss of ' \
+                   f'{yards} yards.', -yards, None, False
+        if roll < 0.11:
+            yards = self._gain(rng.randint(-2, 15))
+            return f'{play_action}{qb} scrambled for {_yards_text(yards)}.', yards, None, False
+        if roll < 0.13:
+            return f'{play_action}{qb} pass was blocked at the line. {defender} blocked ' \
+                   f'the pass.', 0, None, False
+        if roll < 0.16:
+            return f'{play_action}{qb} pass intended for {target} was intercepted by ' \
+                   f'{defender}.', rng.randint(0, 30), None, True
+        if roll < 0.2:
+            return f'{play_action}{qb} pass was dropped by {target}.', 0, None, False
+        if roll < 0.38:
+            hurried = f' {qb} was hurried by {defender}.' if rng.random() < 0.3 else ''
+            return f'{play_action}{qb} pass fell incomplete intended for {target}.' \
+                   f'{hurried}', 0, None, False
+        yards = self._gain(int(rng.gammavariate(1.6, 6)) - 1)
+        yac = rng.randint(0, max(yards, 0)) if yards > 0 else 0
+        yac_text = f', {yac} {"yard" if yac == 1 else "yards"} after the catch' \
+            if yac else ''
+        double = f' {qb} threw into double coverage.' if rng.random() < 0.05 else ''
+        return f'{play_action}{qb} pass completed to {target} for {_yards_text(yards)}' \
+               f'{yac_text}.{double}', yards, None, False
+
+    def _run(self, lineup: List[Tuple[str, str]]) -> Tuple[str, int, Optional[str], bool]:
+        rng = self.rng
+        backs = [(spot, name) for spot, name in lineup if spot in (RB, FB)]
+        roll = rng.random()
+        yards = self._gain(int(rng.gammavariate(2, 2.2)) - 2)
+        direction = rng.choice(_RUN_DIRECTIONS)
+        if roll < 0.03 and self.quarter >= 4 and self.seconds < 120:
+            qb = lineup[0][1]
+            return f'{qb} dropped to one knee for -1 yards.', -1, QB, False
+        if roll < 0.06:
+            qb = lineup[0][1]
+            return f'{qb} kept the ball {direction} for {_yards_text(yards)}.', yards, QB, False
+        if roll < 0.08:
+            spot, receiver = next(((spot, name) for spot, name in lineup
+                                   if spot in (X_SE, Z_FL, SLOT)), lineup[1])
+            return f'{receiver} ran a reverse {direction} for {_yards_text(yards)}.', \
+                yards, spot, False
+        spot, back = rng.choice(backs)
+        finesse = rng.choice(['', '', '', ' on a draw', ' on a counterplay', ' on a trap'])
+        return f'{back} ran{finesse} {direction} for {_yards_text(yards)}.', yards, spot, False
+
+    def _change_possession(self, offense: _Team, position: int) -> None:
+        """Give the team the ball, first and ten at the position."""
+        self.offense = offense
+        self.position = position
+        self.down, self.distance = 1, 10
+
+    def _gain(self, yards: int) -> int:
+        """The yards a play gains, which can't go past either goal line."""
+        return max(1 - self.position, min(yards, 100 - self.position))
+
+    def _fourth_down(self) -> None:
+        rng = self.rng
+        offense = self.offense
+        if self.position >= 62:
+            distance = 100 - self.position + 17
+            good = rng.random() < (0.95 if distance < 40 else 0.7)
+            self._add_row(f'{self._prefix()}{offense.players[K][0]} attempted a {distance} '
+                          f'yard field goal, which was {"good" if good else "no good"}.')
+            if good:
+                self.score[offense.abbrev] += 3
+                self._kickoff(offense)
+            else:
+                self._change_possession(self._other(offense), max(20, 100 - self.position))
+            return
+        punt = min(99 - self.position, rng.randint(35, 55))
+        self._add_row(f'{self._prefix()}{offense.players[P][0]} punted {punt} yards.')
+        self._change_possession(self._other(offense), max(1, 100 - self.position - punt))
+
+    def _touchdown(self) -> None:
+        rng = self.rng
+        offense = self.offense
+        self.score[offense.abbrev] += 6
+        if self.edge_case('two_point'):
+            lineup, offense_call = self._offense_lineup(offense)
+            defenders, defense_call = self._defense_lineup(self._other(offense))
+            good = rng.random() < 0.5
+            qb = lineup[0][1]
+            receivers = [(spot, name) for spot, name in lineup if spot in (X_SE, Z_FL, SLOT, TE)]
+            spot, receiver = rng.choice(receivers)
+            result = 'completed to' if good else 'fell incomplete intended for'
+            text = f'{self._clock()} {qb} pass {result} {_target_position(spot)} ' \
+                   f'{receiver}, two-point conversion attempt {"good" if good else "failed"}.'
+            self._add_row(text, self._play_call_table(lineup, offense_call, defenders,
+                                                      defense_call, None, True))
+            self.score[offense.abbrev] += 2 if good else 0
+        else:
+            self._add_row(f'Extra point by {offense.players[K][0]} was good.')
+            self.score[offense.abbrev] += 1
+        self._kickoff(offense)
+
+    def _kickoff(self, kicking: _Team) -> None:
+        """Kick off to the other team."""
+        receiving = self._other(kicking)
+        self._change_possession(receiving, self.rng.choice([25, 25, 25, self.rng.randint(10, 40)]))
+        returner = receiving.players[WR][-1]
+        self._add_row(f'{kicking.players[K][0]} kicked off from the {kicking.abbrev}35. '
+                      f'{returner} returned the kick to the '
+                      f'{_field_position(self.position, receiving, kicking)}.')
+
+    def _offense_lineup(self, team: _Team) -> Tuple[List[Tuple[str, str]], str]:
+        """The (spot, full name) of the offense's players, and the offense's call."""
+        rng = self.rng
+        personnel = rng.choice(list(_OFFENSE_PERSONNEL))
+        backs, tight_ends, receivers = _OFFENSE_PERSONNEL[personnel]
+        lineup = [(QB, team.players[QB][0])]
+        lineup += [(RB, team.players[RB][0])] + ([(FB, team.players[FB][0])] if backs > 1 else [])
+        lineup += [(TE, name) for name in team.players[TE][:tight_ends]]
+        lineup += list(zip(_RECEIVER_SPOTS[:receivers], team.players[WR][:receivers]))
+        lineup += [(spot, team.players[spot][0]) for spot in _OFFENSIVE_LINE]
+        call = f'{personnel} Personnel, {rng.choice(_OFFENSE_FORMATIONS)} formation, ' \
+               f'{rng.choice(_QB_ALIGNMENTS)}'
+        return lineup, call
+
+    def _defense_lineup(self, team: _Team) -> Tuple[List[Tuple[str, str]], str]:
+        """The (spot, full name) of the defense's players, and the defense's call."""
+        rng = self.rng
+        formation = rng.choice(list(_DEFENSE_FORMATIONS))
+        front = list(_DEFENSE_FORMATIONS[formation])
+        personnel = 'Base'
+        if self.distance >= 7 and rng.random() < 0.7:
+            personnel = 'Nickel'
+            front[front.index(SLB)] = NB
+            if self.distance >= 12 and rng.random() < 0.5:
+                personnel = 'Dime'
+                front[front.index(MLB if MLB in front else SILB)] = DB
+        spots = front + _SECONDARY
+        lineup = [(spot, team.players[spot][0]) for spot in spots]
+        call = f'{formation} formation, {personnel} Personnel, {rng.choice(_COVERAGES)}'
+        if rng.random() < 0.1:
+            call += f', {BUZZ}'
+        if self.edge_case('missing_defense'):
+            call = f'{formation} formation'
+        return lineup, call
+
+    def _play_call_table(self, lineup: List[Tuple[str, str]], offense_call: str,
+                         defenders: List[Tuple[str, str]], defense_call: str,
+                         ball_carrier: Optional[str], passing: bool) -> str:
+        rng = self.rng
+        responsibilities = {}
+        if passing:
+            eligible = [spot for spot in (X_SE, Z_FL, SLOT, TE, RB, FB)
+                        if any(s == spot for s, _ in lineup)]
+            primary, secondary = rng.sample(eligible, 2)
+            responsibilities[primary] = f'{PRIMARY}, {rng.choice(_ROUTES)}'
+            responsibilities[secondary] = f'{SECONDARY}, {rng.choice(_ROUTES)}'
+        rows = [f'<tr><td></td><td>{offense_call}</td><td></td><td>{defense_call}</td></tr>']
+        carried = False
+        assignments = self._defensive_assignments(defenders, lineup)
+        for i, (spot, name) in enumerate(lineup):
+            if spot in responsibilities:
+                responsibility = responsibilities.pop(spot)
+            elif not passing and spot == ball_carrier and not carried:
+                responsibility = BALL_CARRIER
+                carried = True
+            elif passing and spot in _OFFENSIVE_LINE + [TE, RB, FB]:
+                responsibility = PROTECT
+            else:
+                responsibility = ''
+            short_name = shorten_name(name)
+            if self.edge_case('unknown_player'):
+                short_name = 'Unknown'
+            def_spot, def_name = defenders[i]
+            rows.append(f'<tr><td>{spot} {short_name}</td><td>{responsibility}</td><td></td>'
+                        f'<td>{def_spot} {shorten_name(def_name)}</td>'
+                        f'<td>{assignments[i]}</td></tr>')
+        return f'<table>{"".join(rows)}</table>'
+
+    def _defensive_assignments(self, defenders: List[Tuple[str, str]],
+                               lineup: List[Tuple[str, str]]) -> List[str]:
+        rng = self.rng
+        assignments = [''] * len(defenders)
+        rushers = [i for i, (spot, _) in enumerate(defenders)
+                   if spot in (SLB, MLB, WLB, SILB, WILB, NB, SS)]
+        for i in rng.sample(rushers, min(len(rushers), rng.choice([0, 0, 0, 1, 1, 2, 3]))):
+            assignments[i] = BLITZ
+        free = [i for i, assignment in enumerate(assignments) if not assignment]
+        if rng.random() < 0.08:
+            assignments[rng.choice(free)] = SPY
+        elif rng.random() < 0.1:
+            receivers = [spot for spot, _ in lineup if spot in (X_SE, Z_FL, SLOT)]
+            corner = next(i for i, (spot, _) in enumerate(defenders) if spot in (LCB, RCB))
+            if receivers and not assignments[corner]:
+                assignments[corner] = f'{DOUBLE} {rng.choice(receivers)}'
+        return assignments
+
+    def _add_row(self, text: str, table: str = '', touchdown: bool = False) -> None:
+        if touchdown:
+            # The game bolds the scoring play's result.
+            text = f'{text[:-1]}, <b>TOUCHDOWN</b>.'
+        self.rows.append(f'<tr><td><font>{text}</font>{table}</td></tr>')
+
+    def _prefix(self) -> str:
+        field = _field_position(self.position, self.offense, self._other(self.offense))
+        return f'{self.down}-{self.distance}-{field} {self._clock()} '
+
+    def _clock(self) -> str:
+        seconds = max(self.seconds, 0)
+        quarter = 'OT' if self.quarter == 5 else f'{self.quarter}Q'
+        return f'({quarter}: {seconds // 60:02d}:{seconds % 60:02d})'
+
+    def _other(self, team: _Team) -> _Team:
+        return self.away if team is self.home else self.home
+
+    def _tied(self) -> bool:
+        return self.score[self.home.abbrev] == self.score[self.away.abbrev]
+
+
+def _participation_table(team: _Team) -> str:
+    """The players who took part, by position. QBs aren't listed, like in the game."""
+    rows = [f'<tr><th>{team.city}</th></tr>']
+    for position, players in team.players.items():
+        if position == QB:
+            continue
+        rows += [f'<tr><td>{position} {name}</td></tr>' for name in players]
+    rows.append('<tr><td>Unknown</td></tr>')
+    return f'<table>{"".join(rows)}</table>'
+
+
+def _field_position(position: int, offense: _Team, defense: _Team) -> str:
+    """Whose yard line the ball is on, e.g. DET29, from the offense's own goal."""
+    if position <= 50:
+        return f'{offense.abbrev}{position:02d}'
+    return f'{defense.abbrev}{100 - position:02d}'
+
+
+def _target_position(spot: str) -> str:
+    """How summaries name the position of a targeted receiver."""
+    return WR if spot in (X_SE, Z_FL, SLOT) else spot
+
+
+def _yards_text(yards: int) -> str:
+    return f'{yards} {"yard" if abs(yards) == 1 else "yards"}'
+
+
+def main(args):
+    edge_cases = tuple(args.edge_cases.split(",")) if args.edge_cases is not None \
+        else EDGE_CASES
+    config = SyntheticConfig(leagues=args.leagues, first_season=args.first_season,
+                             seasons=args.seasons, games=args.games, plays=args.plays,
+                             teams=args.teams, edge_case_rate=args.edge_case_rate,
+                             edge_cases=tuple(case for case in edge_cases if case),
+                             seed=args.seed)
+    generate(args.output_dir, config, args.n_jobs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output_dir", help="The directory to write a "
+                                             "directory of logs per league "
+                                             "to.", type=str)
+    parser.add_argument("--leagues", help="How many leagues to write.",
+                        type=int, default=1)
+    parser.add_argument("--first_season", help="The year of the first "
+                                               "season.", type=int, default=2020)
+    parser.add_argument("--seasons", help="How many seasons each league has.",
+                        type=int, default=1)
+    parser.add_argument("--games", help="How many games each season has.",
+                        type=int, default=272)
+    parser.add_argument("--plays", help="About how many scrimmage plays each "
+                                        "game has.", type=int, default=150)
+    parser.add_argument("--teams", help="How many teams each league has.",
+                        type=int, default=32)
+    parser.add_argument("--edge_case_rate", help="The chance of each edge "
+                                                 "case, per play, player or "
+                                                 "game.", type=float, default=0.02)
+    parser.add_argument("--edge_cases", help="Optional: A comma separated list "
+                                             "of the edge cases to include, "
+                                             f"out of {', '.join(EDGE_CASES)}. "
+                                             "Defaults to all of them, an "
+                                             "empty string to none.", type=str)
+    parser.add_argument("--seed", help="The random seed.", type=int, default=0)
+    parser.add_argument("--n_jobs", help="How many processes to write with.",
+                        type=int, default=1)
+    parser.add_argument("--log_level", help="Optional: The logging level, "
+                                            "e.g. DEBUG. Defaults to INFO.",
+                        type=str, default="INFO")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper())
+    main(args)
@@ -0,0 +1,191 @@
+"""Live progress of a parsing run, logged and written to a metrics file.
+
+The parent records each worker.TaskResult as it completes, and a
+ProgressTracker turns them into throughput: logs, plays and bytes per
+second, the ETA, how busy the workers are, how many warnings the parsers
+logged and whether a failed log aborted the league. Progress is logged at
+most once per interval, and a MetricsFile is rewritten on the same interval
+for a local monitoring stack to scrape, in the Prometheus text format if its
+name ends in .prom and as JSON otherwise. The file is replaced atomically,
+so a scraper never reads half of it.
+
+This module must stay free of pandas, parse imports it before parsing."""
+import json
+import logging
+import os
+import time
+from typing import Callable, Dict, Optional
+
+from file_store import atomic_open
+from memory import to_mb
+
+logger = logging.getLogger(__name__)
+
+# The default seconds between progress logs and metrics file writes.
+DEFAULT_INTERVAL = 10.0
+PROMETHEUS_SUFFIX = '.prom'
+
+# The Prometheus name, type and help of each metric, by snapshot key.
+_PROMETHEUS_METRICS = {
+    'logs_total': ('fof_logs_total', 'gauge', 'Game logs to parse.'),
+    'logs_done': ('fof_logs_parsed_total', 'counter', 'Game logs parsed or reused.'),
+    'logs_reused': ('fof_logs_reused_total', 'counter', 'Game logs reused from the dedup index.'),
+    'plays': ('fof_plays_parsed_total', 'counter', 'Plays parsed.'),
+    'bytes': ('fof_log_bytes_parsed_total', 'counter', 'Bytes of game logs parsed.'),
+    'warnings': ('fof_parse_warnings_total', 'counter', 'Warnings logged while parsing.'),
+    'aborted': ('fof_league_aborted', 'gauge', '1 if a log failed and aborted the league.'),
+    'logs_per_second': ('fof_logs_per_second', 'gauge', 'Game logs parsed per second.'),
+    'plays_per_second': ('fof_plays_per_second', 'gauge', 'Plays parsed per second.'),
+    'bytes_per_second': ('fof_log_bytes_per_second', 'gauge', 'Bytes of game logs per second.'),
+    'eta_seconds': ('fof_eta_seconds', 'gauge', 'Estimated seconds until the league is parsed.'),
+    'worker_utilization': ('fof_worker_utilization', 'gauge',
+                           'Fraction of the workers\' time spent parsing.'),
+    'elapsed_seconds': ('fof_elapsed_seconds', 'gauge', 'Seconds since the league started.'),
+    'finished': ('fof_league_finished', 'gauge', '1 once every log of the league is done.'),
+}
+
+
+class MetricsFile(object):
+    """A metrics file with the latest progress of every league of a run."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._leagues: Dict[str, Dict] = {}
+
+    def update(self, league: str, snapshot: Dict) -> None:
+        """Replace the league's metrics and rewrite the file."""
+        self._leagues[league] = snapshot
+        text = self.to_prometheus() if self.path.endswith(PROMETHEUS_SUFFIX) \
+            else json.dumps({'updated': time.time(), 'leagues': self._leagues}, indent=2)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with atomic_open(self.path, 'w', prefix='.metrics-') as metrics_file:
+            metrics_file.write(text)
+
+    def to_prometheus(self) -> str:
+        lines = []
+        for key, (name, metric_type, description) in _PROMETHEUS_METRICS.items():
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            for league, snapshot in self._leagues.items():
+                value = snapshot.get(key)
+                if value is not None:
+                    lines.append(f'{name}{{league="{league}"}} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+class ProgressTracker(object):
+    """Throughput of the logs of one league, in the order they complete."""
+
+    def __init__(self, league: str, total_logs: int, n_workers: int,
+                 interval: float = DEFAULT_INTERVAL,
+                 metrics_file: Optional[MetricsFile] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        :param: league: The league's id, which labels its metrics.
+        :param: total_logs: How many logs are being parsed.
+        :param: n_workers: How many processes or threads parse them, to
+        measure how busy they are.
+        :param: interval: The least seconds between progress logs and
+        metrics file writes.
+        :param: metrics_file: Optional MetricsFile to write the progress to.
+        """
+        self.league = league
+        self.total_logs = total_logs
+        self.n_workers = max(n_workers, 1)
+        self.interval = interval
+        self.metrics_file = metrics_file
+        self._clock = clock
+        self._start = clock()
+        self._last_report = self._start
+        self.logs_done = 0
+        self.logs_reused = 0
+        self.plays = 0
+        self.bytes = 0
+        self.warnings = 0
+        self.aborted = False
+        self._busy_seconds = 0.0
+        self._write_metrics(finished=False)
+
+    def record(self, result) -> None:
+        """Count a completed worker.TaskResult, and report if it's time to."""
+        self.logs_done += 1
+        self.logs_reused += result.reused
+        self.plays += result.plays or 0
+        self.bytes += result.log_bytes or 0
+        self.warnings += result.warnings or 0
+        self._busy_seconds += result.seconds or 0.0
+        if self._clock() - self._last_report >= self.interval:
+            self.report()
+
+    def abort(self) -> None:
+        """Mark the league as aborted, by a log that failed to parse."""
+        self.aborted = True
+
+    def snapshot(self, finished: bool = False) -> Dict:
+        elapsed = max(self._clock() - self._start, 1e-9)
+        logs_per_second = self.logs_done / elapsed
+        remaining = self.total_logs - self.logs_done
+        return {
+            'logs_total': self.total_logs,
+            'logs_done': self.logs_done,
+            'logs_reused': self.logs_reused,
+            'plays': self.plays,
+            'bytes': self.bytes,
+            'warnings': self.warnings,
+            'aborted': int(self.aborted),
+            'logs_per_second': logs_per_second,
+            'plays_per_second': self.plays / elapsed,
+            'bytes_per_second': self.bytes / elapsed,
+            'eta_seconds': remaining / logs_per_second if logs_per_second else None,
+            'worker_utilization': min(self._busy_seconds / (elapsed * self.n_workers), 1.0),
+            'elapsed_seconds': elapsed,
+            'finished': int(finished),
+        }
+
+    def report(self) -> None:
+        """Log the progress and write the metrics file now."""
+        self._last_report = self._clock()
+        snapshot = self._write_metrics(finished=False)
+        logger.info(f'{self.league}: {format_progress(snapshot)}')
+
+    def finish(self) -> Dict:
+        """Write the final metrics of the league.
+
+        :returns: The final snapshot."""
+        return self._write_metrics(finished=True)
+
+    def _write_metrics(self, finished: bool) -> Dict:
+        snapshot = self.snapshot(finished)
+        if self.metrics_file:
+            try:
+                self.metrics_file.update(self.league, snapshot)
+            except OSError as e:
+                # A monitoring hiccup shouldn't stop a multi-hour run.
+                logger.warning(f'Failed to write the metrics file {self.metrics_file.path}: {e}')
+        return snapshot
+
+
+def format_progress(snapshot: Dict) -> str:
+    """A one line summary of a ProgressTracker snapshot."""
+    total = snapshot['logs_total']
+    percent = 100 * snapshot['logs_done'] / total if total else 100.0
+    eta = snapshot['eta_seconds']
+    return (f"{snapshot['logs_done']}/{total} logs ({percent:.1f}%), "
+            f"{snapshot['logs_per_second']:.1f} logs/s, "
+            f"{snapshot['plays_per_second']:.0f} plays/s, "
+            f"{to_mb(int(snapshot['bytes_per_second']))}/s, "
+            f"ETA {_format_seconds(eta) if eta is not None else 'unknown'}, "
+            f"workers {100 * snapshot['worker_utilization']:.0f}% busy, "
+            f"{snapshot['warnings']} warnings{', aborted' if snapshot['aborted'] else ''}")
+
+
+def _format_value(value: float) -> str:
+    # Counters stay exact, :g would round large byte counts.
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _format_seconds(seconds: float) -> str:
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}h{minutes:02d}m{seconds:02d}s' if hours else f'{minutes}m{seconds:02d}s'
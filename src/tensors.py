@@ -0,0 +1,185 @@
+"""Exports the plays as encoded NumPy matrices for training models.
+
+Each league's tensor directory holds:
+* `categorical.npy`, int32 codes of the categorical features. Code 0 is a
+  missing value.
+* `numeric.npy`, float32 numeric and bool features. Missing values are NaN.
+* `labels.npy`, float32 outcomes to predict, NaN where a play doesn't have
+  one, e.g. the completion of a running play.
+* `row_index.npy`, the row of each play in the feather export.
+* `meta.json`, the columns of each matrix and their vocabularies.
+
+The vocabulary maps each category to a code. It can be shared between
+leagues and runs with a vocabulary file, which is created from the first
+export. Later exports only append the categories it doesn't have yet, e.g.
+new seasons and teams, so a code means the same category in every export.
+The matrices are written with np.lib.format.open_memmap and read
+back memory-mapped, so loading and batching them never needs pandas.
+
+Only plays with a parsed outcome are exported.
+"""
+import json
+import logging
+import os
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from column_names import *
+from file_store import atomic_open
+
+logger = logging.getLogger(__name__)
+
+# The tensors' directory in a league's export directory.
+TENSOR_DIR = 'tensors'
+META_FILE = 'meta.json'
+CATEGORICAL = 'categorical'
+NUMERIC = 'numeric'
+LABELS = 'labels'
+ROW_INDEX = 'row_index'
+
+CATEGORICAL_FEATURES = [
+    OFF_PERSONNEL, OFF_FORMATION, QB_ALIGN, PRIMARY_ROUTE, PRIMARY_RECEIVER,
+    SECONDARY_ROUTE, SECONDARY_RECEIVER, RUN_DIRECTION, BALL_CARRIER, PLAY_TYPE,
+    DEF_PERSONNEL, DEF_FORMATION, COVERAGE, DOUBLE_TARGET, YEAR, HOME_TEAM, AWAY_TEAM,
+]
+
+NUMERIC_FEATURES = [
+    PROTECT, BLITZ, DOWN, DISTANCE, QUARTER, TIME_LEFT, YARDLINE, HOME_POSSESSION, SPY,
+    BUZZ, PLAY_ACTION, OPP_HALF, FINESSE, REVERSE,
+]
+
+LABEL_COLUMNS = [
+    YARDS, YAC, COMPLETE, SACKED, HURRIED, BLOCKED, DROPPED, INT, THROW_TO_DOUBLE, SCRAMBLE,
+]
+
+# Labels that only passing plays have.
+_PASSING_LABELS = {YAC, COMPLETE, SACKED, HURRIED, BLOCKED, DROPPED, INT, THROW_TO_DOUBLE,
+                   SCRAMBLE}
+
+
+def export_tensors(df, tensor_dir: str, vocab_path: Optional[str] = None) -> Dict:
+    """Encode the plays and write them to the directory as .npy files.
+
+    :param: df: The exported dataframe of plays.
+    :param: tensor_dir: The directory to write to, replacing earlier tensors.
+    :param: vocab_path: Optional vocabulary file shared between exports. It
+    is created from these plays if it doesn't exist, and if it does, their
+    categories it doesn't have are appended to it. Without it, the
+    vocabulary is made from these plays.
+    :returns: The metadata written to meta.json.
+    """
+    if YARDS not in df.columns:
+        raise ValueError('The plays have no yards column, export the outcome '
+                         'columns to export tensors.')
+    yards = df[YARDS].astype('float64').to_numpy()
+    rows = np.flatnonzero(~np.isnan(yards))
+    plays = df.iloc[rows]
+    passing = (plays[PLAY_TYPE].astype(object) == 'pass').to_numpy() \
+        if PLAY_TYPE in plays.columns else np.zeros(len(plays), dtype=bool)
+
+    categorical_columns = [column for column in CATEGORICAL_FEATURES if column in df.columns]
+    vocab = _load_vocab(vocab_path) if vocab_path and os.path.exists(vocab_path) else {}
+    added = 0
+    for column in categorical_columns:
+        # New values are appended, so the codes of earlier exports stay the same.
+        known = vocab.setdefault(column, [])
+        new = sorted({str(value) for value in plays[column].dropna().unique()} - set(known))
+        known.extend(new)
+        added += len(new)
+    if vocab_path and added:
+        logger.info(f'Added {added} values to the vocabulary in {vocab_path}.')
+        _save_json(vocab_path, vocab)
+
+    os.makedirs(tensor_dir, exist_ok=True)
+    categorical = _open_matrix(tensor_dir, CATEGORICAL, np.int32,
+                               (len(plays), len(categorical_columns)))
+    for position, column in enumerate(categorical_columns):
+        codes = {label: code for code, label in enumerate(vocab[column], start=1)}
+        values = plays[column]
+        missing = values.isna().to_numpy()
+        encoded = values.astype(object).astype(str).map(codes) \
+            .to_numpy(dtype=float, na_value=0, copy=True)
+        encoded[missing] = 0
+        categorical[:, position] = encoded
+    categorical.flush()
+
+    numeric_columns = [column for column in NUMERIC_FEATURES if column in df.columns]
+    numeric = _open_matrix(tensor_dir, NUMERIC, np.float32, (len(plays), len(numeric_columns)))
+    for position, column in enumerate(numeric_columns):
+        numeric[:, position] = _to_float(plays[column])
+    numeric.flush()
+
+    label_columns = [column for column in LABEL_COLUMNS if column in df.columns]
+    labels = _open_matrix(tensor_dir, LABELS, np.float32, (len(plays), len(label_columns)))
+    for position, column in enumerate(label_columns):
+        values = _to_float(plays[column])
+        if column in _PASSING_LABELS:
+            values[~passing] = np.nan
+        labels[:, position] = values
+    labels.flush()
+
+    np.save(os.path.join(tensor_dir, f'{ROW_INDEX}.npy'), rows.astype(np.int64))
+    meta = {'plays': len(plays),
+            CATEGORICAL: categorical_columns,
+            NUMERIC: numeric_columns,
+            LABELS: label_columns,
+            'vocab': {column: vocab[column] for column in categorical_columns}}
+    _save_json(os.path.join(tensor_dir, META_FILE), meta)
+    logger.info(f'Exported {len(plays)} plays as tensors to {tensor_dir}.')
+    return meta
+
+
+def load_tensors(tensor_dir: str) -> Dict[str, np.ndarray]:
+    """Memory-map the matrices of a tensor directory, by name."""
+    return {name: np.load(os.path.join(tensor_dir, f'{name}.npy'), mmap_mode='r')
+            for name in (CATEGORICAL, NUMERIC, LABELS, ROW_INDEX)}
+
+
+def load_meta(tensor_dir: str) -> Dict:
+    with open(os.path.join(tensor_dir, META_FILE)) as meta_file:
+        return json.load(meta_file)
+
+
+def iter_minibatches(tensor_dir: str, batch_size: int, seed: Optional[int] = 0,
+                     drop_last: bool = False) -> Iterator[Dict[str, np.ndarray]]:
+    """Shuffled minibatches of every matrix, read from the memory-mapped files.
+
+    :param: seed: The seed of the shuffle, or None to keep the plays in order.
+    :param: drop_last: Whether to skip the last batch if it's smaller.
+    """
+    tensors = load_tensors(tensor_dir)
+    num_plays = len(tensors[ROW_INDEX])
+    order = np.arange(num_plays) if seed is None \
+        else np.random.default_rng(seed).permutation(num_plays)
+    for start in range(0, num_plays, batch_size):
+        batch = order[start:start + batch_size]
+        if drop_last and len(batch) < batch_size:
+            break
+        # Reading the rows in file order is faster, and each batch is still a
+        # random sample of the plays.
+        batch = np.sort(batch)
+        yield {name: np.asarray(matrix[batch]) for name, matrix in tensors.items()}
+
+
+def _open_matrix(tensor_dir: str, name: str, dtype, shape) -> np.ndarray:
+    return np.lib.format.open_memmap(os.path.join(tensor_dir, f'{name}.npy'), mode='w+',
+                                     dtype=dtype, shape=shape)
+
+
+def _to_float(values) -> np.ndarray:
+    """A column as float32, with NaN where it's missing."""
+    missing = values.isna().to_numpy()
+    floats = values.where(~missing, 0).astype('float32').to_numpy(dtype=np.float32, copy=True)
+    floats[missing] = np.nan
+    return floats
+
+
+def _load_vocab(vocab_path: str) -> Dict[str, List[str]]:
+    with open(vocab_path) as vocab_file:
+        return json.load(vocab_file)
+
+
+def _save_json(path: str, data: Dict) -> None:
+    with atomic_open(path, 'w') as json_file:
+        json.dump(data, json_file, indent=2)
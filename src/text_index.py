@@ -0,0 +1,216 @@
+"""An inverted index of the plays' summary text, for searching the plays.
+
+Exports made with --keep_summary have a summary column, and a `text_index`
+directory in the league's export dir maps every token of the summaries, the
+words and player names, to the rows of the plays that contain it:
+* `tokens.json`, the sorted tokens.
+* `offsets.npy`, where each token's rows start in the postings, and where the
+  last one ends.
+* `postings.npy`, the sorted int32 rows of every token, one after another.
+* `meta.json`, the export file the rows are from, its size and modification
+  time, and how many plays it has. For a league exported to segments, the
+  source is the manifest and the rows are rows of the snapshot of the
+  manifest version it records.
+
+A search looks up each token of the query and intersects their rows, so it
+only reads the postings of those tokens and the record batches of the export
+with plays that match, instead of scanning every summary:
+
+    plays = search_plays("D:/SavedLogs/LG000021", "Brady sacked")
+
+The index covers the plays of the export it was built with. Exports with
+summaries and compactions of segments rebuild it, an export without them
+removes it, and a search of a league whose export file or manifest has
+changed since scans the summaries instead.
+"""
+import json
+import logging
+import os
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from column_names import SUMMARY
+
+logger = logging.getLogger(__name__)
+
+# The index's directory in a league's export directory.
+TEXT_INDEX_DIR = 'text_index'
+TOKENS_FILE = 'tokens.json'
+OFFSETS_FILE = 'offsets.npy'
+POSTINGS_FILE = 'postings.npy'
+META_FILE = 'meta.json'
+# The keys of meta.json that identify the version of an export file.
+_VERSION_KEYS = ('source_bytes', 'source_mtime_ns')
+
+# Words and numbers, keeping names like O'Neal in one token. Hyphens split,
+# so the down, distance and field position, e.g. 3-7-DET29, are tokens.
+_TOKEN_REGEX = r"[a-z0-9]+(?:'[a-z0-9]+)*"
+_TOKEN_PATTERN = re.compile(_TOKEN_REGEX)
+
+
+def tokenize(text: str) -> List[str]:
+    """The lowercase tokens of the text, in order."""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def build_text_index(summaries: pd.Series, index_dir: str, source: str,
+                     manifest_version: Optional[int] = None) -> Dict:
+    """Index the tokens of the summaries and write the index to the directory.
+
+    :param: summaries: The summary of each play, in the order of the export.
+    :param: index_dir: The directory to write to, replacing an earlier index.
+    :param: source: The file name of the export, in the league's export
+    directory, that the rows are rows of.
+    :param: manifest_version: For a league exported to segments, the version
+    of the manifest whose snapshot the summaries are.
+    :returns: The metadata written to meta.json.
+    """
+    tokens = summaries.astype(object).fillna('').astype(str).str.lower() \
+        .str.findall(_TOKEN_REGEX).explode().dropna()
+    postings = pd.DataFrame({'token': tokens.to_numpy(dtype=object),
+                             'row': tokens.index.to_numpy(dtype=np.int64)})
+    postings = postings.drop_duplicates().sort_values(['token', 'row'], ignore_index=True)
+    vocab, starts = np.unique(postings['token'].to_numpy(dtype=str), return_index=True)
+    offsets = np.append(starts, len(postings)).astype(np.int64)
+
+    os.makedirs(index_dir, exist_ok=True)
+    np.save(os.path.join(index_dir, POSTINGS_FILE), postings['row'].to_numpy(dtype=np.int32))
+    np.save(os.path.join(index_dir, OFFSETS_FILE), offsets)
+    with open(os.path.join(index_dir, TOKENS_FILE), 'w') as tokens_file:
+        json.dump(vocab.tolist(), tokens_file)
+    meta = {'source': source, 'plays': len(summaries), 'tokens': len(vocab),
+            'postings': len(postings)}
+    if manifest_version is not None:
+        meta['manifest_version'] = manifest_version
+    else:
+        meta.update(_file_version(os.path.join(os.path.dirname(index_dir), source)))
+    with open(os.path.join(index_dir, META_FILE), 'w') as meta_file:
+        json.dump(meta, meta_file, indent=2)
+    logger.info(f'Indexed {len(vocab)} tokens of {len(summaries)} play summaries '
+                f'to {index_dir}.')
+    return meta
+
+
+class TextIndex(object):
+    """A loaded text index, with its postings memory-mapped."""
+
+    def __init__(self, index_dir: str):
+        with open(os.path.join(index_dir, TOKENS_FILE)) as tokens_file:
+            self._positions = {token: position
+                               for position, token in enumerate(json.load(tokens_file))}
+        with open(os.path.join(index_dir, META_FILE)) as meta_file:
+            self.meta = json.load(meta_file)
+        self._offsets = np.load(os.path.join(index_dir, OFFSETS_FILE))
+        self._postings = np.load(os.path.join(index_dir, POSTINGS_FILE), mmap_mode='r')
+
+    def rows(self, token: str) -> np.ndarray:
+        """The sorted rows of the plays whose summary has the token."""
+        position = self._positions.get(token.lower())
+        if position is None:
+            return np.empty(0, dtype=np.int32)
+        return np.asarray(self._postings[self._offsets[position]:self._offsets[position + 1]])
+
+    def search(self, query: str) -> np.ndarray:
+        """The sorted rows of the plays whose summary has every token of the
+        query, in any order."""
+        tokens = set(tokenize(query))
+        if not tokens:
+            return np.empty(0, dtype=np.int32)
+        # Intersecting the rarest tokens first keeps the intermediate results small.
+        postings = sorted((self.rows(token) for token in tokens), key=len)
+        rows = postings[0]
+        for token_rows in postings[1:]:
+            if not len(rows):
+                break
+            rows = np.intersect1d(rows, token_rows, assume_unique=True)
+        return rows
+
+
+def search_plays(league_dir: str, query: str, columns: Optional[List[str]] = None,
+                 phrase: bool = False, limit: Optional[int] = None) -> pd.DataFrame:
+    """The plays of the league's export whose summary matches the query.
+
+    :param: league_dir: The league's export directory, with a text index.
+    :param: query: The words and names to look for, e.g. 'Brady sacked'.
+    :param: columns: Optional columns to read. Defaults to every column.
+    :param: phrase: Whether the tokens must be next to each other, in the
+    order of the query.
+    :param: limit: Optional most plays to return, the first ones in the export.
+    :returns: The matching plays, indexed by their row in the export.
+    """
+    from segments import read_league_rows, read_rows
+
+    index = TextIndex(os.path.join(league_dir, TEXT_INDEX_DIR))
+    read_columns = None if columns is None else list(dict.fromkeys(list(columns) + [SUMMARY]))
+    if 'manifest_version' in index.meta:
+        from segments import load_manifest, read_league
+
+        manifest = load_manifest(league_dir)
+        if manifest.version == index.meta['manifest_version']:
+            rows = index.search(query)
+        else:
+            # The segments changed since the index was built, e.g. by a run
+            # without summaries or an interrupted compaction.
+            logger.warning(f'The text index of {league_dir} is of manifest version '
+                           f'{index.meta["manifest_version"]}, not {manifest.version}. '
+                           f'Scanning the summaries instead.')
+            summaries = read_league(league_dir, [SUMMARY], manifest) \
+                .reindex(columns=[SUMMARY])[SUMMARY]
+            rows = np.flatnonzero(_has_tokens(summaries, query))
+
+        def read(rows: np.ndarray) -> pd.DataFrame:
+            return read_league_rows(league_dir, rows, read_columns, manifest)
+    else:
+        import pyarrow.ipc
+
+        source_path = os.path.join(league_dir, index.meta['source'])
+        with pyarrow.ipc.open_file(source_path) as reader:
+            has_summary = SUMMARY in reader.schema.names
+        if not has_summary:
+            raise ValueError(f'{source_path} has no play summaries, export the league '
+                             f'with --keep_summary to search it.')
+        if _file_version(source_path) == {key: index.meta.get(key) for key in _VERSION_KEYS}:
+            rows = index.search(query)
+        else:
+            # The league was exported again since the index was built.
+            logger.warning(f'The text index of {league_dir} is of an earlier export '
+                           f'of {index.meta["source"]}. Scanning the summaries instead.')
+            summaries = pd.read_feather(source_path, columns=[SUMMARY])[SUMMARY]
+            rows = np.flatnonzero(_has_tokens(summaries, query))
+
+        def read(rows: np.ndarray) -> pd.DataFrame:
+            return read_rows(source_path, rows, read_columns)
+    if limit is not None and not phrase:
+        rows = rows[:limit]
+    # Only the record batches with matching plays are read, none if there aren't any.
+    df = read(rows)
+    if phrase:
+        needle = ' '.join(tokenize(query))
+        keep = [f' {" ".join(tokenize(summary))} '.find(f' {needle} ') >= 0
+                for summary in df[SUMMARY].astype(object).fillna('').astype(str)]
+        df = df.loc[np.array(keep, dtype=bool)]
+        if limit is not None:
+            df = df.iloc[:limit]
+    if columns is not None and SUMMARY not in columns:
+        df = df.drop(columns=[SUMMARY])
+    return df
+
+
+def _has_tokens(summaries: pd.Series, query: str) -> np.ndarray:
+    """Whether each summary has every token of the query, by scanning them."""
+    tokens = set(tokenize(query))
+    if not tokens:
+        return np.zeros(len(summaries), dtype=bool)
+    summary_tokens = summaries.astype(object).fillna('').astype(str).str.lower() \
+        .str.findall(_TOKEN_REGEX).map(set)
+    return summary_tokens.map(tokens.issubset).to_numpy(dtype=bool)
+
+
+def _file_version(path: str) -> Dict:
+    """The size and modification time of the export file, which change when
+    the league is exported again."""
+    stat = os.stat(path)
+    return {'source_bytes': stat.st_size, 'source_mtime_ns': stat.st_mtime_ns}
@@ -0,0 +1,293 @@
+"""Vectorized extraction of the fields read from the play summary text, and
+resolution of the players' full names.
+
+The per play parser runs one python re.search after another for every play.
+In the vectorized parse mode the workers skip those fields and ship the raw
+summaries instead, and the clock, down and distance, field position, play
+type, yardage, YAC and outcome flags are extracted here with pandas string
+kernels over the summaries of the whole league at once.
+
+The workers also leave the players' short names as they are in the play call
+tables, and ship each game's roster. resolve_names joins every short name
+with the rosters at once.
+
+The same regexes and rules as the per play parser are used, so the columns
+match what it produces, including which plays have which columns. verify.py
+has a `vectorized` engine to check that they do.
+"""
+import logging
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from column_names import *
+from parsing.regexes import *
+from player_registry import DEFENSE_NAME_COLUMNS, NAME_COLUMNS
+from schema.column_groups import COLUMN_GROUPS, CALL, CONTEXT, OUTCOME, resolve_columns
+
+logger = logging.getLogger(__name__)
+
+_RAW_COLUMNS = [RAW_SUMMARY, RAW_OFFENSE_TEAM, RAW_TARGET_ROUTE, RAW_TARGET_PRIORITY]
+_RAW_NAME_COLUMNS = [RAW_NAMES_OFFENSE, RAW_ROSTER]
+
+# Read from the summary text, so it's already a full name.
+_TARGETED_RECEIVER_NAME = 'targeted_receiver_name'
+
+# The same checks, in the same order, as play_call_parsing.parse_play_type.
+_PASS_REGEXES = [SACKED_REGEX, PASS_COMPLETED_REGEX, SIMPLE_INCOMPLETION_REGEX, DROPPED_REGEX,
+                 PASS_BLOCKED_REGEX, INTERCEPTION_REGEX, HURRIED_REGEX]
+
+# Plays without an outcome, the same as play_summary_parsing._should_parse.
+_NOT_PARSED = ['called a time out', 'Extra point', 'kicked off', 'Start of ',
+               'Official time out for the two-minute warning', 'won the toss',
+               'won the coin toss', 'Final Score:', 'field goal', 'punted ',
+               'two-point conversion', 'conversion attempt']
+
+# Columns only passing outcomes have.
+_PASSING_COLUMNS = [COMPLETE, YAC, TARGET_ROUTE, TARGET_PRIORITY, SACKED, HURRIED, BLOCKED,
+                    INT, THROW_TO_DOUBLE, DROPPED, SCRAMBLE]
+
+
+def extract_summary_columns(df: pd.DataFrame, columns: Optional[List[str]] = None,
+                            keep_none: bool = False) -> pd.DataFrame:
+    """Replace the raw columns of vectorized mode rows with the parsed columns.
+
+    :param: df: The rows of a league parsed in the vectorized mode.
+    :param: columns: The column groups and/or columns the rows were parsed
+    with. Defaults to every column.
+    :param: keep_none: Whether to keep the None play types and outcomes of
+    plays that weren't parsed as None rather than NaN, to compare rows.
+    :returns: The dataframe with the columns the per play parser would have.
+    """
+    groups, emitted = resolve_columns(columns)
+    groups = COLUMN_GROUPS.keys() if groups is None else groups
+    summary = df[RAW_SUMMARY].astype(object)
+    parsed: Dict[str, pd.Series] = {}
+    if CALL in groups or OUTCOME in groups:
+        play_type = _play_type(summary)
+        if CALL in groups:
+            parsed.update(_play_type_columns(play_type, keep_none))
+        if OUTCOME in groups:
+            parsed.update(_outcome_columns(df, summary, play_type[PLAY_TYPE], keep_none))
+    if CONTEXT in groups:
+        parsed.update(_context_columns(summary, df[RAW_OFFENSE_TEAM]))
+
+    df = df.drop(columns=[column for column in _RAW_COLUMNS if column in df.columns])
+    for column, values in parsed.items():
+        if emitted is None or column in emitted:
+            df[column] = values
+    return df
+
+
+def resolve_names(df: pd.DataFrame) -> pd.DataFrame:
+    """Replace the short names of vectorized mode rows with full names.
+
+    The rosters of every game are joined with the short names of every name
+    column at once, instead of a dict lookup per name per play in the workers.
+    A short name resolves to the last full name in its game's roster with the
+    same team side, and to '' if there isn't one, like NameParser does.
+
+    :param: df: The rows of a league parsed in the vectorized mode.
+    :returns: The dataframe with full names and without the raw name columns.
+    """
+    rosters = df.loc[df[RAW_ROSTER].notna(), [GAME_ID, RAW_ROSTER]].explode(RAW_ROSTER)
+    rosters = rosters[rosters[RAW_ROSTER].notna()]
+    entries = pd.DataFrame([list(entry) for entry in rosters[RAW_ROSTER]],
+                           columns=['side', 'short_name', 'full_name'])
+    entries[GAME_ID] = rosters[GAME_ID].astype(object).to_numpy()
+    entries = entries.drop_duplicates([GAME_ID, 'side', 'short_name'], keep='last')
+    full_names = pd.Series(entries['full_name'].to_numpy(dtype=object),
+                           index=pd.MultiIndex.from_arrays(
+                               [entries[GAME_ID], entries['side'], entries['short_name']]))
+
+    games = df[GAME_ID].astype(object).to_numpy()
+    offense = df[RAW_NAMES_OFFENSE].astype(object)
+    sides = {False: offense.to_numpy(),
+             True: offense.map({'home': 'away', 'away': 'home'}).to_numpy()}
+    for column in NAME_COLUMNS:
+        if column not in df.columns or column == _TARGETED_RECEIVER_NAME:
+            continue
+        keys = pd.MultiIndex.from_arrays([games, sides[column in DEFENSE_NAME_COLUMNS],
+                                          df[column].astype(object).to_numpy()])
+        resolved = full_names.reindex(keys).to_numpy()
+        resolved[pd.isna(resolved)] = ''
+        df[column] = pd.Series(resolved, index=df.index).astype(df[column].dtype)
+    return df.drop(columns=_RAW_NAME_COLUMNS)
+
+
+def _contains(summary: pd.Series, pattern: str, regex: bool = True) -> pd.Series:
+    if regex:
+        # Groups don't change whether there's a match, but pandas warns about them.
+        pattern = re.sub(r'(?<!\\)\((?!\?)', '(?:', pattern)
+    return summary.str.contains(pattern, regex=regex).fillna(False).astype(bool)
+
+
+def _first_match(summary: pd.Series, pattern: str) -> pd.Series:
+    """The first match of the pattern in each summary, or NaN, like re.search()[0]."""
+    pattern = re.sub(r'(?<!\\)\((?!\?)', '(?:', pattern)
+    return summary.str.extract(f'({pattern})', expand=False)
+
+
+def _play_type(summary: pd.Series) -> pd.DataFrame:
+    playaction = _contains(summary, 'Play-Action', regex=False)
+    scrambled = _contains(summary, 'scrambled', regex=False)
+    passing = np.logical_or.reduce([_contains(summary, regex) for regex in _PASS_REGEXES])
+    finesse = _contains(summary, FINESSE_RUN_REGEX)
+    reverse = _contains(summary, REVERSE_REGEX)
+    kneel = _contains(summary, KNEEL_REGEX)
+    run = _contains(summary, RUN_REGEX) | _contains(summary, 'kept the ball', regex=False)
+
+    conditions = [playaction, scrambled, passing, finesse, reverse, kneel, run]
+    play_type = np.select(conditions, ['pass', 'pass', 'pass', 'run', 'run', 'kneel', 'run'],
+                          default='')
+    first = np.select(conditions, range(len(conditions)), default=-1)
+    unknown = play_type == ''
+    if unknown.any():
+        logger.warning(f'Could not determine the play type of {int(unknown.sum())} plays.')
+    return pd.DataFrame({PLAY_TYPE: np.where(unknown, None, play_type),
+                         PLAY_ACTION: first == 0,
+                         FINESSE: first == 3,
+                         REVERSE: first == 4}, index=summary.index)
+
+
+def _play_type_columns(play_type: pd.DataFrame, keep_none: bool) -> Dict[str, pd.Series]:
+    known = play_type[PLAY_TYPE].notna()
+    columns = {column: _where(known, play_type[column])
+               for column in (PLAY_TYPE, PLAY_ACTION, FINESSE, REVERSE)}
+    if not known.all():
+        # The per play parser has a None play type where it couldn't parse one.
+        columns['play_type'] = _none_where(~known, keep_none)
+    return columns
+
+
+def _outcome_columns(df: pd.DataFrame, summary: pd.Series,
+                     play_type: pd.Series, keep_none: bool) -> Dict[str, pd.Series]:
+    parsed = pd.Series(~np.logical_or.reduce([_contains(summary, text, regex=False)
+                                              for text in _NOT_PARSED]),
+                       index=summary.index)
+    unknown = parsed & play_type.isna()
+    if unknown.any():
+        raise ValueError(f'Could not determine the play type of: '
+                         f'{summary[unknown].iloc[0]}')
+    passing = parsed & (play_type == 'pass')
+    running = parsed & ~passing
+    scramble = passing & _contains(summary, ' scrambled ', regex=False)
+    sacked = passing & ~scramble & _contains(summary, SACKED_REGEX)
+    thrown = passing & ~scramble & ~sacked
+    complete = thrown & _contains(summary, PASS_COMPLETED_REGEX)
+
+    yardage = pd.to_numeric(_first_match(summary, YARDAGE_REGEX))
+    sack_yards = pd.to_numeric(_first_match(summary, SACK_YARDS_LOST_REGEX))
+    yac = pd.to_numeric(_first_match(summary, YAC_REGEX)).fillna(0).astype(int)
+    _check_found(yardage, scramble | complete, summary, 'yardage')
+    _check_found(sack_yards, sacked, summary, 'sack yardage')
+    missing_run_yards = running & yardage.isna()
+    for text in summary[missing_run_yards]:
+        logger.warning(f"Couldn't find yardage for: {text}")
+
+    # Every selected yardage was found, so the result has no NaNs.
+    yards = np.select([running, scramble, sacked, complete, thrown],
+                      [yardage.fillna(0), yardage, -sack_yards, yardage, 0],
+                      default=0).astype(int)
+    hurried = thrown & _contains(summary, HURRIED_REGEX)
+    blocked = thrown & _contains(summary, PASS_BLOCKED_REGEX)
+    dropped = thrown & _contains(summary, DROPPED_REGEX)
+    intercepted = thrown & _contains(summary, INTERCEPTION_REGEX)
+    incompatible = (complete.astype(int) + blocked + intercepted + dropped) > 1
+    if incompatible.any():
+        raise ValueError(f'Multiple incompatible outcomes were true for: '
+                         f'{summary[incompatible].iloc[0]}')
+
+    columns = {
+        COMPLETE: complete,
+        YARDS: pd.Series(yards, index=summary.index),
+        YAC: yac.where(complete, 0),
+        TARGET_ROUTE: df[RAW_TARGET_ROUTE].where(thrown, ''),
+        TARGET_PRIORITY: df[RAW_TARGET_PRIORITY].where(thrown, ''),
+        SACKED: sacked,
+        HURRIED: hurried,
+        BLOCKED: blocked,
+        INT: intercepted,
+        THROW_TO_DOUBLE: thrown & _contains(summary, 'threw into double coverage',
+                                            regex=False),
+        DROPPED: dropped,
+        SCRAMBLE: scramble,
+    }
+    columns = {column: _where(passing, values) if column in _PASSING_COLUMNS
+               else _where(parsed, values) for column, values in columns.items()}
+    columns['familiar'] = _where(parsed, _contains(summary, ' familiar ', regex=False))
+    if not parsed.all():
+        # The per play parser has a None outcome for plays it doesn't parse.
+        columns['outcome'] = _none_where(~parsed, keep_none)
+    return columns
+
+
+def _context_columns(summary: pd.Series, offense_team: pd.Series) -> Dict[str, pd.Series]:
+    two_point = _contains(summary, 'two-point', regex=False)
+
+    clock = _first_match(summary, CLOCK_REGEX)
+    time = _first_match(clock, TIME_REGEX)
+    _check_found(time, pd.Series(True, index=summary.index), summary, 'clock')
+    quarter = clock.str[1]
+    # Overtime
+    quarter = quarter.where(quarter != 'O', '5').astype(int)
+
+    field_pos = _first_match(summary, FIELD_POSITION_REGEX)
+    _check_found(field_pos, ~two_point, summary, 'field position')
+    has_field_pos = field_pos.notna()
+    yardline = np.where(has_field_pos, pd.to_numeric(field_pos.str[3:]), 2).astype(int)
+    opponents_half = np.where(has_field_pos, field_pos.str[:3] != offense_team, True)
+
+    down_distance = _first_match(summary, DOWN_DISTANCE_REGEX)
+    _check_found(down_distance, ~two_point, summary, 'down and distance')
+    has_down = down_distance.notna()
+    down = np.where(has_down, pd.to_numeric(down_distance.str[0]), 4).astype(int)
+    distance = np.where(has_down, pd.to_numeric(down_distance.str[2:4]), 2).astype(int)
+
+    index = summary.index
+    return {QUARTER: quarter.astype('int64'),
+            TIME_LEFT: pd.to_numeric(time.str.replace(':', '.', regex=False)).astype(float),
+            YARDLINE: pd.Series(yardline, index=index, dtype='int64'),
+            OPP_HALF: pd.Series(opponents_half, index=index, dtype=bool),
+            DOWN: pd.Series(down, index=index, dtype='int64'),
+            DISTANCE: pd.Series(distance, index=index, dtype='int64')}
+
+
+def _check_found(values: pd.Series, needed: pd.Series, summary: pd.Series,
+                 what: str) -> None:
+    """Fail like the per play parser does when a needed field isn't found."""
+    missing = needed & values.isna()
+    if missing.any():
+        raise AssertionError(f'The {what} could not be parsed: '
+                             f'{summary[missing].iloc[0]}')
+
+
+def _where(mask: pd.Series, values: pd.Series) -> pd.Series:
+    """The values where the mask is true, and missing elsewhere like a key the
+    per play rows don't have."""
+    out = values.astype(object).where(mask, np.nan)
+    return out.infer_objects()
+
+
+def _none_where(mask: pd.Series, keep_none: bool) -> pd.Series:
+    """None where the mask is true, and missing elsewhere. Unless keep_none,
+    the Nones become NaNs like they do when the per play rows are normalized."""
+    out = pd.Series(np.where(mask, None, np.nan), index=mask.index, dtype=object)
+    return out if keep_none else out.infer_objects()
+
+
+def parse_one_log(path: str, idx: int, columns: Optional[List[str]] = None) -> List[Dict]:
+    """Parse a game log in the vectorized mode, with the rows of the per play
+    mode. This is the `vectorized` engine of verify.py."""
+    from worker import VECTORIZED, parse_one_log as parse_log
+
+    rows = parse_log(path, idx, columns, parse_mode=VECTORIZED)
+    df = extract_summary_columns(pd.DataFrame(rows), columns, keep_none=True)
+    if RAW_NAMES_OFFENSE in df.columns:
+        df = resolve_names(df)
+    # Drop the missing values, which are keys the per play rows don't have.
+    return [{column: value for column, value in row.items()
+             if not (isinstance(value, float) and np.isnan(value))}
+            for row in df.to_dict(orient='records')]
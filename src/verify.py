@@ -0,0 +1,254 @@
+"""Differential verification of alternative parse engines against the reference.
+
+Faster extraction and parsing paths must not silently change any numbers. This
+runs the reference engine, bs4 with `parse_full_game`, and any alternative
+engines side by side on a reproducible sample of logs. It diffs their rows
+field by field and reports the throughput of each.
+
+Run from the src directory:
+`python -m verify --logs_dir "C:\\Front Office Football Eight\\leaguehtml"
+--league_id LG000021 --engines my_module:parse_log --sample 50`
+
+An engine is a function with the signature of `worker.parse_one_log`, taking
+a game log path, its index and the optional columns, and returning one
+flattened dictionary per play. Engines are given either by a name in ENGINES
+or as `module:function`. The exit code is 1 if any engine differs.
+"""
+import argparse
+import importlib
+import json
+import logging
+import math
+import os
+import sys
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+REFERENCE = 'reference'
+
+# Named engines, as `module:function`.
+ENGINES: Dict[str, str] = {
+    REFERENCE: 'worker:parse_one_log',
+    'vectorized': 'vectorized:parse_one_log',
+}
+
+Engine = Callable[..., List[Dict]]
+
+# Floats are compared with this relative tolerance, e.g. for time remaining.
+_REL_TOL = 1e-9
+
+
+@dataclass
+class EngineReport:
+    # The engine's name or `module:function`.
+    engine: str
+    logs: int = 0
+    plays: int = 0
+    seconds: float = 0.0
+    logs_per_second: float = 0.0
+    plays_per_second: float = 0.0
+    # How many times faster than the reference engine.
+    speedup: float = 0.0
+    # Logs whose rows differ in any way from the reference's.
+    mismatched_logs: int = 0
+    # How many rows differ in each field, including fields only one engine has.
+    field_mismatches: Dict[str, int] = field(default_factory=dict)
+    # Logs with a different number of rows than the reference's.
+    row_count_mismatches: int = 0
+    # Logs the engine failed to parse, with the error.
+    errors: Dict[str, str] = field(default_factory=dict)
+    # The first few differences, to start debugging from.
+    examples: List[Dict] = field(default_factory=list)
+
+
+def load_engine(spec: str) -> Engine:
+    """Import the engine named in ENGINES, or given as `module:function`."""
+    spec = ENGINES.get(spec, spec)
+    module_name, _, function_name = spec.partition(':')
+    if not function_name:
+        raise ValueError(f"Unknown engine {spec}. Engines are {', '.join(ENGINES)}, "
+                         f"or `module:function`.")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def run_engine(engine: Engine, paths: List[str],
+               columns: Optional[List[str]] = None) -> Tuple[List[Any], Dict[str, str], float]:
+    """Parse every log with the engine.
+
+    :returns: The rows of each log, or None where the engine failed, the error
+    of each failed log, and the seconds taken.
+    """
+    games = []
+    errors = {}
+    start_time = time.perf_counter()
+    for idx, path in enumerate(paths):
+        try:
+            games.append(engine(path, idx, columns))
+        except Exception as e:
+            games.append(None)
+            errors[path] = repr(e)
+    return games, errors, time.perf_counter() - start_time
+
+
+def diff_game(reference: List[Dict], candidate: List[Dict],
+              game: str, report: EngineReport, max_examples: int) -> None:
+    """Add the differences between two engines' rows of a game to the report."""
+    mismatched = len(reference) != len(candidate)
+    if mismatched:
+        report.row_count_mismatches += 1
+        _add_example(report, max_examples, game=game, play=None, field='<rows>',
+                     reference=len(reference), candidate=len(candidate))
+    field_mismatches = Counter(report.field_mismatches)
+    for play, (reference_row, candidate_row) in enumerate(zip(reference, candidate)):
+        for column in reference_row.keys() | candidate_row.keys():
+            reference_value = reference_row.get(column, _MISSING)
+            candidate_value = candidate_row.get(column, _MISSING)
+            if not values_equal(reference_value, candidate_value):
+                mismatched = True
+                field_mismatches[column] += 1
+                _add_example(report, max_examples, game=game, play=play, field=column,
+                             reference=reference_value, candidate=candidate_value)
+    report.field_mismatches = dict(field_mismatches)
+    report.mismatched_logs += mismatched
+
+
+class _Missing(object):
+    def __repr__(self):
+        return '<missing>'
+
+
+_MISSING = _Missing()
+
+
+def values_equal(a: Any, b: Any) -> bool:
+    """Whether two parsed values match, treating NaNs as equal and allowing
+    float rounding."""
+    if a is b:
+        return True
+    if isinstance(a, float) or isinstance(b, float):
+        if isinstance(a, (int, float)) and isinstance(b, (int, float)) \
+                and not isinstance(a, bool) and not isinstance(b, bool):
+            if math.isnan(a) or math.isnan(b):
+                return math.isnan(a) and math.isnan(b)
+            return math.isclose(a, b, rel_tol=_REL_TOL)
+        return False
+    # Don't let True match 1, a changed type is a changed value.
+    if type(a) is not type(b) and (isinstance(a, bool) or isinstance(b, bool)):
+        return False
+    return a == b
+
+
+def _add_example(report: EngineReport, max_examples: int, **example) -> None:
+    if len(report.examples) < max_examples:
+        report.examples.append({key: repr(value) if key in ('reference', 'candidate')
+                                else value for key, value in example.items()})
+
+
+def verify(paths: List[str], engines: List[str], columns: Optional[List[str]] = None,
+           max_examples: int = 20) -> List[EngineReport]:
+    """Run the reference and each alternative engine on the logs and diff them.
+
+    :param: paths: The game logs to verify on.
+    :param: engines: Alternative engine names or `module:function` specs.
+    :param: columns: Optional column groups and/or columns to parse.
+    :param: max_examples: How many differences to keep per engine.
+    :returns: A report for the reference, then one per alternative engine.
+    """
+    reports = []
+    reference_games = None
+    reference_seconds = None
+    for name in [REFERENCE] + [engine for engine in engines if engine != REFERENCE]:
+        engine = load_engine(name)
+        games, errors, seconds = run_engine(engine, paths, columns)
+        report = EngineReport(engine=name, logs=len(paths), seconds=seconds, errors=errors,
+                              plays=sum(len(game) for game in games if game is not None))
+        report.logs_per_second = report.logs / seconds if seconds else 0.0
+        report.plays_per_second = report.plays / seconds if seconds else 0.0
+        if reference_games is None:
+            reference_games, reference_seconds = games, seconds
+            report.speedup = 1.0
+        else:
+            report.speedup = reference_seconds / seconds if seconds else 0.0
+            for path, reference, candidate in zip(paths, reference_games, games):
+                if reference is None or candidate is None:
+                    report.mismatched_logs += reference is not candidate
+                    continue
+                diff_game(reference, candidate, os.path.basename(path), report,
+                          max_examples)
+        logger.info(f'{name}: {report.logs} logs, {report.plays} plays in '
+                    f'{seconds:.2f} seconds.')
+        reports.append(report)
+    return reports
+
+
+def _print_reports(reports: List[EngineReport]) -> None:
+    print(f"{'engine':<32}{'logs/s':>10}{'plays/s':>12}{'speedup':>9}"
+          f"{'mismatched logs':>17}{'errors':>8}")
+    for report in reports:
+        print(f"{report.engine:<32}{report.logs_per_second:>10.2f}"
+              f"{report.plays_per_second:>12.1f}{report.speedup:>8.2f}x"
+              f"{report.mismatched_logs:>17}{len(report.errors):>8}")
+    for report in reports[1:]:
+        if report.field_mismatches:
+            print(f'\nFields that differ for {report.engine}:')
+            for column, count in sorted(report.field_mismatches.items(),
+                                        key=lambda item: -item[1]):
+                print(f'  {column:<30}{count:>8} plays')
+        for example in report.examples:
+            print(f"  {example['game']} play {example['play']} {example['field']}: "
+                  f"reference {example['reference']}, {report.engine} "
+                  f"{example['candidate']}")
+
+
+def main(args) -> int:
+    from loader import game_log_paths
+    from sampling import stratified_sample
+
+    columns = args.columns.split(",") if args.columns else None
+    engines = args.engines.split(",") if args.engines else []
+    # Fail on unknown engines before parsing anything.
+    for engine in engines:
+        load_engine(engine)
+    league_log_dir = os.path.join(args.logs_dir, args.league_id)
+    paths = stratified_sample(game_log_paths(league_log_dir), args.sample, args.seed)
+    reports = verify(paths, engines, columns, args.max_examples)
+    _print_reports(reports)
+    if args.report:
+        with open(args.report, 'w') as report_file:
+            json.dump([asdict(report) for report in reports], report_file, indent=2)
+    differs = any(report.mismatched_logs or report.errors for report in reports)
+    return 1 if differs else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logs_dir", help="The directory of the game logs for "
+                                           "Front Office Football.", type=str)
+    parser.add_argument("--league_id", help="The 8 character id of the league "
+                                            "to verify on.", type=str)
+    parser.add_argument("--engines", help="A comma separated list of engines "
+                                          "to verify against the reference, "
+                                          "by name or as module:function.",
+                        type=str)
+    parser.add_argument("--sample", help="How many logs to verify on, "
+                                         "stratified by season.",
+                        type=int, default=50)
+    parser.add_argument("--seed", help="The random seed of the sample.",
+                        type=int, default=0)
+    parser.add_argument("--columns", help="Optional: A comma separated list of "
+                                          "column groups and/or columns to "
+                                          "parse and compare.", type=str)
+    parser.add_argument("--max_examples", help="How many differences to show "
+                                               "per engine.", type=int, default=20)
+    parser.add_argument("--report", help="Optional: A path to write the "
+                                         "reports to as JSON.", type=str)
+    parser.add_argument("--log_level", help="Optional: The logging level, "
+                                            "e.g. DEBUG. Defaults to INFO.",
+                        type=str, default="INFO")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper())
+    sys.exit(main(args))
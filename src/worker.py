@@ -0,0 +1,294 @@
+"""Worker side of the parsing pipeline.
+
+Workers only need the loader and the parsing modules, so this module must not
+import pandas or anything else the parent uses to build dataframes. Under the
+spawn start method every worker re-imports this module from scratch."""
+import logging
+import os
+import pickle
+import threading
+import time
+from dataclasses import asdict
+from typing import Any, Collection, List, Dict, NamedTuple, Optional, Tuple, Union
+
+from column_names import (GAME_ID, SUMMARY, YEAR, RAW_NAMES_OFFENSE, RAW_OFFENSE_TEAM, RAW_ROSTER,
+                          RAW_SUMMARY, RAW_TARGET_PRIORITY, RAW_TARGET_ROUTE)
+from dedup import ParsedLogIndex
+from loader import (get_log_participation_year, get_log_participation, log_game_id,
+                    log_year)
+from memory import current_rss_bytes, peak_rss_bytes
+from memprofile import StageProfiler, deep_size_bytes
+from parsing.game_log_parsing import parse_full_game, parse_full_game_deferred, ParsedPlay
+from schema.column_groups import resolve_columns
+
+logger = logging.getLogger(__name__)
+
+# Whether parse_task profiles the memory of each stage, see memprofile.
+_profile_memory = False
+
+# Parse modes. Per play parses every field of each play in the worker.
+# Vectorized leaves the fields read from the summary text to be extracted and
+# the players' full names to be resolved for the whole league at once, see
+# vectorized, and the rows carry the raw columns that needs.
+PER_PLAY = 'per_play'
+VECTORIZED = 'vectorized'
+PARSE_MODES = (PER_PLAY, VECTORIZED)
+_RAW_COLUMNS = {RAW_SUMMARY, RAW_OFFENSE_TEAM, RAW_TARGET_ROUTE, RAW_TARGET_PRIORITY,
+                RAW_NAMES_OFFENSE, RAW_ROSTER}
+
+
+def init_worker(log_level: int = logging.INFO, profile_memory: bool = False,
+                profile_dir: Optional[str] = None) -> None:
+    """Pool initializer that sets up logging in a freshly started worker.
+
+    Spawned workers don't inherit the parent's logging config, and importing
+    this module has already loaded the parsing modules before the first task.
+
+    :param: profile_memory: Whether to profile the memory of each stage.
+    :param: profile_dir: Optional directory to profile the worker with
+    cProfile into, its stats are written there when it exits.
+    """
+    configure_logging(log_level)
+    set_memory_profiling(profile_memory)
+    if profile_dir:
+        from profiling import start_process_profile
+        start_process_profile(profile_dir)
+
+
+def configure_logging(log_level: Union[int, str]) -> None:
+    """Log to the console at the level, while the parsers' warnings still
+    reach the warning counter at any level.
+
+    A logger drops records below its effective level before any handler sees
+    them, so the parsing logger is kept at WARNING or lower and the level is
+    applied to the console handlers instead."""
+    logging.basicConfig(level=log_level)
+    for handler in logging.getLogger().handlers:
+        handler.setLevel(log_level)
+    parsing_logger = logging.getLogger('parsing')
+    if parsing_logger.getEffectiveLevel() > logging.WARNING:
+        parsing_logger.setLevel(logging.WARNING)
+
+
+def set_memory_profiling(enabled: bool) -> None:
+    """Turn the memory profiling of parse_task on or off in this process."""
+    global _profile_memory
+    _profile_memory = enabled
+
+
+class TaskResult(NamedTuple):
+    # The position of the log in the list of paths being parsed.
+    idx: int
+    # One flattened dictionary per play.
+    rows: List[Dict]
+    # The worker's current and peak memory after the task, if known.
+    rss: Optional[int] = None
+    peak_rss: Optional[int] = None
+    # Whether the rows were reused from a ParsedLogIndex instead of parsed.
+    reused: bool = False
+    # The memory of each stage, if memory profiling is on.
+    stages: Optional[Dict[str, Dict]] = None
+    # The Arrow IPC file the rows were written to instead, see arrow_handoff.
+    batch_path: Optional[str] = None
+    plays: Optional[int] = None
+    # The size of the log, the seconds the worker spent on it and how many
+    # warnings the parsers logged, for telemetry.
+    log_bytes: Optional[int] = None
+    seconds: Optional[float] = None
+    warnings: Optional[int] = None
+
+
+class _WarningCounter(logging.Handler):
+    """Counts the warnings the parsers log in each thread. It only sees the
+    warnings the parsing logger lets through, see configure_logging."""
+
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self._local = threading.local()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self._local.count = self.count + 1
+
+    @property
+    def count(self) -> int:
+        return getattr(self._local, 'count', 0)
+
+    def reset(self) -> None:
+        self._local.count = 0
+
+
+_warning_counter = _WarningCounter()
+logging.getLogger('parsing').addHandler(_warning_counter)
+
+
+def parse_one_log(path: str, idx: int,
+                  columns: Optional[Collection[str]] = None,
+                  index_dir: Optional[str] = None,
+                  parse_mode: str = PER_PLAY,
+                  keep_summary: bool = False) -> List[Dict]:
+    """Worker task to parse the game log at the given path.
+
+    :param: columns: Optional column groups and/or columns to emit, see
+    schema.column_groups. Sub-parsers that no requested column needs are
+    skipped. Defaults to every column.
+    :param: index_dir: Optional directory of a ParsedLogIndex. Logs whose
+    contents were already parsed reuse those rows, and new ones are added.
+    :param: parse_mode: PER_PLAY, or VECTORIZED to leave the fields in the
+    summary text to vectorized.extract_summary_columns.
+    :param: keep_summary: Whether to keep each play's summary text as a column.
+    :returns: One flattened dictionary per play.
+    """
+    parsed_dicts, _ = _load_or_parse(path, idx, columns, index_dir, parse_mode=parse_mode,
+                                     keep_summary=keep_summary)
+    return parsed_dicts
+
+
+def parse_html(html: str, year: int, columns: Optional[Collection[str]] = None) -> List[Dict]:
+    """Worker task to parse the html of a game log that isn't on disk."""
+    raw_log, participation = get_log_participation(html)
+    return _with_metadata(_parse_game(raw_log, participation, columns), year)
+
+
+def parse_task(path: str, idx: int,
+               columns: Optional[Collection[str]] = None,
+               index_dir: Optional[str] = None,
+               parse_mode: str = PER_PLAY,
+               handoff_dir: Optional[str] = None,
+               keep_summary: bool = False) -> TaskResult:
+    """Pool task that also reports the worker's current and peak memory.
+
+    :param: handoff_dir: Optional directory to write the rows to as an Arrow
+    IPC file, whose path is returned instead of the rows.
+    """
+    start_time = time.perf_counter()
+    _warning_counter.reset()
+    profiler = StageProfiler(_profile_memory)
+    parsed_dicts, reused = _load_or_parse(path, idx, columns, index_dir, profiler,
+                                          parse_mode, keep_summary)
+    batch_path = None
+    with profiler.stage('handoff') as record:
+        record['plays'] = len(parsed_dicts)
+        if handoff_dir:
+            from arrow_handoff import write_batch
+
+            batch_path = write_batch(parsed_dicts, handoff_dir, idx)
+            if profiler.enabled:
+                record['data_bytes'] = os.path.getsize(batch_path)
+        elif profiler.enabled:
+            # The rows are pickled to be sent back to the parent.
+            record['data_bytes'] = len(pickle.dumps(parsed_dicts,
+                                                    protocol=pickle.HIGHEST_PROTOCOL))
+    return TaskResult(idx=idx, rows=[] if batch_path else parsed_dicts,
+                      rss=current_rss_bytes(), peak_rss=peak_rss_bytes(), reused=reused,
+                      stages=profiler.stages if profiler.enabled else None,
+                      batch_path=batch_path, plays=len(parsed_dicts),
+                      log_bytes=os.path.getsize(path),
+                      seconds=time.perf_counter() - start_time,
+                      warnings=_warning_counter.count)
+
+
+def _load_or_parse(path: str, idx: int, columns: Optional[Collection[str]],
+                   index_dir: Optional[str],
+                   profiler: Optional[StageProfiler] = None,
+                   parse_mode: str = PER_PLAY,
+                   keep_summary: bool = False) -> Tuple[List[Dict], bool]:
+    """Parse the log, or reuse its rows from the index if it was parsed before.
+
+    :returns: The rows, and whether they were reused."""
+    index = ParsedLogIndex(index_dir) if index_dir else None
+    key = index.key(path, columns, parse_mode, keep_summary) if index else None
+    parsed_dicts = index.get(key) if index else None
+    reused = parsed_dicts is not None
+    if not reused:
+        profiler = profiler or StageProfiler(enabled=False)
+        with profiler.stage('soup'):
+            raw_log, participation, _ = get_log_participation_year(path)
+        parsed_dicts = _parse_game(raw_log, participation, columns, profiler, parse_mode,
+                                   keep_summary)
+        if index:
+            index.put(key, parsed_dicts)
+
+    logger.debug(f'Parsed game log {idx}.')
+    return _with_metadata(parsed_dicts, log_year(path), log_game_id(path)), reused
+
+
+def _parse_game(raw_log: Any, participation: Any,
+                columns: Optional[Collection[str]],
+                profiler: Optional[StageProfiler] = None,
+                parse_mode: str = PER_PLAY,
+                keep_summary: bool = False) -> List[Dict]:
+    profiler = profiler or StageProfiler(enabled=False)
+    groups, emitted = resolve_columns(columns)
+    if parse_mode == VECTORIZED:
+        return _parse_game_deferred(raw_log, participation, groups, emitted, profiler,
+                                    keep_summary)
+    summaries = [] if keep_summary else None
+    with profiler.stage('parse') as record:
+        parsed: List[ParsedPlay] = parse_full_game(raw_log, participation, groups, summaries)
+        record['plays'] = len(parsed)
+    if profiler.enabled:
+        profiler.set_data_bytes('parse', deep_size_bytes(parsed))
+    with profiler.stage('rows') as record:
+        parsed_dicts = [flatten_row(asdict(parsed_play)) for parsed_play in parsed]
+        if emitted is not None:
+            parsed_dicts = [{column: value for column, value in parsed_dict.items()
+                             if column in emitted} for parsed_dict in parsed_dicts]
+        if summaries is not None:
+            for parsed_dict, summary in zip(parsed_dicts, summaries):
+                parsed_dict[SUMMARY] = summary
+        record['plays'] = len(parsed_dicts)
+    if profiler.enabled:
+        profiler.set_data_bytes('rows', deep_size_bytes(parsed_dicts))
+    return parsed_dicts
+
+
+def _parse_game_deferred(raw_log: Any, participation: Any, groups: Optional[Collection[str]],
+                         emitted: Optional[Collection[str]],
+                         profiler: StageProfiler, keep_summary: bool = False) -> List[Dict]:
+    with profiler.stage('parse') as record:
+        deferred = parse_full_game_deferred(raw_log, participation, groups)
+        record['plays'] = len(deferred)
+    if profiler.enabled:
+        profiler.set_data_bytes('parse', deep_size_bytes(deferred))
+    with profiler.stage('rows') as record:
+        parsed_dicts = []
+        for parsed_play, raw in deferred:
+            parsed_dict = {}
+            if parsed_play.call is not None:
+                flatten_row(asdict(parsed_play.call), parsed_dict)
+                # Extracted from the summary, along with the outcome and context.
+                del parsed_dict['play_type']
+            if parsed_play.names is not None:
+                flatten_row(asdict(parsed_play.names), parsed_dict)
+            parsed_dict.update(raw)
+            if emitted is not None:
+                parsed_dict = {column: value for column, value in parsed_dict.items()
+                               if column in emitted or column in _RAW_COLUMNS}
+            if keep_summary:
+                parsed_dict[SUMMARY] = raw[RAW_SUMMARY]
+            parsed_dicts.append(parsed_dict)
+        record['plays'] = len(parsed_dicts)
+    if profiler.enabled:
+        profiler.set_data_bytes('rows', deep_size_bytes(parsed_dicts))
+    return parsed_dicts
+
+
+def _with_metadata(parsed_dicts: List[Dict], year: int,
+                   game_id: Optional[str] = None) -> List[Dict]:
+    metadata = {YEAR: year} if game_id is None else {YEAR: year, GAME_ID: game_id}
+    for parsed_dict in parsed_dicts:
+        parsed_dict.update(metadata)
+    return parsed_dicts
+
+
+def flatten_row(parsed_dict: Dict, out: Optional[Dict] = None) -> Dict:
+    """Flatten a nested parsed play, keeping only the innermost keys.
+
+    The keys match the column names of the exported dataframe."""
+    out = {} if out is None else out
+    for key, value in parsed_dict.items():
+        if isinstance(value, dict):
+            flatten_row(value, out)
+        else:
+            out[key] = value
+    return out